@@ -1,9 +1,15 @@
 from __future__ import annotations
+import bisect
 import os
-from typing import Generator, Dict, Any
-from sqlalchemy import create_engine
+import ssl
+import threading
+import time
+from typing import AsyncGenerator, Generator, Dict, Any
+from sqlalchemy import create_engine, event, exc
 from sqlalchemy.engine import URL
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.orm import sessionmaker, declarative_base, Session
+from fastapi import Request
 from dotenv import load_dotenv
 import pathlib
 
@@ -30,6 +36,8 @@ DB_PASSWORD = (_env.DB_PASSWORD if _env and getattr(_env, "DB_PASSWORD", None) e
 DB_NAME = (_env.DB_NAME if _env and getattr(_env, "DB_NAME", None) else os.getenv("DB_NAME", "test"))
 DB_PORT = int((_env.DB_PORT if _env and getattr(_env, "DB_PORT", None) else os.getenv("DB_PORT", "3306")))
 DB_SSL_CA = (_env.DB_SSL_CA if _env and getattr(_env, "DB_SSL_CA", None) else os.getenv("DB_SSL_CA"))
+# Optional read replica; user/password/port/name default to the primary's
+DB_REPLICA_HOST = (_env.DB_REPLICA_HOST if _env and getattr(_env, "DB_REPLICA_HOST", None) else os.getenv("DB_REPLICA_HOST"))
 
 url = URL.create(
     drivername="mysql+pymysql",
@@ -45,12 +53,143 @@ connect_args: Dict[str, Any] = {}
 if DB_SSL_CA:
     connect_args["ssl"] = {"ca": DB_SSL_CA}
 
+# Connection pool. The default (5 + 10 overflow) is well below the 40-thread
+# sync threadpool, so requests queued on checkout under load; size it so that
+# pool_size + max_overflow covers the threads that can hold a session.
+# Pre-ping strategy (DB_POOL_PRE_PING):
+#   "always" - SQLAlchemy pre-ping, one round trip on every checkout
+#   "idle"   - ping only connections idle for more than DB_POOL_PING_IDLE seconds
+#   "never"  - rely on pool_recycle and the invalidate-on-disconnect handling
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "idle").strip().lower()
+DB_POOL_PING_IDLE = float(os.getenv("DB_POOL_PING_IDLE", "30"))
+
+# Checkout wait histogram bucket upper bounds, in ms (last bucket is +inf)
+_WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+_pool_lock = threading.Lock()
+_pool_stats = {"checkouts": 0, "timeouts": 0, "connects": 0, "invalidated": 0, "pings": 0, "ping_failures": 0, "max_checked_out": 0}
+_wait_counts = [0] * (len(_WAIT_BUCKETS_MS) + 1)
+_wait_sum_ms = 0.0
+
+
+class _TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        global _wait_sum_ms
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with _pool_lock:
+                _pool_stats["timeouts"] += 1
+            raise
+        finally:
+            ms = (time.perf_counter() - started) * 1000
+            with _pool_lock:
+                _wait_counts[bisect.bisect_left(_WAIT_BUCKETS_MS, ms)] += 1
+                _wait_sum_ms += ms
+
+
 engine = create_engine(
     url,
-    pool_pre_ping=True,
+    poolclass=_TimedQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_pre_ping=DB_POOL_PRE_PING == "always",
     connect_args=connect_args,  # type: ignore[arg-type]
 )
 
+
+@event.listens_for(engine, "connect")
+def _on_connect(dbapi_conn, record):
+    with _pool_lock:
+        _pool_stats["connects"] += 1
+
+
+@event.listens_for(engine, "checkout")
+def _on_checkout(dbapi_conn, record, proxy):
+    with _pool_lock:
+        _pool_stats["checkouts"] += 1
+        _pool_stats["max_checked_out"] = max(_pool_stats["max_checked_out"], engine.pool.checkedout())
+    _ping_if_idle(dbapi_conn, record)
+
+
+def _ping_if_idle(dbapi_conn, record):
+    idle_since = record.info.get("checked_in_at")
+    if DB_POOL_PRE_PING != "idle" or idle_since is None or time.monotonic() - idle_since < DB_POOL_PING_IDLE:
+        return
+    with _pool_lock:
+        _pool_stats["pings"] += 1
+    try:
+        dbapi_conn.ping(reconnect=False)
+    except Exception:
+        with _pool_lock:
+            _pool_stats["ping_failures"] += 1
+        # The pool discards this connection and retries the checkout with a fresh one
+        raise exc.DisconnectionError()
+
+
+@event.listens_for(engine, "checkin")
+def _on_checkin(dbapi_conn, record):
+    record.info["checked_in_at"] = time.monotonic()
+
+
+@event.listens_for(engine, "invalidate")
+def _on_invalidate(dbapi_conn, record, exception):
+    with _pool_lock:
+        _pool_stats["invalidated"] += 1
+
+
+def pool_stats() -> dict:
+    """Current pool occupancy, counters and the checkout-wait histogram."""
+    pool = engine.pool
+    with _pool_lock:
+        out: Dict[str, Any] = dict(_pool_stats)
+        counts = list(_wait_counts)
+        wait_sum = _wait_sum_ms
+    total = sum(counts)
+    buckets = []
+    cumulative = 0
+    for bound, n in zip(list(_WAIT_BUCKETS_MS) + ["+Inf"], counts):
+        cumulative += n
+        buckets.append({"le_ms": bound, "count": cumulative})
+    out.update({
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pre_ping": DB_POOL_PRE_PING,
+        "checked_out": pool.checkedout() if isinstance(pool, QueuePool) else None,
+        "checked_in": pool.checkedin() if isinstance(pool, QueuePool) else None,
+        # QueuePool.overflow() counts from -pool_size; report connections beyond pool_size
+        "overflow": max(0, pool.overflow()) if isinstance(pool, QueuePool) else None,
+        "wait_ms": {
+            "count": total,
+            "sum": round(wait_sum, 2),
+            "avg": round(wait_sum / total, 3) if total else None,
+            "buckets": buckets,
+        },
+    })
+    if async_engine is not None:
+        out["async"] = {"checked_out": async_engine.pool.checkedout(), "overflow": max(0, async_engine.pool.overflow())}
+    if read_engine is not engine:
+        with _pool_lock:
+            reads = dict(_replica_stats)
+        out["replica"] = {
+            "checked_out": read_engine.pool.checkedout(),
+            "lag": _replica_lag,
+            "max_lag": DB_REPLICA_MAX_LAG,
+            "sticky": DB_REPLICA_STICKY,
+            "reads": reads,
+        }
+    return out
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -61,3 +200,288 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+# Read replica routing. Read-only handlers depend on get_read_db, which hands out
+# a replica session unless:
+#   - the client wrote recently: mutations set the PRIMARY_COOKIE for
+#     DB_REPLICA_STICKY seconds (read-your-writes, across workers);
+#   - the replica is lagging more than DB_REPLICA_MAX_LAG seconds, or its lag
+#     is unknown (checked at most every DB_REPLICA_LAG_CHECK seconds);
+#   - the request is a refetch triggered by a realtime event: the client sends
+#     the event's "_ts" in FRESH_HEADER, and while that write may not have
+#     reached the replica yet (lag + DB_REPLICA_FRESH_MARGIN) the read goes to
+#     the primary, so other clients see the change the event announced.
+# Without DB_REPLICA_HOST, read_engine is the primary engine.
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))
+DB_REPLICA_STICKY = float(os.getenv("DB_REPLICA_STICKY", "5"))
+DB_REPLICA_LAG_CHECK = float(os.getenv("DB_REPLICA_LAG_CHECK", "2"))
+DB_REPLICA_FRESH_MARGIN = float(os.getenv("DB_REPLICA_FRESH_MARGIN", "1"))
+PRIMARY_COOKIE = "db_primary_until"
+FRESH_HEADER = "X-Db-Fresh"
+
+if DB_REPLICA_HOST:
+    read_engine = create_engine(
+        url.set(
+            host=DB_REPLICA_HOST,
+            port=int(os.getenv("DB_REPLICA_PORT", str(DB_PORT))),
+            username=os.getenv("DB_REPLICA_USER", DB_USER),
+            password=os.getenv("DB_REPLICA_PASSWORD", DB_PASSWORD),
+        ),
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_pre_ping=DB_POOL_PRE_PING == "always",
+        connect_args=connect_args,  # type: ignore[arg-type]
+    )
+    event.listen(read_engine, "checkout", lambda dbapi_conn, record, proxy: _ping_if_idle(dbapi_conn, record))
+    event.listen(read_engine, "checkin", _on_checkin)
+else:
+    read_engine = engine
+
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+_replica_lock = threading.Lock()
+_replica_lag: float | None = None
+_replica_checked_at = 0.0
+_replica_stats = {"replica": 0, "primary_sticky": 0, "primary_lag": 0, "primary_fresh": 0}
+
+
+def _check_replica_lag() -> float | None:
+    """Seconds behind the primary; None when replication is stopped or the check fails."""
+    try:
+        with read_engine.connect() as conn:
+            for sql, col in (("SHOW REPLICA STATUS", "Seconds_Behind_Source"), ("SHOW SLAVE STATUS", "Seconds_Behind_Master")):
+                try:
+                    row = conn.exec_driver_sql(sql).mappings().first()
+                except exc.DBAPIError:
+                    continue
+                if row is None:
+                    # Not configured as a replica (e.g. a proxy in front of the primary)
+                    return 0.0
+                lag = row.get(col)
+                return float(lag) if lag is not None else None
+    except Exception as e:
+        print(f"[DB] replica lag check failed: {e}")
+    return None
+
+
+def replica_lag() -> float | None:
+    """Last measured replica lag, re-measured by one thread when the value is stale."""
+    global _replica_lag, _replica_checked_at
+    if time.monotonic() - _replica_checked_at >= DB_REPLICA_LAG_CHECK and _replica_lock.acquire(blocking=False):
+        try:
+            _replica_lag = _check_replica_lag()
+            _replica_checked_at = time.monotonic()
+        finally:
+            _replica_lock.release()
+    return _replica_lag
+
+
+def _sticky(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(PRIMARY_COOKIE) or 0) > time.time()
+    except ValueError:
+        return False
+
+
+def _fresh(request: Request, lag: float) -> bool:
+    """True when the write announced at FRESH_HEADER (epoch seconds) may not be on the replica yet."""
+    try:
+        ts = float(request.headers.get(FRESH_HEADER) or 0)
+    except ValueError:
+        return False
+    return ts > 0 and time.time() - ts < lag + DB_REPLICA_FRESH_MARGIN
+
+
+def _route(request: Request, lag: float | None) -> str | None:
+    if lag is None or lag > DB_REPLICA_MAX_LAG:
+        return "primary_lag"
+    if _fresh(request, lag):
+        return "primary_fresh"
+    return None
+
+
+def _prefer_primary(request: Request) -> str | None:
+    return "primary_sticky" if _sticky(request) else _route(request, replica_lag())
+
+
+def get_read_db(request: Request) -> Generator[Session, None, None]:
+    """Session for read-only handlers: the replica when it is safe to read from it."""
+    if read_engine is engine:
+        yield from get_db()
+        return
+    reason = _prefer_primary(request)
+    with _pool_lock:
+        _replica_stats[reason or "replica"] += 1
+    db = SessionLocal() if reason else ReadSessionLocal()
+    db.info["replica"] = reason is None
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def is_replica(db: Session | AsyncSession) -> bool:
+    """True for sessions reading from the replica (results may trail recent writes)."""
+    return bool(db.info.get("replica"))
+
+
+def stick_to_primary(response) -> None:
+    """Route this client's reads to the primary for DB_REPLICA_STICKY seconds (call on writes)."""
+    if read_engine is engine:
+        return
+    response.set_cookie(
+        PRIMARY_COOKIE,
+        str(int(time.time() + DB_REPLICA_STICKY + 1)),
+        max_age=int(DB_REPLICA_STICKY) + 1,
+        httponly=True,
+        samesite="lax",
+    )
+
+
+# Async engine (aiomysql) for the hottest read endpoints: they run as `async def`
+# on the event loop instead of taking a threadpool slot per request. Same URL,
+# pool sizing, pre-ping strategy and replica routing as the sync engines. If the
+# driver is not installed the async engines stay None and get_async_db raises.
+def _async_engine(sync_engine):
+    from sqlalchemy.ext.asyncio import create_async_engine
+    # aiomysql takes an SSLContext, not pymysql's {"ca": ...} dict
+    async_connect_args: Dict[str, Any] = {}
+    if DB_SSL_CA:
+        async_connect_args["ssl"] = ssl.create_default_context(cafile=DB_SSL_CA)
+    eng = create_async_engine(
+        sync_engine.url.set(drivername="mysql+aiomysql"),
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_pre_ping=DB_POOL_PRE_PING == "always",
+        connect_args=async_connect_args,  # type: ignore[arg-type]
+    )
+    # Pool events fire on the underlying sync engine; the adapted connection's
+    # ping() awaits aiomysql's, so _ping_if_idle works unchanged
+    event.listen(eng.sync_engine, "checkout", lambda dbapi_conn, record, proxy: _ping_if_idle(dbapi_conn, record))
+    event.listen(eng.sync_engine, "checkin", _on_checkin)
+    return eng
+
+
+try:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+    async_engine = _async_engine(engine)
+    async_read_engine = _async_engine(read_engine) if read_engine is not engine else async_engine
+    AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+    AsyncReadSessionLocal = async_sessionmaker(async_read_engine, expire_on_commit=False, autoflush=False)
+except Exception as e:  # aiomysql missing
+    from sqlalchemy.ext.asyncio import AsyncSession
+    print(f"[DB] async engine unavailable: {e}")
+    async_engine = async_read_engine = None
+    AsyncSessionLocal = AsyncReadSessionLocal = None
+
+_async_tables: set[str] = set()
+
+
+async def ensure_tables_async(*tables) -> None:
+    """CREATE TABLE IF NOT EXISTS on the primary, once per process per table
+    (the async counterpart of Model.__table__.create(bind=engine, checkfirst=True))."""
+    pending = [t for t in tables if t.name not in _async_tables]
+    if not pending or async_engine is None:
+        return
+    try:
+        async with async_engine.begin() as conn:
+            for t in pending:
+                await conn.run_sync(t.create, checkfirst=True)
+        _async_tables.update(t.name for t in pending)
+    except Exception as e:
+        print(f"[DB] ensure_tables_async failed for {[t.name for t in pending]}: {e}")
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    if AsyncSessionLocal is None:
+        raise RuntimeError("async database engine not available (install aiomysql)")
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """Async get_read_db: same read-your-writes and lag rules, without blocking the loop."""
+    if async_read_engine is async_engine:
+        async for db in get_async_db():
+            yield db
+        return
+    if _sticky(request):
+        reason = "primary_sticky"
+    else:
+        lag = _replica_lag
+        if time.monotonic() - _replica_checked_at >= DB_REPLICA_LAG_CHECK:
+            import anyio
+            lag = await anyio.to_thread.run_sync(replica_lag)
+        reason = _route(request, lag)
+    with _pool_lock:
+        _replica_stats[reason or "replica"] += 1
+    factory = AsyncSessionLocal if reason else AsyncReadSessionLocal
+    async with factory() as db:
+        db.info["replica"] = reason is None
+        yield db
+
+
+def ensure_column(table: str, column: str, ddl: str) -> bool:
+    """Add a column if it is missing. Returns True when created."""
+    from sqlalchemy import inspect
+
+    insp = inspect(engine)
+    if not insp.has_table(table):
+        return False
+    if any(c.get("name") == column for c in insp.get_columns(table)):
+        return False
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+    return True
+
+
+def ensure_column_length(table: str, column: str, length: int, ddl: str) -> bool:
+    """Widen a VARCHAR column created shorter than `length` (ddl is the full new
+    definition, e.g. "VARCHAR(255) NULL"). Returns True when altered."""
+    from sqlalchemy import inspect
+
+    insp = inspect(engine)
+    if not insp.has_table(table):
+        return False
+    col = next((c for c in insp.get_columns(table) if c.get("name") == column), None)
+    atual = getattr(col["type"], "length", None) if col else None
+    if atual is None or atual >= length:
+        return False
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"ALTER TABLE {table} MODIFY {column} {ddl}")
+    return True
+
+
+def ensure_index(table: str, name: str, columns: tuple[str, ...], kind: str = "") -> bool:
+    """Create a secondary index if it is missing (kind: "", "UNIQUE" or "FULLTEXT").
+    Returns True when created."""
+    from sqlalchemy import inspect
+
+    insp = inspect(engine)
+    if not insp.has_table(table):
+        return False
+    if any(ix.get("name") == name for ix in insp.get_indexes(table)):
+        return False
+    cols_sql = ", ".join(columns)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"CREATE {kind + ' ' if kind else ''}INDEX {name} ON {table} ({cols_sql})")
+    return True
+
+
+def mark_flushed_nulls(obj: Any) -> None:
+    """After a flush, mark attributes that were never set (and have no server default)
+    as loaded with None, so the object can be detached and read without a refresh SELECT."""
+    from sqlalchemy import inspect
+    from sqlalchemy.orm.attributes import set_committed_value
+
+    state = inspect(obj)
+    cols = state.mapper.columns
+    for key in list(state.unloaded):
+        col = cols.get(key)
+        if col is not None and col.server_default is None:
+            set_committed_value(obj, key, None)
@@ -270,6 +270,17 @@ def send_async(func, *args, **kwargs) -> None:
     threading.Thread(target=_runner, daemon=True).start()
 
 
+def send_many_async(func, calls: List[Tuple[Any, ...]]) -> None:
+    """Send a batch of emails sequentially from a single background thread."""
+    def _runner():
+        for args in calls:
+            try:
+                func(*args)
+            except Exception as e:  # pragma: no cover
+                print(f"[EMAIL] async batch error: {e}")
+    threading.Thread(target=_runner, daemon=True).start()
+
+
 def send_chamado_abertura(ch, attachments: Optional[List[Dict[str, Any]]] = None) -> bool:
     subject, html = build_email_chamado_aberto(ch)
     cc = []
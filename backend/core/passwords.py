@@ -0,0 +1,132 @@
+from __future__ import annotations
+import multiprocessing
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# PBKDF2 is CPU-bound and holds the GIL, so hashing/verification runs in a
+# dedicated process pool. Admission control caps how many request threads can
+# be waiting on it (the rest of the threadpool stays free for other endpoints);
+# above the cap callers get PasswordPoolBusy after PASSWORD_POOL_ADMISSION_TIMEOUT.
+PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", str(os.cpu_count() or 2)))
+PASSWORD_POOL_MAX_PENDING = int(os.getenv("PASSWORD_POOL_MAX_PENDING", "16"))
+PASSWORD_POOL_ADMISSION_TIMEOUT = float(os.getenv("PASSWORD_POOL_ADMISSION_TIMEOUT", "2"))
+
+
+class PasswordPoolBusy(RuntimeError):
+    """Too many password operations in flight; the caller should retry later."""
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+_admission = threading.BoundedSemaphore(max(1, PASSWORD_POOL_MAX_PENDING))
+_stats_lock = threading.Lock()
+_stats = {"submitted": 0, "rejected": 0, "inline": 0, "in_flight": 0}
+# (queue_ms, run_ms) of the most recent operations
+_samples: deque = deque(maxlen=1000)
+
+
+def _hash(password: str, submitted: float) -> tuple[str, float, float]:
+    started = time.time()
+    h = generate_password_hash(password)
+    return h, started - submitted, time.time() - started
+
+
+def _check(pwhash: str, password: str, submitted: float) -> tuple[bool, float, float]:
+    started = time.time()
+    ok = check_password_hash(pwhash, password)
+    return ok, started - submitted, time.time() - started
+
+
+def _get_pool() -> ProcessPoolExecutor | None:
+    global _pool
+    if _pool is not None or PASSWORD_POOL_WORKERS <= 0:
+        return _pool
+    with _pool_lock:
+        if _pool is None:
+            try:
+                # spawn: forking a process that already runs threads is unsafe
+                ctx = multiprocessing.get_context("spawn")
+                _pool = ProcessPoolExecutor(max_workers=PASSWORD_POOL_WORKERS, mp_context=ctx)
+            except Exception as e:
+                print(f"[PASSWORDS] process pool unavailable, hashing inline: {e}")
+                _pool = None
+    return _pool
+
+
+def _reset_pool(broken: ProcessPoolExecutor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _run(fn, *args):
+    if not _admission.acquire(timeout=PASSWORD_POOL_ADMISSION_TIMEOUT):
+        with _stats_lock:
+            _stats["rejected"] += 1
+        raise PasswordPoolBusy("Servidor ocupado, tente novamente em instantes")
+    try:
+        with _stats_lock:
+            _stats["submitted"] += 1
+            _stats["in_flight"] += 1
+        pool = _get_pool()
+        if pool is None:
+            with _stats_lock:
+                _stats["inline"] += 1
+            result, queued, ran = fn(*args, time.time())
+        else:
+            try:
+                result, queued, ran = pool.submit(fn, *args, time.time()).result()
+            except BrokenProcessPool:
+                # a worker died: recreate the pool on the next call, answer this one inline
+                _reset_pool(pool)
+                result, queued, ran = fn(*args, time.time())
+        with _stats_lock:
+            _samples.append((max(0.0, queued) * 1000, ran * 1000))
+        return result
+    finally:
+        with _stats_lock:
+            _stats["in_flight"] -= 1
+        _admission.release()
+
+
+def hash_password(password: str) -> str:
+    return _run(_hash, password)
+
+
+def verify_password(pwhash: str, password: str) -> bool:
+    if not pwhash:
+        return False
+    return _run(_check, pwhash, password)
+
+
+def _pct(values: list[float], p: float) -> float | None:
+    if not values:
+        return None
+    if len(values) == 1:
+        return round(values[0], 2)
+    return round(statistics.quantiles(values, n=100)[int(p) - 1], 2)
+
+
+def pool_stats() -> dict:
+    with _stats_lock:
+        out = dict(_stats)
+        samples = list(_samples)
+    queue = [q for q, _ in samples]
+    run = [r for _, r in samples]
+    out.update({
+        "workers": PASSWORD_POOL_WORKERS,
+        "max_pending": PASSWORD_POOL_MAX_PENDING,
+        "queue_ms_p50": _pct(queue, 50),
+        "queue_ms_p95": _pct(queue, 95),
+        "run_ms_p50": _pct(run, 50),
+        "run_ms_p95": _pct(run, 95),
+    })
+    return out
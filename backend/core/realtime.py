@@ -2,10 +2,177 @@ import socketio
 
 import socketio
 import asyncio
+import os
+import threading
+import time
+import uuid
+from collections import deque
 
 # Single Socket.IO server instance for the whole app
 sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*")
 
+# Every event sent through emit_evento carries a per-process sequence number
+# ("_seq") and is kept in a bounded ring buffer so reconnecting clients can
+# 'resume' from the last sequence they saw. The epoch changes on restart (and
+# differs between workers), which tells the client that sequences don't match.
+# "_ts" (epoch seconds) is when the event was emitted; clients send it back in
+# core.db.FRESH_HEADER on the refetch the event triggers, so that read goes to
+# the primary while the replica may not have the change yet.
+REALTIME_BUFFER = int(os.getenv("REALTIME_BUFFER", "2000"))
+_epoch = uuid.uuid4().hex[:12]
+_seq = 0
+_seq_lock = threading.Lock()
+_buffer: deque = deque(maxlen=REALTIME_BUFFER)
+_loop: asyncio.AbstractEventLoop | None = None
+
+# Topic rooms a client may join with 'subscribe' (user:{id} stays on 'identify')
+TOPIC_PREFIXES = ("setor:", "unidade:", "chamado:")
+MAX_TOPICS = int(os.getenv("REALTIME_MAX_TOPICS", "50"))
+
+# Coalescing: events listed in COALESCE_POLICIES are held for REALTIME_COALESCE_MS
+# and delivered as a single "events" frame {"events": [{"event", "data"}...],
+# "_seq": last}. At flush time the target rooms are resolved to sockets, so a
+# socket in several of an event's rooms still gets it once; sockets that would
+# receive the same events share one emit. Policies:
+#   "last_by_id" - keep only the latest event per data["id"]
+#   "ids"        - merge into one event {"ids": [...]} (receivers just refetch)
+#   "all"        - keep every event, in order
+# Other events (auth:*, etc.) are sent immediately. 0 disables coalescing.
+# Callers that must know whether a coalesced event went out (the outbox relay)
+# pass a `delivered` future, resolved by _flush.
+REALTIME_COALESCE_MS = int(os.getenv("REALTIME_COALESCE_MS", "200"))
+COALESCE_POLICIES = {
+    "chamado:created": "ids",
+    "chamado:status": "last_by_id",
+    "chamado:deleted": "last_by_id",
+    "notification:new": "all",
+}
+_pending: list = []
+_flush_scheduled = False
+_stats = {"events": 0, "frames": 0}
+
+
+async def emit_evento(event: str, data, room=None, delivered: asyncio.Future | None = None) -> int:
+    """Emit an event with a sequence number and record it for replay. Returns the sequence.
+    `room` may be a single room or a list (each socket receives the event once).
+    A coalesced event is only queued here; pass `delivered` to learn the outcome: it
+    gets True once the event was emitted, or the emit's exception (the outbox relay
+    uses it to delete rows only after delivery)."""
+    global _seq, _flush_scheduled
+    payload = dict(data) if isinstance(data, dict) else {"data": data}
+    with _seq_lock:
+        _seq += 1
+        seq = _seq
+        payload["_seq"] = seq
+        payload["_ts"] = round(time.time(), 3)
+        _buffer.append((seq, event, payload, room))
+    _stats["events"] += 1
+    if REALTIME_COALESCE_MS > 0 and event in COALESCE_POLICIES:
+        _pending.append((seq, event, payload, room, delivered))
+        if not _flush_scheduled:
+            _flush_scheduled = True
+            asyncio.get_running_loop().call_later(
+                REALTIME_COALESCE_MS / 1000, lambda: asyncio.ensure_future(_flush())
+            )
+        return seq
+    _stats["frames"] += 1
+    try:
+        await sio.emit(event, payload, room=room)
+    except Exception as e:
+        _resolve(delivered, e)
+        raise
+    _resolve(delivered, None)
+    return seq
+
+
+def _resolve(fut: asyncio.Future | None, error: BaseException | None) -> None:
+    if fut is None or fut.done():
+        return
+    if error is None:
+        fut.set_result(True)
+    else:
+        fut.set_exception(error)
+
+
+def _coalesce(items: list) -> list:
+    """Apply COALESCE_POLICIES to [(seq, event, payload)], keeping sequence order."""
+    out: dict[int, tuple] = {}
+    last_by_id: dict = {}
+    merged: dict = {}
+    for seq, event, payload in items:
+        policy = COALESCE_POLICIES.get(event, "all")
+        if policy == "last_by_id" and payload.get("id") is not None:
+            key = (event, payload["id"])
+            if key in last_by_id:
+                out.pop(last_by_id[key], None)
+            last_by_id[key] = seq
+            out[seq] = (event, payload)
+        elif policy == "ids":
+            ids = payload.get("ids") or ([payload["id"]] if payload.get("id") is not None else [])
+            if event in merged:
+                first, data = merged[event]
+                out.pop(first)
+                for i in ids:
+                    if i not in data["ids"]:
+                        data["ids"].append(i)
+                data["_seq"] = seq
+                data["_ts"] = payload["_ts"]
+            else:
+                data = {k: v for k, v in payload.items() if k != "id"}
+                data["ids"] = list(dict.fromkeys(ids))
+            merged[event] = (seq, data)
+            out[seq] = (event, data)
+        else:
+            out[seq] = (event, payload)
+    return [{"event": e, "data": d} for _, (e, d) in sorted(out.items())]
+
+
+async def _flush() -> None:
+    global _pending, _flush_scheduled
+    items, _pending = _pending, []
+    _flush_scheduled = False
+    if not items:
+        return
+    # An event counts as delivered only if every frame carrying it was emitted
+    erros: dict[int, BaseException] = {}
+    try:
+        # Events per socket (each event once, whatever the number of its rooms it is in)
+        por_sid: dict[str, list] = {}
+        for seq, event, payload, room, _ in items:
+            alvo = list(room) if isinstance(room, (list, tuple)) else [room]
+            for sid, _ in sio.manager.get_participants("/", alvo):
+                por_sid.setdefault(sid, []).append((seq, event, payload))
+        # Sockets with the same event list share one frame/emit
+        grupos: dict[tuple, list[str]] = {}
+        for sid, eventos in por_sid.items():
+            grupos.setdefault(tuple(e[0] for e in eventos), []).append(sid)
+        for seqs, sids in grupos.items():
+            eventos = por_sid[sids[0]]
+            frame = {"events": _coalesce(eventos), "_seq": eventos[-1][0]}
+            _stats["frames"] += 1
+            try:
+                await sio.emit("events", frame, to=sids)
+            except Exception as e:
+                print(f"[SIO] flush error sids={len(sids)}: {e}")
+                erros.update(dict.fromkeys(seqs, e))
+    except Exception as e:
+        print(f"[SIO] flush error: {e}")
+        erros.update((it[0], e) for it in items)
+    for seq, _, _, _, delivered in items:
+        _resolve(delivered, erros.get(seq))
+
+
+def realtime_stats() -> dict:
+    """Events accepted vs socket.io emits issued (one per frame group)."""
+    return {**_stats, "pending": len(_pending), "coalesce_ms": REALTIME_COALESCE_MS}
+
+
+def emit_evento_threadsafe(event: str, data, room=None) -> None:
+    """Schedule emit_evento on the server loop from any thread (no-op before the first connection)."""
+    if _loop is None:
+        return
+    asyncio.run_coroutine_threadsafe(emit_evento(event, data, room=room), _loop)
+
 
 def mount_socketio(app):
     """Wrap FastAPI app with Socket.IO ASGI app.
@@ -19,7 +186,12 @@ def mount_socketio(app):
 # so server can add the socket to a dedicated room 'user:{id}'.
 @sio.event
 async def connect(sid, environ):
+    global _loop
+    if _loop is None:
+        _loop = asyncio.get_running_loop()
     print(f"[SIO] connect: {sid}")
+    # Lets the client decide between 'resume' and a full resync
+    await sio.emit("realtime:hello", {"epoch": _epoch, "seq": _seq}, to=sid)
 
 
 @sio.event
@@ -41,12 +213,93 @@ async def handle_identify(sid, data):
         print(f"[SIO] identify error: {e}")
 
 
+def _topics(data) -> list[str]:
+    if isinstance(data, dict):
+        data = data.get("topics") if data.get("topics") is not None else data.get("topic")
+    if isinstance(data, str):
+        data = [data]
+    if not isinstance(data, (list, tuple)):
+        return []
+    out = []
+    for t in data:
+        t = str(t).strip()
+        if t.startswith(TOPIC_PREFIXES) and len(t) <= 150:
+            out.append(t)
+    return out
+
+
+async def _subscribe(sid, topics: list[str]) -> list[str]:
+    atuais = {r for r in sio.rooms(sid) if isinstance(r, str) and r.startswith(TOPIC_PREFIXES)}
+    for t in topics:
+        if t in atuais:
+            continue
+        if len(atuais) >= MAX_TOPICS:
+            break
+        await sio.enter_room(sid, t)
+        atuais.add(t)
+    return sorted(atuais)
+
+
+@sio.on("subscribe")
+async def handle_subscribe(sid, data):
+    """Join topic rooms, e.g. {"topics": ["setor:ti", "unidade:Centro", "chamado:42"]}."""
+    try:
+        return {"ok": True, "rooms": await _subscribe(sid, _topics(data))}
+    except Exception as e:
+        print(f"[SIO] subscribe error: {e}")
+        return {"ok": False}
+
+
+@sio.on("unsubscribe")
+async def handle_unsubscribe(sid, data):
+    try:
+        for t in _topics(data):
+            await sio.leave_room(sid, t)
+        atuais = [r for r in sio.rooms(sid) if isinstance(r, str) and r.startswith(TOPIC_PREFIXES)]
+        return {"ok": True, "rooms": sorted(atuais)}
+    except Exception as e:
+        print(f"[SIO] unsubscribe error: {e}")
+        return {"ok": False}
+
+
+@sio.on("resume")
+async def handle_resume(sid, data):
+    """Replay events after `since` to this socket. Answers (ack) with
+    {"ok": True, "replayed": n, ...} or {"resync": True, ...} when the epoch differs
+    or the gap is older than the buffer. Optional "topics" are joined first, since
+    handlers run concurrently and a separate 'subscribe' may not have landed yet."""
+    try:
+        await _subscribe(sid, _topics(data.get("topics") if isinstance(data, dict) else None))
+        since = int(data.get("since") or 0) if isinstance(data, dict) else 0
+        epoch = data.get("epoch") if isinstance(data, dict) else None
+        with _seq_lock:
+            atual = _seq
+            oldest = _buffer[0][0] if _buffer else atual + 1
+            # Events still waiting for the coalescing flush reach this socket in that frame
+            pendentes = {it[0] for it in _pending}
+            eventos = [e for e in _buffer if e[0] > since and e[0] not in pendentes]
+        if epoch != _epoch or since > atual or since + 1 < oldest:
+            return {"resync": True, "epoch": _epoch, "seq": atual}
+        rooms = set(sio.rooms(sid))
+        n = 0
+        for seq, event, payload, room in eventos:
+            # Only what this socket would have received
+            alvo = room if isinstance(room, (list, tuple)) else [room]
+            if room is None or any(r in rooms for r in alvo):
+                await sio.emit(event, payload, to=sid)
+                n += 1
+        return {"ok": True, "epoch": _epoch, "seq": atual, "replayed": n}
+    except Exception as e:
+        print(f"[SIO] resume error: {e}")
+        return {"resync": True, "epoch": _epoch, "seq": _seq}
+
+
 async def emit_logout_for_user(user_id: int):
     """Helper to emit logout event to a user's room."""
     try:
         room = f"user:{user_id}"
         print(f"[SIO] emitting auth:logout to room={room}")
-        await sio.emit("auth:logout", {"user_id": user_id}, room=room)
+        await emit_evento("auth:logout", {"user_id": user_id}, room=room)
     except Exception as e:
         print(f"[SIO] emit_logout error: {e}")
 
@@ -56,7 +309,7 @@ async def emit_refresh_for_user(user_id: int):
     try:
         room = f"user:{user_id}"
         print(f"[SIO] emitting auth:refresh to room={room}")
-        await sio.emit("auth:refresh", {"user_id": user_id}, room=room)
+        await emit_evento("auth:refresh", {"user_id": user_id}, room=room)
     except Exception as e:
         print(f"[SIO] emit_refresh error: {e}")
 
@@ -67,8 +320,8 @@ def emit_logout_sync(user_id: int):
     try:
         room = f"user:{user_id}"
         print(f"[SIO] emit_logout_sync: emitting auth:logout to room={room}")
-        # python-socketio's emit method is thread-safe
-        sio.emit("auth:logout", {"user_id": user_id}, room=room, skip_sid=None)
+        # AsyncServer.emit is a coroutine: schedule it on the server loop
+        emit_evento_threadsafe("auth:logout", {"user_id": user_id}, room=room)
         print(f"[SIO] emit_logout_sync completed for user_id={user_id}")
     except Exception as e:
         print(f"[SIO] emit_logout_sync error for user_id={user_id}: {e}")
@@ -81,8 +334,8 @@ def emit_refresh_sync(user_id: int):
     try:
         room = f"user:{user_id}"
         print(f"[SIO] emit_refresh_sync: emitting auth:refresh to room={room}")
-        # python-socketio's emit method is thread-safe
-        sio.emit("auth:refresh", {"user_id": user_id}, room=room, skip_sid=None)
+        # AsyncServer.emit is a coroutine: schedule it on the server loop
+        emit_evento_threadsafe("auth:refresh", {"user_id": user_id}, room=room)
         print(f"[SIO] emit_refresh_sync completed for user_id={user_id}")
     except Exception as e:
         print(f"[SIO] emit_refresh_sync error for user_id={user_id}: {e}")
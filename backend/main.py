@@ -7,6 +7,7 @@ from ti.api import chamados_router, unidades_router, problemas_router, notificat
 from ti.api.usuarios import router as usuarios_router
 from core.realtime import mount_socketio
 import json
+import os
 from typing import Any, List, Dict
 import uuid
 
@@ -18,18 +19,82 @@ _uploads = _base_dir / "uploads"
 _uploads.mkdir(parents=True, exist_ok=True)
 _http.mount("/uploads", StaticFiles(directory=str(_uploads), html=False), name="uploads")
 
+# The frontend sends credentials (the db_primary_until cookie), and browsers reject
+# "Access-Control-Allow-Origin: *" on credentialed requests, so allowed origins are
+# explicit: CORS_ORIGINS (comma-separated) plus CORS_ORIGIN_REGEX (dev servers on
+# localhost/127.0.0.1 by default). Production serves the SPA and /api same-origin.
+CORS_ORIGINS = [o.strip() for o in os.getenv("CORS_ORIGINS", "").split(",") if o.strip()]
+CORS_ORIGIN_REGEX = os.getenv("CORS_ORIGIN_REGEX", r"https?://(localhost|127\.0\.0\.1)(:\d+)?")
+
 _http.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=CORS_ORIGINS,
+    allow_origin_regex=CORS_ORIGIN_REGEX or None,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+
+@_http.middleware("http")
+async def _read_your_writes(request, call_next):
+    # After a successful write, this client's reads skip the replica for a few seconds
+    response = await call_next(request)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        from core.db import stick_to_primary
+        stick_to_primary(response)
+    return response
+
+@_http.on_event("startup")
+def _ensure_schema():
+    # Colunas/índices novos precisam existir antes de qualquer SELECT no ORM
+    from ti.services.chamados import ensure_chamado_schema
+    from ti.services.notificacoes import ensure_notificacoes_schema, iniciar_retencao
+    from ti.services.acessos import iniciar_flush_acessos
+    ensure_chamado_schema()
+    ensure_notificacoes_schema()
+    iniciar_retencao()
+    iniciar_flush_acessos()
+    try:
+        from core.db import SessionLocal
+        from ti.services.diretorio import aquecer
+        with SessionLocal() as db:
+            aquecer(db)
+    except Exception as e:
+        print(f"[DIRETORIO] falha ao aquecer índice de usuários: {e}")
+    try:
+        from core.db import SessionLocal
+        from ti.services.sessoes import carregar
+        with SessionLocal() as db:
+            carregar(db)
+    except Exception as e:
+        print(f"[SESSOES] falha ao carregar tabela de revogação: {e}")
+
+
+@_http.on_event("shutdown")
+def _flush_pendentes():
+    # Não perde os ultimo_acesso ainda em memória
+    from ti.services.acessos import flush_acessos
+    flush_acessos()
+
+
+@_http.on_event("startup")
+async def _iniciar_outbox():
+    # Relay do outbox precisa do loop do ASGI para emitir
+    from ti.services.outbox import iniciar_relay
+    iniciar_relay()
+
+
 @_http.get("/api/ping")
 def ping():
     return {"message": "pong"}
 
+
+@_http.get("/api/db/pool-stats")
+def db_pool_stats():
+    from core.db import pool_stats
+    return pool_stats()
+
 from fastapi import Depends
 from sqlalchemy.orm import Session
 from core.db import get_db, engine
@@ -0,0 +1,28 @@
+"""Arquiva chamados Concluídos/Cancelados antigos (para execução agendada, ex.: cron diário).
+
+Uso: python scripts/arquivar_chamados.py [--dias 180] [--lote 200]
+"""
+from __future__ import annotations
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.db import SessionLocal  # noqa: E402
+from ti.services.arquivo import ARQUIVO_DIAS, arquivar_chamados  # noqa: E402
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dias", type=int, default=ARQUIVO_DIAS)
+    ap.add_argument("--lote", type=int, default=200)
+    args = ap.parse_args()
+    with SessionLocal() as db:
+        total = arquivar_chamados(db, dias=args.dias, lote=args.lote)
+    print(f"OK: {total} chamados arquivados")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
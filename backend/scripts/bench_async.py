@@ -0,0 +1,119 @@
+"""Benchmark de carga: endpoints de leitura async (AsyncSession) x equivalentes síncronos.
+
+Sobe um uvicorn local (um worker) com os routers reais, que agora são async
+(GET /usuarios/{id}, GET /notifications?usuario_id=), e rotas /sync/... que fazem
+as mesmas consultas com Session síncrona, como os handlers faziam antes (cada
+requisição ocupa uma thread do threadpool do anyio, 40 por padrão). Dispara
+--clientes clientes concorrentes (httpx) por --segundos em cada rota e reporta
+vazão, erros e p50/p95/p99.
+
+Uso: python scripts/bench_async.py [--usuario-id 1] [--clientes 500] [--segundos 15] [--porta 8765]
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from fastapi import Depends, FastAPI, HTTPException  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+from core.db import get_db  # noqa: E402
+from ti.api import notifications_router  # noqa: E402
+from ti.api.usuarios import router as usuarios_router  # noqa: E402
+from ti.models import User  # noqa: E402
+from ti.services.notificacoes import listar_para_usuario  # noqa: E402
+from ti.services.user_setores import normalizados  # noqa: E402
+
+
+def montar_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(usuarios_router)
+    app.include_router(notifications_router)
+
+    @app.get("/sync/usuarios/{user_id}")
+    def usuario_sync(user_id: int, db: Session = Depends(get_db)):
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user:
+            raise HTTPException(status_code=404, detail="Usuário não encontrado")
+        setores = normalizados(user._setores, user.setor)
+        return {"id": user.id, "nome": user.nome, "email": user.email, "setores": setores}
+
+    @app.get("/sync/notifications")
+    def notificacoes_sync(usuario_id: int, limit: int = 50, db: Session = Depends(get_db)):
+        return listar_para_usuario(db, usuario_id, limit)
+
+    return app
+
+
+def subir_servidor(app: FastAPI, porta: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=porta, log_level="warning", access_log=False))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def carga(url: str, clientes: int, segundos: float) -> tuple[list[float], int]:
+    latencias: list[float] = []
+    erros = 0
+    fim = time.perf_counter() + segundos
+    limits = httpx.Limits(max_connections=clientes, max_keepalive_connections=clientes)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        async def cliente():
+            nonlocal erros
+            while time.perf_counter() < fim:
+                t0 = time.perf_counter()
+                try:
+                    r = await client.get(url)
+                    ok = r.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencias.append((time.perf_counter() - t0) * 1000)
+                else:
+                    erros += 1
+        await asyncio.gather(*(cliente() for _ in range(clientes)))
+    return latencias, erros
+
+
+def pct(valores: list[float], p: float) -> float:
+    return valores[min(len(valores) - 1, int(len(valores) * p))] if valores else float("nan")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--usuario-id", type=int, default=1)
+    ap.add_argument("--clientes", type=int, default=500)
+    ap.add_argument("--segundos", type=float, default=15)
+    ap.add_argument("--porta", type=int, default=8765)
+    args = ap.parse_args()
+
+    server = subir_servidor(montar_app(), args.porta)
+    base = f"http://127.0.0.1:{args.porta}"
+    cenarios = [
+        ("usuario sync", f"{base}/sync/usuarios/{args.usuario_id}"),
+        ("usuario async", f"{base}/usuarios/{args.usuario_id}"),
+        ("notificações sync", f"{base}/sync/notifications?usuario_id={args.usuario_id}"),
+        ("notificações async", f"{base}/notifications?usuario_id={args.usuario_id}"),
+    ]
+    print(f"clientes={args.clientes} duração={args.segundos:.0f}s por cenário")
+    for nome, url in cenarios:
+        lat, erros = asyncio.run(carga(url, args.clientes, args.segundos))
+        lat.sort()
+        vazao = len(lat) / args.segundos
+        p50 = statistics.median(lat) if lat else float("nan")
+        print(f"{nome:<20} ok={len(lat):>7} erros={erros:>5} vazão={vazao:>7.0f}/s "
+              f"p50={p50:>7.1f}ms p95={pct(lat, 0.95):>7.1f}ms p99={pct(lat, 0.99):>7.1f}ms")
+    server.should_exit = True
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
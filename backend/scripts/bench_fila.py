@@ -0,0 +1,126 @@
+"""Benchmark de concorrência da fila de chamados (POST /chamados/next).
+
+Cria N chamados de teste (codigo BENCH-*), dispara W threads que assumem
+chamados em loop via assumir_proximo_chamado (restrito ao prefixo BENCH-, nunca
+toca chamados reais) e reporta latência e duplicidades. Os chamados de teste são
+removidos ao final, com o histórico, os eventos do outbox e as notificações gerados.
+
+Uso: python scripts/bench_fila.py [--chamados 500] [--workers 32] [--usuario-id 1]
+"""
+from __future__ import annotations
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import or_, text  # noqa: E402
+from core.db import SessionLocal  # noqa: E402
+from core.utils import now_brazil_naive  # noqa: E402
+from ti.models import Chamado, HistoricoStatus, Notification, OutboxEvento  # noqa: E402
+from ti.services.chamados import assumir_proximo_chamado  # noqa: E402
+from ti.services.outbox import salas_chamado  # noqa: E402
+
+PREFIX = "BENCH-"
+UNIDADE = "bench"
+
+
+def seed(n: int) -> None:
+    with SessionLocal() as db:
+        agora = now_brazil_naive()
+        db.add_all([
+            Chamado(
+                codigo=f"{PREFIX}{i:06d}",
+                protocolo=f"{PREFIX}{i:06d}",
+                solicitante="bench",
+                cargo="bench",
+                email="bench@example.com",
+                telefone="0",
+                unidade=UNIDADE,
+                problema="bench",
+                data_abertura=agora,
+                status="Aberto",
+                prioridade="Normal",
+            )
+            for i in range(n)
+        ])
+        db.commit()
+
+
+def cleanup() -> None:
+    """Remove os chamados de teste e tudo o que as claims geraram: histórico, eventos
+    do outbox (senão o relay os publica para o painel real) e notificações."""
+    with SessionLocal() as db:
+        ids = [r[0] for r in db.execute(text("SELECT id FROM chamado WHERE codigo LIKE :p"), {"p": f"{PREFIX}%"})]
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            db.query(HistoricoStatus).filter(HistoricoStatus.chamado_id.in_(chunk)).delete(synchronize_session=False)
+            # Eventos de chamado são gravados com sala = lista JSON de salas_chamado()
+            salas = [json.dumps(salas_chamado(cid, UNIDADE), ensure_ascii=False) for cid in chunk]
+            db.query(OutboxEvento).filter(OutboxEvento.sala.in_(salas)).delete(synchronize_session=False)
+            notifs = [
+                n for (n,) in db.query(Notification.id)
+                .filter(Notification.recurso == "chamado", Notification.recurso_id.in_(chunk))
+            ]
+            if notifs:
+                db.query(OutboxEvento).filter(
+                    OutboxEvento.evento == "notification:new",
+                    or_(*[OutboxEvento.payload.like(f'{{"id": {n},%') for n in notifs]),
+                ).delete(synchronize_session=False)
+                db.query(Notification).filter(Notification.id.in_(notifs)).delete(synchronize_session=False)
+            db.query(Chamado).filter(Chamado.id.in_(chunk)).delete(synchronize_session=False)
+        db.commit()
+
+
+def worker(usuario_id: int, claimed: list[int], latencies: list[float], lock: threading.Lock) -> None:
+    while True:
+        with SessionLocal() as db:
+            t0 = time.perf_counter()
+            ch = assumir_proximo_chamado(db, usuario_id, prefixo_codigo=PREFIX)
+            dt = time.perf_counter() - t0
+        if ch is None:
+            return
+        with lock:
+            claimed.append(ch.id)
+            latencies.append(dt)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chamados", type=int, default=500)
+    ap.add_argument("--workers", type=int, default=32)
+    ap.add_argument("--usuario-id", type=int, default=None)
+    args = ap.parse_args()
+
+    cleanup()
+    seed(args.chamados)
+    claimed: list[int] = []
+    latencies: list[float] = []
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=worker, args=(args.usuario_id, claimed, latencies, lock))
+        for _ in range(args.workers)
+    ]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    total = time.perf_counter() - t0
+    cleanup()
+
+    dups = len(claimed) - len(set(claimed))
+    lat_ms = sorted(x * 1000 for x in latencies)
+    print(f"workers={args.workers} chamados={args.chamados} assumidos={len(claimed)} duplicados={dups}")
+    if lat_ms:
+        p99 = lat_ms[min(len(lat_ms) - 1, int(len(lat_ms) * 0.99))]
+        print(f"total={total:.2f}s vazão={len(claimed) / total:.0f}/s p50={statistics.median(lat_ms):.1f}ms p99={p99:.1f}ms")
+    return 1 if dups or len(claimed) != args.chamados else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,118 @@
+"""Benchmark do custo de emit Socket.IO: broadcast x salas de interesse.
+
+Registra N clientes simulados no manager do servidor (sem rede: o envio ao
+engine.io é substituído por um contador), dos quais uma fração assina
+setor:ti e os demais ficam em salas de unidade. Para cada N mede o tempo
+médio de um emit de chamado em broadcast e roteado com salas_chamado, e
+quantos sockets recebem cada um.
+
+Com --rajada K, simula K mudanças de status (com notificação) em 20 chamados
+e compara frames/envios com e sem a janela de coalescência (REALTIME_COALESCE_MS).
+
+Uso: python scripts/bench_realtime.py [--clientes 100,1000,5000,20000] [--interessados 0.1] [--emits 200] [--rajada 500]
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import socketio  # noqa: E402
+from core import realtime  # noqa: E402
+from ti.services.outbox import SALA_TI, salas_chamado  # noqa: E402
+
+UNIDADES = 40
+
+
+async def medir(n: int, interessados: float, emits: int) -> tuple[float, int, float, int]:
+    sio = socketio.AsyncServer(async_mode="asgi")
+    enviados = 0
+
+    async def _send(eio_sid, pkt):
+        nonlocal enviados
+        enviados += 1
+
+    sio._send_eio_packet = _send
+    for i in range(n):
+        sid = await sio.manager.connect(f"eio-{i}", "/")
+        if i < int(n * interessados):
+            await sio.manager.enter_room(sid, "/", SALA_TI)
+        else:
+            await sio.manager.enter_room(sid, "/", f"unidade:U{i % UNIDADES}")
+
+    # emit_evento usa o servidor do módulo; aponta para o de teste (sem coalescência)
+    realtime.sio = sio
+    realtime.REALTIME_COALESCE_MS = 0
+    payload = {"id": 1, "status": "Em andamento"}
+
+    enviados = 0
+    t0 = time.perf_counter()
+    for _ in range(emits):
+        await realtime.emit_evento("chamado:status", payload)
+    broadcast = (time.perf_counter() - t0) / emits
+    por_broadcast = enviados // emits
+
+    enviados = 0
+    t0 = time.perf_counter()
+    for i in range(emits):
+        await realtime.emit_evento("chamado:status", payload, room=salas_chamado(1, f"U{i % UNIDADES}"))
+    roteado = (time.perf_counter() - t0) / emits
+    por_roteado = enviados // emits
+    return broadcast, por_broadcast, roteado, por_roteado
+
+
+async def rajada(n: int, k: int, janela_ms: int) -> tuple[int, int, float]:
+    """Retorna (frames emitidos, envios por socket de setor:ti, segundos)."""
+    sio = socketio.AsyncServer(async_mode="asgi")
+    enviados = 0
+
+    async def _send(eio_sid, pkt):
+        nonlocal enviados
+        enviados += 1
+
+    sio._send_eio_packet = _send
+    for i in range(n):
+        sid = await sio.manager.connect(f"eio-{i}", "/")
+        await sio.manager.enter_room(sid, "/", SALA_TI)
+    realtime.sio = sio
+    realtime.REALTIME_COALESCE_MS = janela_ms
+    realtime._stats.update(events=0, frames=0)
+    t0 = time.perf_counter()
+    for i in range(k):
+        cid = i % 20
+        await realtime.emit_evento("chamado:status", {"id": cid, "status": "Em andamento"}, room=SALA_TI)
+        await realtime.emit_evento("notification:new", {"id": i, "titulo": f"Status {cid}"}, room=SALA_TI)
+        if i % 50 == 49:
+            # rajada espalhada por ~ (k/50) * 10 ms
+            await asyncio.sleep(0.01)
+    await asyncio.sleep(janela_ms / 1000 + 0.05)
+    dur = time.perf_counter() - t0
+    return realtime.realtime_stats()["frames"], enviados // max(1, n), dur
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clientes", default="100,1000,5000,20000")
+    ap.add_argument("--interessados", type=float, default=0.1)
+    ap.add_argument("--emits", type=int, default=200)
+    ap.add_argument("--rajada", type=int, default=0)
+    args = ap.parse_args()
+    janela = realtime.REALTIME_COALESCE_MS
+    print(f"{'clientes':>9} {'broadcast ms':>13} {'destinos':>9} {'salas ms':>9} {'destinos':>9}")
+    for n in [int(x) for x in args.clientes.split(",") if x.strip()]:
+        b, nb, r, nr = asyncio.run(medir(n, args.interessados, args.emits))
+        print(f"{n:>9} {b * 1000:>13.3f} {nb:>9} {r * 1000:>9.3f} {nr:>9}")
+    if args.rajada:
+        n = 200
+        print(f"\nrajada de {args.rajada} status + {args.rajada} notificações, {n} sockets em {SALA_TI}")
+        for ms in (0, janela or 200):
+            frames, por_socket, dur = asyncio.run(rajada(n, args.rajada, ms))
+            print(f"  janela {ms:>4} ms: {frames:>6} frames, {por_socket:>6} por socket, {dur:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,35 @@
+"""Remove/arquiva notificações antigas já lidas (para execução agendada, ex.: cron diário).
+
+Uso: python scripts/compactar_notificacoes.py [--dias 30] [--max-dias 180] [--modo apagar|arquivar] [--lote 500]
+"""
+from __future__ import annotations
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.db import SessionLocal  # noqa: E402
+from ti.services.notificacoes import (  # noqa: E402
+    NOTIF_RETENCAO_DIAS,
+    NOTIF_RETENCAO_MAX_DIAS,
+    NOTIF_RETENCAO_MODO,
+    compactar_notificacoes,
+)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dias", type=int, default=NOTIF_RETENCAO_DIAS)
+    ap.add_argument("--max-dias", type=int, default=NOTIF_RETENCAO_MAX_DIAS)
+    ap.add_argument("--modo", choices=("apagar", "arquivar"), default=NOTIF_RETENCAO_MODO)
+    ap.add_argument("--lote", type=int, default=500)
+    args = ap.parse_args()
+    with SessionLocal() as db:
+        total = compactar_notificacoes(db, dias=args.dias, max_dias=args.max_dias, modo=args.modo, lote=args.lote)
+    print(f"OK: {total} notificações compactadas")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
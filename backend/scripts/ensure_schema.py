@@ -2,7 +2,7 @@ from __future__ import annotations
 import sys
 from typing import Dict
 from sqlalchemy import inspect, text
-from core.db import engine
+from core.db import engine, ensure_column_length, ensure_index
 
 # Expected columns per table (MySQL dialect)
 EXPECTED: Dict[str, Dict[str, str]] = {
@@ -55,9 +55,48 @@ EXPECTED: Dict[str, Dict[str, str]] = {
         "status_anterior": "VARCHAR(20) NULL",
         "status_novo": "VARCHAR(20) NOT NULL",
         "criado_em": "DATETIME NULL",
+        "notificar": "TINYINT(1) NOT NULL DEFAULT 0",
     },
 }
 
+# VARCHAR columns widened after their table was first created: table -> column -> (length, ddl)
+WIDEN: Dict[str, Dict[str, tuple[int, str]]] = {
+    "outbox_evento": {
+        "sala": (255, "VARCHAR(255) NULL"),
+    },
+}
+
+# Expected secondary indexes per table: name -> columns
+INDEXES: Dict[str, Dict[str, tuple[str, ...]]] = {
+    "chamado": {
+        "ix_chamado_fila": ("status", "prioridade", "data_abertura"),
+        "ft_chamado_busca": ("codigo", "protocolo", "solicitante", "problema", "descricao"),
+    },
+    "historico_status": {
+        "ix_historico_status_notificar": ("notificar", "id"),
+    },
+    "notification": {
+        "ix_notification_usuario": ("usuario_id", "id"),
+        "ix_notification_criado": ("criado_em",),
+    },
+    "user": {
+        "ix_user_nome": ("nome",),
+        "ix_user_sobrenome": ("sobrenome",),
+    },
+    "user_setor": {
+        "ix_user_setor_setor": ("setor", "usuario_id"),
+    },
+}
+
+# Non-default index kinds (default: plain secondary index)
+INDEX_KINDS: Dict[str, str] = {
+    "ft_chamado_busca": "FULLTEXT",
+}
+
+# Data backfills (maintenance jobs, see ti/services/manutencao.py) run after the DDL.
+# Each is chunked and resumes from its checkpoint if a previous run was interrupted.
+BACKFILLS: tuple[str, ...] = ("backfill_user_setor",)
+
 
 def ensure_table_and_columns(table: str, cols: Dict[str, str]) -> list[str]:
     insp = inspect(engine)
@@ -79,6 +118,27 @@ def ensure_table_and_columns(table: str, cols: Dict[str, str]) -> list[str]:
     return actions
 
 
+def run_backfills() -> list[str]:
+    from core.db import SessionLocal
+    from ti.services.manutencao import jobs, status
+    from ti.services.user_setores import ensure_user_setor_schema
+
+    ensure_user_setor_schema()
+    actions: list[str] = []
+    available = jobs()
+    with SessionLocal() as db:
+        done = {cp["nome"] for cp in status(db) if cp["concluido"]}
+        for name in BACKFILLS:
+            if name in done:
+                continue
+            try:
+                total = available[name](db)
+                actions.append(f"backfill:{name} ({total})")
+            except Exception as e:
+                print(f"[error] backfill {name}: {e}")
+    return actions
+
+
 def main() -> int:
     total_actions: list[str] = []
     for table, cols in EXPECTED.items():
@@ -87,6 +147,21 @@ def main() -> int:
             total_actions.extend(actions)
         except Exception as e:
             print(f"[error] {table}: {e}")
+    for table, cols in WIDEN.items():
+        for name, (length, ddl) in cols.items():
+            try:
+                if ensure_column_length(table, name, length, ddl):
+                    total_actions.append(f"widened:{table}.{name}")
+            except Exception as e:
+                print(f"[error] {table}.{name}: {e}")
+    for table, indexes in INDEXES.items():
+        for name, columns in indexes.items():
+            try:
+                if ensure_index(table, name, columns, kind=INDEX_KINDS.get(name, "")):
+                    total_actions.append(f"index:{table}.{name}")
+            except Exception as e:
+                print(f"[error] {table}.{name}: {e}")
+    total_actions.extend(run_backfills())
     if not total_actions:
         print("OK: schema already up to date")
     else:
@@ -0,0 +1,37 @@
+"""Executa jobs de manutenção de dados em lotes, com checkpoint para retomar.
+
+Uso: python scripts/manutencao.py <job> [--lote 500] [--reiniciar]
+     python scripts/manutencao.py --status
+"""
+from __future__ import annotations
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.db import SessionLocal  # noqa: E402
+from ti.services.manutencao import jobs, status  # noqa: E402
+
+
+def main() -> int:
+    disponiveis = jobs()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("job", nargs="?", choices=sorted(disponiveis))
+    ap.add_argument("--lote", type=int, default=500)
+    ap.add_argument("--reiniciar", action="store_true", help="ignora o checkpoint e começa do início")
+    ap.add_argument("--status", action="store_true", help="mostra o checkpoint de cada job")
+    args = ap.parse_args()
+    with SessionLocal() as db:
+        if args.status or not args.job:
+            for cp in status(db):
+                estado = "concluído" if cp["concluido"] else f"parado em id={cp['ultimo_id']}"
+                print(f"{cp['nome']}: {estado}, processados={cp['processados']}, alterados={cp['alterados']}, atualizado_em={cp['atualizado_em']}")
+            return 0
+        total = disponiveis[args.job](db, lote=args.lote, retomar=not args.reiniciar)
+    print(f"OK: {args.job} -> {total}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
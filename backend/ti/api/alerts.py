@@ -1,20 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
-from core.db import get_db, engine
+from core.db import get_db, get_async_read_db, ensure_tables_async
 from ..models.alert import Alert
 from ..schemas.alert import AlertOut, AlertCreate
 
 router = APIRouter(prefix="/alerts", tags=["TI - Alerts"]) 
 
 @router.get("", response_model=List[AlertOut])
-def list_alerts(db: Session = Depends(get_db)):
+async def list_alerts(db: AsyncSession = Depends(get_async_read_db)):
     try:
-        try:
-            Alert.__table__.create(bind=engine, checkfirst=True)
-        except Exception:
-            pass
-        q = db.query(Alert).filter(Alert.ativo == True).order_by(Alert.id.desc()).all()
+        await ensure_tables_async(Alert.__table__)
+        q = (await db.execute(select(Alert).where(Alert.ativo == True).order_by(Alert.id.desc()))).scalars().all()
         return q
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao listar alertas: {e}")
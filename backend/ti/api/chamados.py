@@ -1,27 +1,58 @@
 from __future__ import annotations
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from core.db import get_db, engine
+from core.db import get_db, get_read_db, get_async_read_db, ensure_tables_async, engine, ReadSessionLocal, is_replica
 from ti.schemas.chamado import (
     ChamadoCreate,
     ChamadoOut,
     ChamadoStatusUpdate,
     ChamadoDeleteRequest,
+    ChamadoClaimRequest,
+    ChamadoBulkStatusUpdate,
+    ChamadoBulkStatusOut,
+    ChamadoImportOut,
+    ChamadoSearchOut,
+    ChamadoFullOut,
     ALLOWED_STATUSES,
 )
-from ti.services.chamados import criar_chamado as service_criar
-from core.realtime import sio
-from werkzeug.security import check_password_hash
+from ti.services.chamados import (
+    criar_chamado as service_criar,
+    assumir_proximo_chamado,
+    atualizar_status as service_atualizar_status,
+    atualizar_status_em_lote,
+    importar_chamados,
+    buscar_chamados,
+    obter_chamado,
+    ensure_chamado_schema,
+    ChamadoConflictError,
+)
+from core.realtime import emit_evento
+from core.passwords import PasswordPoolBusy, verify_password
 from ..models.notification import Notification
 import json
+import os
+from core.cache import LRUCache
 from core.utils import now_brazil_naive
 from ..models import Chamado, User, TicketAnexo, ChamadoAnexo, HistoricoTicket, HistoricoStatus
 from ti.schemas.attachment import AnexoOut
+from ti.services.arquivo import (
+    ARQUIVO_DIAS,
+    arquivar_chamados,
+    buscar_arquivado,
+    historico_arquivado,
+    tabela_arquivo,
+)
+from ti.services.notificacoes import notificacoes_criadas
+from ti.services.diretorio import id_por_email
+from ti.services import outbox
+from core.db import mark_flushed_nulls
 from ti.schemas.ticket import HistoricoItem, HistoricoResponse
-from sqlalchemy import inspect, text
-from core.email_msgraph import send_async, send_chamado_abertura, send_chamado_status
+from sqlalchemy import inspect, select, text
+from core.email_msgraph import send_async, send_many_async, send_chamado_abertura, send_chamado_status
 
-from fastapi.responses import Response
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from datetime import datetime
 
 router = APIRouter(prefix="/chamados", tags=["TI - Chamados"])
 
@@ -46,20 +77,113 @@ def _normalize_status(s: str) -> str:
     s_title = s.strip().title()
     return s_title if s_title in ALLOWED_STATUSES else "Aberto"
 
+def _filtrar_chamados(
+    stmt,
+    status: str | None = None,
+    unidade: str | None = None,
+    problema: str | None = None,
+    desde: datetime | None = None,
+    ate: datetime | None = None,
+):
+    """Filtros opcionais comuns à listagem e à exportação."""
+    if status:
+        stmt = stmt.where(Chamado.status == _normalize_status(status))
+    if unidade:
+        stmt = stmt.where(Chamado.unidade == unidade)
+    if problema:
+        stmt = stmt.where(Chamado.problema == problema)
+    if desde:
+        stmt = stmt.where(Chamado.data_abertura >= desde)
+    if ate:
+        stmt = stmt.where(Chamado.data_abertura <= ate)
+    return stmt
+
 @router.get("", response_model=list[ChamadoOut])
-def listar_chamados(db: Session = Depends(get_db)):
+async def listar_chamados(
+    status: str | None = None,
+    unidade: str | None = None,
+    problema: str | None = None,
+    desde: datetime | None = None,
+    ate: datetime | None = None,
+    db: AsyncSession = Depends(get_async_read_db),
+):
     try:
+        await ensure_tables_async(Chamado.__table__)
         try:
-            Chamado.__table__.create(bind=engine, checkfirst=True)
-        except Exception:
-            pass
-        try:
-            return db.query(Chamado).order_by(Chamado.id.desc()).all()
+            stmt = _filtrar_chamados(select(Chamado), status, unidade, problema, desde, ate)
+            return (await db.execute(stmt.order_by(Chamado.id.desc()))).scalars().all()
         except Exception:
             return []
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao listar chamados: {e}")
 
+@router.get("/search", response_model=ChamadoSearchOut)
+def buscar(q: str, page: int = 1, page_size: int = 20, db: Session = Depends(get_read_db)):
+    try:
+        page = max(1, int(page))
+        page_size = max(1, min(100, int(page_size)))
+        # busca um a mais para saber se existe próxima página
+        rows = buscar_chamados(db, q, limit=page_size + 1, offset=(page - 1) * page_size)
+        return {
+            "items": rows[:page_size],
+            "page": page,
+            "page_size": page_size,
+            "has_more": len(rows) > page_size,
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar chamados: {e}")
+
+# Colunas exportadas (mesmos campos de ChamadoOut)
+_EXPORT_COLS = [c for c in ChamadoOut.model_fields.keys() if hasattr(Chamado, c)]
+
+@router.get("/export")
+def exportar_chamados(
+    format: str = "csv",
+    status: str | None = None,
+    unidade: str | None = None,
+    problema: str | None = None,
+    desde: datetime | None = None,
+    ate: datetime | None = None,
+):
+    """Exportação em streaming (CSV ou NDJSON). Usa cursor no servidor (stream_results) e
+    lê em blocos de yield_per, então a memória fica constante e o primeiro byte sai logo."""
+    fmt = (format or "csv").strip().lower()
+    if fmt not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="Formato inválido (use csv ou ndjson)")
+    cols = [getattr(Chamado, c) for c in _EXPORT_COLS]
+    stmt = _filtrar_chamados(select(*cols), status, unidade, problema, desde, ate).order_by(Chamado.id.asc())
+
+    def _fmt(v):
+        return v.isoformat() if hasattr(v, "isoformat") else v
+
+    def _gerar():
+        import io
+        import csv
+        # Sessão própria: a do Depends(get_db) é fechada antes do fim do streaming.
+        # Relatório tolera atraso de replicação, então vai direto para a réplica.
+        with ReadSessionLocal() as sdb:
+            res = sdb.execute(stmt.execution_options(stream_results=True, yield_per=1000))
+            if fmt == "csv":
+                buf = io.StringIO()
+                w = csv.writer(buf)
+                w.writerow(_EXPORT_COLS)
+                yield buf.getvalue()
+                for part in res.partitions():
+                    buf.seek(0)
+                    buf.truncate()
+                    w.writerows([[_fmt(v) for v in row] for row in part])
+                    yield buf.getvalue()
+            else:
+                for part in res.partitions():
+                    yield "".join(
+                        json.dumps({k: _fmt(v) for k, v in zip(_EXPORT_COLS, row)}, ensure_ascii=False) + "\n"
+                        for row in part
+                    )
+
+    media = "text/csv; charset=utf-8" if fmt == "csv" else "application/x-ndjson"
+    headers = {"Content-Disposition": f"attachment; filename=chamados.{fmt}"}
+    return StreamingResponse(_gerar(), media_type=media, headers=headers)
+
 @router.post("", response_model=ChamadoOut)
 def criar_chamado(payload: ChamadoCreate, db: Session = Depends(get_db)):
     try:
@@ -67,9 +191,10 @@ def criar_chamado(payload: ChamadoCreate, db: Session = Depends(get_db)):
             Chamado.__table__.create(bind=engine, checkfirst=True)
         except Exception:
             pass
-        ch = service_criar(db, payload)
+        ensure_chamado_schema()
+        # Chamado, notificação e eventos do outbox num único commit
         try:
-            Notification.__table__.create(bind=engine, checkfirst=True)
+            ch = service_criar(db, payload, commit=False)
             dados = json.dumps({
                 "id": ch.id,
                 "codigo": ch.codigo,
@@ -86,24 +211,18 @@ def criar_chamado(payload: ChamadoCreate, db: Session = Depends(get_db)):
                 dados=dados,
             )
             db.add(n)
+            db.flush()
+            mark_flushed_nulls(n)
+            outbox.registrar(db, "chamado:created", {"id": ch.id}, sala=outbox.salas_chamado(ch.id, ch.unidade))
+            outbox.registrar(db, "notification:new", outbox.notificacao_payload(n), sala=outbox.sala_notificacao(n))
+            db.expunge(ch)
+            db.expunge(n)
             db.commit()
-            db.refresh(n)
-            import anyio
-            anyio.from_thread.run(sio.emit, "chamado:created", {"id": ch.id})
-            anyio.from_thread.run(sio.emit, "notification:new", {
-                "id": n.id,
-                "tipo": n.tipo,
-                "titulo": n.titulo,
-                "mensagem": n.mensagem,
-                "recurso": n.recurso,
-                "recurso_id": n.recurso_id,
-                "acao": n.acao,
-                "dados": n.dados,
-                "lido": n.lido,
-                "criado_em": n.criado_em.isoformat() if n.criado_em else None,
-            })
         except Exception:
-            pass
+            db.rollback()
+            raise
+        notificacoes_criadas()
+        outbox.avisar()
         try:
             send_async(send_chamado_abertura, ch)
         except Exception:
@@ -114,10 +233,119 @@ def criar_chamado(payload: ChamadoCreate, db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao criar chamado: {e}")
 
+@router.post("/next", response_model=ChamadoOut)
+def assumir_proximo(payload: ChamadoClaimRequest, db: Session = Depends(get_db)):
+    try:
+        ch = assumir_proximo_chamado(db, payload.usuario_id)
+        if not ch:
+            raise HTTPException(status_code=404, detail="Nenhum chamado aberto na fila")
+        _invalidar_cache(ch.id)
+        outbox.avisar()
+        try:
+            send_async(send_chamado_status, ch, "Aberto")
+        except Exception:
+            pass
+        return ch
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao assumir chamado: {e}")
+
+def _iter_import_rows(f: UploadFile, formato: str):
+    """Lê o arquivo linha a linha (sem carregá-lo inteiro) e produz (linha, dict | Exception)."""
+    import io
+    import csv
+    stream = io.TextIOWrapper(f.file, encoding="utf-8-sig", newline="")
+    if formato == "csv":
+        reader = csv.DictReader(stream)
+        for i, row in enumerate(reader, start=2):
+            yield i, {k.strip(): (v if v != "" else None) for k, v in row.items() if k}
+        return
+    for i, raw in enumerate(stream, start=1):
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            obj = json.loads(raw)
+            if not isinstance(obj, dict):
+                raise ValueError("Linha não é um objeto JSON")
+            yield i, obj
+        except Exception as e:
+            yield i, e
+
+@router.post("/import", response_model=ChamadoImportOut)
+def importar(
+    file: UploadFile = File(...),
+    formato: str | None = Form(None),
+    notificar: bool = Form(False),
+    enviar_emails: bool = Form(False),
+    db: Session = Depends(get_db),
+):
+    """Importação em lote (NDJSON ou CSV). Notificações e e-mails são opcionais:
+    `notificar` gera uma única notificação-resumo; `enviar_emails` envia os e-mails
+    de abertura em sequência a partir de uma única thread."""
+    try:
+        fmt = (formato or "").strip().lower()
+        if not fmt:
+            nome = (file.filename or "").lower()
+            fmt = "csv" if nome.endswith(".csv") or "csv" in (file.content_type or "") else "ndjson"
+        if fmt not in ("csv", "ndjson"):
+            raise HTTPException(status_code=400, detail="Formato inválido (use csv ou ndjson)")
+        res = importar_chamados(db, _iter_import_rows(file, fmt), coletar_codigos=notificar or enviar_emails)
+        codigos = res["codigos"]
+        if codigos and enviar_emails:
+            try:
+                chamados = []
+                for i in range(0, len(codigos), 500):
+                    chamados.extend(db.query(Chamado).filter(Chamado.codigo.in_(codigos[i:i + 500])).all())
+                for c in chamados:
+                    db.expunge(c)
+                send_many_async(send_chamado_abertura, [(c,) for c in chamados])
+            except Exception:
+                pass
+        if codigos and notificar:
+            try:
+                n = Notification(
+                    tipo="chamado",
+                    titulo=f"{len(codigos)} chamados importados",
+                    mensagem=f"Importação {fmt.upper()}: {codigos[0]} a {codigos[-1]}",
+                    recurso="chamado",
+                    recurso_id=None,
+                    acao="importado",
+                    dados=json.dumps({"importados": len(codigos), "erros": len(res["erros"])}, ensure_ascii=False),
+                )
+                db.add(n)
+                db.commit()
+                db.refresh(n)
+                notificacoes_criadas()
+                import anyio
+                anyio.from_thread.run(
+                    lambda: emit_evento("chamado:created", {"importados": len(codigos)}, room=outbox.SALA_TI)
+                )
+                anyio.from_thread.run(
+                    lambda: emit_evento("notification:new", outbox.notificacao_payload(n), room=outbox.SALA_TI)
+                )
+            except Exception:
+                pass
+        return {"importados": res["importados"], "erros": res["erros"]}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao importar chamados: {e}")
+
+# Colunas por tabela (a estrutura só muda via _ensure_column, que invalida a entrada)
+_cols_cache: dict[str, set[str]] = {}
+
 def _cols(table: str) -> set[str]:
+    cached = _cols_cache.get(table)
+    if cached:
+        return cached
     try:
         insp = inspect(engine)
-        return {c.get("name") for c in insp.get_columns(table)}
+        cols = {c.get("name") for c in insp.get_columns(table)}
+        if cols:
+            _cols_cache[table] = cols
+        return cols
     except Exception:
         return set()
 
@@ -126,6 +354,7 @@ def _ensure_column(table: str, column: str, ddl: str) -> None:
         if column not in _cols(table):
             with engine.connect() as conn:
                 conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+            _cols_cache.pop(table, None)
     except Exception:
         pass
 
@@ -212,8 +441,7 @@ def criar_chamado_com_anexos(
             user_id = None
             if autor_email:
                 try:
-                    user = db.query(User).filter(User.email == autor_email).first()
-                    user_id = user.id if user else None
+                    user_id = id_por_email(db, autor_email)
                 except Exception:
                     user_id = None
             import hashlib
@@ -309,8 +537,7 @@ def enviar_ticket(
         user_id = None
         if autor_email:
             try:
-                user = db.query(User).filter(User.email == autor_email).first()
-                user_id = user.id if user else None
+                user_id = id_por_email(db, autor_email)
             except Exception:
                 user_id = None
         # registrar histórico via ORM
@@ -326,6 +553,7 @@ def enviar_ticket(
         db.commit()
         db.refresh(h)
         h_id = h.id
+        _invalidar_cache(chamado_id)
         # salvar anexos em tickets_anexos com metadados e caminho
         if files:
             import hashlib
@@ -364,14 +592,23 @@ def enviar_ticket(
             db.commit()
             if files and saved == 0:
                 raise HTTPException(status_code=500, detail="Falha ao salvar anexos do ticket")
+        _invalidar_cache(chamado_id)
         return {"ok": True, "historico_id": h_id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao enviar ticket: {e}")
 
+def _baixar_arquivado(table: str, anexo_id: int, db: Session):
+    try:
+        return db.execute(text(_select_download_query(tabela_arquivo(table))), {"i": anexo_id}).fetchone()
+    except Exception:
+        return None
+
 @router.get("/anexos/chamado/{anexo_id}")
 def baixar_anexo_chamado(anexo_id: int, db: Session = Depends(get_db)):
     sql = _select_download_query("chamado_anexo")
     res = db.execute(text(sql), {"i": anexo_id}).fetchone()
+    if not res:
+        res = _baixar_arquivado("chamado_anexo", anexo_id, db)
     if not res or not res[4]:
         raise HTTPException(status_code=404, detail="Anexo não encontrado")
     nome = res[1] or res[2] or f"anexo_{anexo_id}"
@@ -383,6 +620,8 @@ def baixar_anexo_chamado(anexo_id: int, db: Session = Depends(get_db)):
 def baixar_anexo_ticket(anexo_id: int, db: Session = Depends(get_db)):
     sql = _select_download_query("ticket_anexos")
     res = db.execute(text(sql), {"i": anexo_id}).fetchone()
+    if not res:
+        res = _baixar_arquivado("ticket_anexos", anexo_id, db)
     if not res or not res[4]:
         raise HTTPException(status_code=404, detail="Anexo não encontrado")
     nome = res[1] or res[2] or f"anexo_{anexo_id}"
@@ -390,105 +629,253 @@ def baixar_anexo_ticket(anexo_id: int, db: Session = Depends(get_db)):
     headers = {"Content-Disposition": f"inline; filename={nome}"}
     return Response(content=res[4], media_type=mime, headers=headers)
 
-@router.get("/{chamado_id}/historico", response_model=HistoricoResponse)
-def obter_historico(chamado_id: int, db: Session = Depends(get_db)):
+@router.get("/lookup", response_model=ChamadoOut)
+def buscar_por_identificador(codigo: str | None = None, protocolo: str | None = None, db: Session = Depends(get_db)):
+    if not codigo and not protocolo:
+        raise HTTPException(status_code=400, detail="Informe codigo ou protocolo")
+    ch = obter_chamado(db, codigo=codigo, protocolo=protocolo)
+    if not ch:
+        raise HTTPException(status_code=404, detail="Chamado não encontrado")
+    return ch
+
+@router.post("/arquivar")
+def arquivar(dias: int = ARQUIVO_DIAS, lote: int = 200, db: Session = Depends(get_db)):
+    """Move chamados encerrados há mais de `dias` dias para o arquivo (uso administrativo)."""
     try:
-        items: list[HistoricoItem] = []
-        ch = db.query(Chamado).filter(Chamado.id == chamado_id).first()
-        if not ch:
+        movidos = arquivar_chamados(db, dias=dias, lote=max(1, min(1000, int(lote))))
+        return {"arquivados": movidos}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao arquivar chamados: {e}")
+
+@router.get("/{chamado_id}", response_model=ChamadoOut)
+def obter(chamado_id: int, db: Session = Depends(get_db)):
+    ch = obter_chamado(db, chamado_id=chamado_id)
+    if not ch:
+        raise HTTPException(status_code=404, detail="Chamado não encontrado")
+    return ch
+
+def _montar_detalhe(db: Session, chamado_id: int) -> tuple[object, list[HistoricoItem], list[AnexoOut]]:
+    """Monta chamado, timeline e metadados de anexos com um número fixo de consultas:
+    chamado, anexos de abertura, historico_status, historicos_tickets e anexos de ticket
+    (estes lidos uma única vez e distribuídos pelos envios). Seções que falharem ficam de fora.
+    """
+    items: list[HistoricoItem] = []
+    anexos: list[AnexoOut] = []
+    ensure_chamado_schema()
+    ch = db.query(Chamado).filter(Chamado.id == chamado_id).first()
+    # Chamados arquivados: mesmas informações, lidas das tabelas *_arquivo
+    arquivado = None
+    t_anexo, t_ticket_anexo = "chamado_anexo", "ticket_anexos"
+    if not ch:
+        reg = buscar_arquivado(db, chamado_id=chamado_id)
+        if not reg:
             raise HTTPException(status_code=404, detail="Chamado não encontrado")
-        # anexos enviados na abertura (chamado_anexo) e descrição do chamado
-        sql_an = _select_anexo_query("chamado_anexo") + " WHERE chamado_id=:i ORDER BY data_upload ASC"
+        from types import SimpleNamespace
+        ch = SimpleNamespace(**reg)
+        arquivado = historico_arquivado(db, chamado_id)
+        t_anexo, t_ticket_anexo = tabela_arquivo(t_anexo), tabela_arquivo(t_ticket_anexo)
+
+    class _A:
+        def __init__(self, r):
+            self.id, self.nome_original, self.caminho_arquivo, self.mime_type, self.tamanho_bytes, self.data_upload = r
+
+    # anexos enviados na abertura (chamado_anexo) e descrição do chamado
+    first_dt = ch.data_abertura or now_brazil_naive()
+    anexos_abertura = None
+    try:
+        sql_an = _select_anexo_query(t_anexo) + " WHERE chamado_id=:i ORDER BY data_upload ASC"
         rows = db.execute(text(sql_an), {"i": chamado_id}).fetchall()
-        anexos_abertura = None
-        first_dt = ch.data_abertura or now_brazil_naive()
         if rows:
             first_dt = rows[0][5] or first_dt
-            class _CA:
-                def __init__(self, r):
-                    self.id, self.nome_original, self.caminho_arquivo, self.mime_type, self.tamanho_bytes, self.data_upload = r
-            anexos_abertura = [AnexoOut.model_validate(_CA(r)) for r in rows]
-        # Item 1: Aberto em
+            anexos_abertura = [AnexoOut.model_validate(_A(r)) for r in rows]
+            anexos.extend(anexos_abertura)
+    except Exception:
+        pass
+    # Item 1: Aberto em
+    items.append(HistoricoItem(
+        t=first_dt,
+        tipo="abertura",
+        label="Aberto em",
+        anexos=anexos_abertura,
+    ))
+    # Item 2: Descrição (se houver)
+    if ch.descricao:
         items.append(HistoricoItem(
             t=first_dt,
             tipo="abertura",
-            label="Aberto em",
-            anexos=anexos_abertura,
+            label=f"Descrição: \n{ch.descricao}",
+            anexos=None,
         ))
-        # Item 2: Descrição (se houver)
-        if ch.descricao:
+    try:
+        # Priorize historico_status for status events
+        if arquivado is not None:
+            hs_rows = arquivado[0]
+        else:
+            hs_rows = db.query(HistoricoStatus).filter(HistoricoStatus.chamado_id == chamado_id).order_by(HistoricoStatus.criado_em.asc()).all()
+        for r in hs_rows:
             items.append(HistoricoItem(
-                t=first_dt,
-                tipo="abertura",
-                label=f"Descrição: \n{ch.descricao}",
+                t=r.criado_em or now_brazil_naive(),
+                tipo="status",
+                label=f"{r.status_anterior or 'Aberto'} → {r.status_novo}",
                 anexos=None,
             ))
-        try:
-            Notification.__table__.create(bind=engine, checkfirst=True)
-            HistoricoStatus.__table__.create(bind=engine, checkfirst=True)
-            # Priorize historico_status for status events
-            hs_rows = db.query(HistoricoStatus).filter(HistoricoStatus.chamado_id == chamado_id).order_by(HistoricoStatus.criado_em.asc()).all()
-            for r in hs_rows:
-                items.append(HistoricoItem(
-                    t=r.criado_em or now_brazil_naive(),
-                    tipo="status",
-                    label=f"{r.status_anterior or 'Aberto'} → {r.status_novo}",
-                    anexos=None,
-                ))
-            # Fallback somente se não houver historico_status
-            if not hs_rows:
-                notas = db.query(Notification).filter(
-                    Notification.recurso == "chamado",
-                    Notification.recurso_id == chamado_id,
-                ).order_by(Notification.criado_em.asc()).all()
-                for n in notas:
-                    if n.acao == "status":
-                        items.append(HistoricoItem(
-                            t=n.criado_em or now_brazil_naive(),
-                            tipo="status",
-                            label=n.mensagem or "Status atualizado",
-                            anexos=None,
-                        ))
-        except Exception:
-            pass
-        # histórico (historico_tickets via ORM) - ignora se tabela não existir
-        try:
+        # Fallback somente se não houver historico_status
+        if not hs_rows:
+            notas = db.query(Notification).filter(
+                Notification.recurso == "chamado",
+                Notification.recurso_id == chamado_id,
+            ).order_by(Notification.criado_em.asc()).all()
+            for n in notas:
+                if n.acao == "status":
+                    items.append(HistoricoItem(
+                        t=n.criado_em or now_brazil_naive(),
+                        tipo="status",
+                        label=n.mensagem or "Status atualizado",
+                        anexos=None,
+                    ))
+    except Exception:
+        pass
+    # histórico (historico_tickets via ORM) - ignora se tabela não existir
+    try:
+        if arquivado is not None:
+            hs = arquivado[1]
+        else:
             hs = db.query(HistoricoTicket).filter(HistoricoTicket.chamado_id == chamado_id).order_by(HistoricoTicket.data_envio.asc()).all()
+    except Exception:
+        hs = []
+    tas = []
+    if hs:
+        try:
+            sql_ta = _select_anexo_query(t_ticket_anexo) + " WHERE chamado_id=:i"
+            tas = db.execute(text(sql_ta), {"i": chamado_id}).fetchall()
+            anexos.extend(AnexoOut.model_validate(_A(ta)) for ta in tas)
         except Exception:
-            hs = []
-        for h in hs:
-            anexos_ticket = []
+            tas = []
+    from datetime import timedelta
+    for h in hs:
+        # anexos do ticket: enviados até 3 minutos antes/depois do envio
+        start = (h.data_envio or now_brazil_naive()) - timedelta(minutes=3)
+        end = (h.data_envio or now_brazil_naive()) + timedelta(minutes=3)
+        anexos_ticket = [AnexoOut.model_validate(_A(ta)) for ta in tas if ta[5] and start <= ta[5] <= end]
+        items.append(HistoricoItem(
+            t=h.data_envio or now_brazil_naive(),
+            tipo="ticket",
+            label=f"{h.assunto}",
+            anexos=anexos_ticket or None,
+        ))
+    return ch, sorted(items, key=lambda x: x.t), anexos
+
+# Timeline serializada (HistoricoResponse) por chamado. As escritas deste processo invalidam
+# a entrada na hora; o TTL limita quanto tempo outro worker pode servir uma versão antiga.
+_historico_cache = LRUCache(
+    maxsize=int(os.getenv("HISTORICO_CACHE_SIZE", "2000")),
+    ttl=float(os.getenv("HISTORICO_CACHE_TTL", "30")),
+)
+# Detalhe completo por chamado: (etag, corpo JSON)
+_detalhe_cache = LRUCache(maxsize=int(os.getenv("CHAMADO_DETALHE_CACHE_SIZE", "1000")))
+
+def _invalidar_cache(*chamado_ids: int) -> None:
+    for cid in chamado_ids:
+        _historico_cache.pop(cid)
+        _detalhe_cache.pop(cid)
+
+@router.get("/cache/stats")
+def cache_stats():
+    return {"historico": _historico_cache.stats(), "detalhe": _detalhe_cache.stats()}
+
+@router.get("/{chamado_id}/historico", response_model=HistoricoResponse)
+def obter_historico(chamado_id: int, db: Session = Depends(get_read_db)):
+    body = _historico_cache.get(chamado_id)
+    if body is not None:
+        return JSONResponse(body)
+    try:
+        _, items, _ = _montar_detalhe(db, chamado_id)
+        body = HistoricoResponse(items=items).model_dump(mode="json")
+        # Leitura da réplica pode ser anterior à última invalidação: não vai para o cache
+        if not is_replica(db):
+            _historico_cache.set(chamado_id, body)
+        return JSONResponse(body)
+    except HTTPException:
+        raise
+    except Exception:
+        # Retorna vazio para não quebrar o painel
+        return HistoricoResponse(items=[])
+
+def _etag_chamado(db: Session, chamado_id: int) -> str | None:
+    """Identifica a última alteração do chamado numa única consulta: versao + maior id
+    de cada tabela filha. Chamados arquivados não mudam mais. None se não existir."""
+    try:
+        row = db.execute(text(
+            "SELECT c.versao,"
+            " (SELECT MAX(id) FROM historico_status WHERE chamado_id = c.id),"
+            " (SELECT MAX(id) FROM historicos_tickets WHERE chamado_id = c.id),"
+            " (SELECT MAX(id) FROM chamado_anexo WHERE chamado_id = c.id),"
+            " (SELECT MAX(id) FROM ticket_anexos WHERE chamado_id = c.id)"
+            " FROM chamado c WHERE c.id = :i"
+        ), {"i": chamado_id}).fetchone()
+    except Exception:
+        return None
+    if row:
+        return 'W/"' + "-".join(str(x or 0) for x in (chamado_id, *row)) + '"'
+    if buscar_arquivado(db, chamado_id=chamado_id):
+        return f'W/"{chamado_id}-arquivo"'
+    return None
+
+@router.get("/{chamado_id}/full", response_model=ChamadoFullOut)
+def obter_completo(chamado_id: int, request: Request, db: Session = Depends(get_db)):
+    """Chamado + timeline + anexos numa chamada. Responde 304 quando o If-None-Match
+    bate com a versão atual e serve do cache em memória enquanto o chamado não mudar."""
+    try:
+        etag = _etag_chamado(db, chamado_id)
+        if etag and request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        cached = _detalhe_cache.get(chamado_id) if etag else None
+        if cached and cached[0] == etag:
+            body = cached[1]
+        else:
+            ch, items, anexos = _montar_detalhe(db, chamado_id)
+            body = ChamadoFullOut(
+                chamado=ChamadoOut.model_validate(ch),
+                historico=items,
+                anexos=anexos,
+            ).model_dump(mode="json")
+            if etag:
+                _detalhe_cache.set(chamado_id, (etag, body))
+        headers = {"Cache-Control": "private, no-cache"}
+        if etag:
+            headers["ETag"] = etag
+        return JSONResponse(body, headers=headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao obter chamado: {e}")
+
+@router.patch("/status", response_model=ChamadoBulkStatusOut)
+def atualizar_status_lote(payload: ChamadoBulkStatusUpdate, db: Session = Depends(get_db)):
+    try:
+        novo = _normalize_status(payload.status)
+        if novo not in ALLOWED_STATUSES:
+            raise HTTPException(status_code=400, detail="Status inválido")
+        alterados, anteriores, nao_encontrados = atualizar_status_em_lote(db, payload.ids, novo, usuario_id=payload.usuario_id)
+        ids_alterados = [c.id for c in alterados]
+        _invalidar_cache(*ids_alterados)
+        if alterados:
+            outbox.avisar()
             try:
-                from datetime import timedelta
-                start = (h.data_envio or now_brazil_naive()) - timedelta(minutes=3)
-                end = (h.data_envio or now_brazil_naive()) + timedelta(minutes=3)
-                sql_ta = _select_anexo_query("ticket_anexos") + " WHERE chamado_id=:i"
-                tas = db.execute(text(sql_ta), {"i": chamado_id}).fetchall()
-                for ta in tas:
-                    dt = ta[5]
-                    if dt and start <= dt <= end:
-                        class _A:
-                            id, nome_original, caminho_arquivo, mime_type, tamanho_bytes, data_upload = ta
-                        anexos_ticket.append(_A())
+                send_many_async(send_chamado_status, [(c, anteriores[c.id]) for c in alterados])
             except Exception:
                 pass
-            items.append(HistoricoItem(
-                t=h.data_envio or now_brazil_naive(),
-                tipo="ticket",
-                label=f"{h.assunto}",
-                anexos=[AnexoOut.model_validate(a) for a in anexos_ticket] if anexos_ticket else None,
-            ))
-        items_sorted = sorted(items, key=lambda x: x.t)
-        return HistoricoResponse(items=items_sorted)
+        alterados_set = set(ids_alterados) | set(nao_encontrados)
+        return {
+            "status": novo,
+            "atualizados": ids_alterados,
+            "ignorados": [i for i in sorted(set(payload.ids)) if i not in alterados_set],
+            "nao_encontrados": nao_encontrados,
+        }
     except HTTPException:
         raise
-    except Exception:
-        # Retorna o que foi possível montar para não quebrar o painel
-        try:
-            items_sorted = sorted(items, key=lambda x: x.t)
-            return HistoricoResponse(items=items_sorted)
-        except Exception:
-            return HistoricoResponse(items=[])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao atualizar status em lote: {e}")
 
 @router.patch("/{chamado_id}/status", response_model=ChamadoOut)
 def atualizar_status(chamado_id: int, payload: ChamadoStatusUpdate, db: Session = Depends(get_db)):
@@ -496,67 +883,15 @@ def atualizar_status(chamado_id: int, payload: ChamadoStatusUpdate, db: Session
         novo = _normalize_status(payload.status)
         if novo not in ALLOWED_STATUSES:
             raise HTTPException(status_code=400, detail="Status inválido")
-        ch = db.query(Chamado).filter(Chamado.id == chamado_id).first()
-        if not ch:
-            raise HTTPException(status_code=404, detail="Chamado não encontrado")
-        prev = ch.status or "Aberto"
-        ch.status = novo
-        if prev == "Aberto" and novo != "Aberto" and ch.data_primeira_resposta is None:
-            ch.data_primeira_resposta = now_brazil_naive()
-        if novo == "Concluído":
-            ch.data_conclusao = now_brazil_naive()
-        db.add(ch)
-        db.commit()  # garante persistência do status antes dos logs
-        db.refresh(ch)
         try:
-            Notification.__table__.create(bind=engine, checkfirst=True)
-            HistoricoTicket.__table__.create(bind=engine, checkfirst=True)
-            HistoricoStatus.__table__.create(bind=engine, checkfirst=True)
-            dados = json.dumps({
-                "id": ch.id,
-                "codigo": ch.codigo,
-                "protocolo": ch.protocolo,
-                "status": ch.status,
-                "status_anterior": prev,
-            }, ensure_ascii=False)
-            n = Notification(
-                tipo="chamado",
-                titulo=f"Status atualizado: {ch.codigo}",
-                mensagem=f"{prev} → {ch.status}",
-                recurso="chamado",
-                recurso_id=ch.id,
-                acao="status",
-                dados=dados,
-            )
-            db.add(n)
-            # registrar em historico_status (única fonte de verdade)
-            hs = HistoricoStatus(
-                chamado_id=ch.id,
-                usuario_id=None,
-                status_anterior=prev,
-                status_novo=ch.status,
-                criado_em=now_brazil_naive(),
-            )
-            db.add(hs)
-            db.commit()
-            db.refresh(n)
-            import anyio
-            anyio.from_thread.run(sio.emit, "chamado:status", {"id": ch.id, "status": ch.status})
-            anyio.from_thread.run(sio.emit, "notification:new", {
-                "id": n.id,
-                "tipo": n.tipo,
-                "titulo": n.titulo,
-                "mensagem": n.mensagem,
-                "recurso": n.recurso,
-                "recurso_id": n.recurso_id,
-                "acao": n.acao,
-                "dados": n.dados,
-                "lido": n.lido,
-                "criado_em": n.criado_em.isoformat() if n.criado_em else None,
-            })
-        except Exception:
-            db.rollback()
-            pass
+            res = service_atualizar_status(db, chamado_id, novo, versao=payload.versao, usuario_id=payload.usuario_id)
+        except ChamadoConflictError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        if res is None:
+            raise HTTPException(status_code=404, detail="Chamado não encontrado")
+        ch, prev = res
+        _invalidar_cache(ch.id)
+        outbox.avisar()
         try:
             send_async(send_chamado_status, ch, prev)
         except Exception:
@@ -573,16 +908,13 @@ def deletar_chamado(chamado_id: int, payload: ChamadoDeleteRequest, db: Session
         user = db.query(User).filter(User.email == payload.email).first()
         if not user:
             raise HTTPException(status_code=401, detail="Usuário não encontrado")
-        from werkzeug.security import check_password_hash as _chk
-        if not _chk(user.senha_hash, payload.senha):
+        if not verify_password(user.senha_hash, payload.senha):
             raise HTTPException(status_code=401, detail="Senha inválida")
         ch = db.query(Chamado).filter(Chamado.id == chamado_id).first()
         if not ch:
             raise HTTPException(status_code=404, detail="Chamado não encontrado")
-        db.delete(ch)
-        db.commit()
+        ensure_chamado_schema()
         try:
-            Notification.__table__.create(bind=engine, checkfirst=True)
             dados = json.dumps({
                 "id": chamado_id,
                 "codigo": ch.codigo,
@@ -597,27 +929,23 @@ def deletar_chamado(chamado_id: int, payload: ChamadoDeleteRequest, db: Session
                 acao="excluido",
                 dados=dados,
             )
+            db.delete(ch)
             db.add(n)
+            db.flush()
+            mark_flushed_nulls(n)
+            outbox.registrar(db, "chamado:deleted", {"id": chamado_id}, sala=outbox.salas_chamado(chamado_id, ch.unidade))
+            outbox.registrar(db, "notification:new", outbox.notificacao_payload(n), sala=outbox.sala_notificacao(n))
             db.commit()
-            db.refresh(n)
-            import anyio
-            anyio.from_thread.run(sio.emit, "chamado:deleted", {"id": chamado_id})
-            anyio.from_thread.run(sio.emit, "notification:new", {
-                "id": n.id,
-                "tipo": n.tipo,
-                "titulo": n.titulo,
-                "mensagem": n.mensagem,
-                "recurso": n.recurso,
-                "recurso_id": n.recurso_id,
-                "acao": n.acao,
-                "dados": n.dados,
-                "lido": n.lido,
-                "criado_em": n.criado_em.isoformat() if n.criado_em else None,
-            })
         except Exception:
-            pass
+            db.rollback()
+            raise
+        _invalidar_cache(chamado_id)
+        notificacoes_criadas()
+        outbox.avisar()
         return {"ok": True}
     except HTTPException:
         raise
+    except PasswordPoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao excluir chamado: {e}")
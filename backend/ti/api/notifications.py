@@ -1,34 +1,71 @@
 from __future__ import annotations
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from core.db import get_db, engine
+from core.db import get_db, get_read_db, get_async_read_db
 from ..models.notification import Notification
-from ..schemas.notification import NotificationOut
+from ..schemas.notification import NotificationOut, NotificationUnreadOut, NotificationReadUpTo
+from ..services.notificacoes import (
+    contar_nao_lidas,
+    listar_para_usuario,
+    marcar_lida,
+    marcar_lidas_ate,
+)
 
 router = APIRouter(prefix="/notifications", tags=["TI - Notificações"]) 
 
 @router.get("", response_model=list[NotificationOut])
-def list_notifications(limit: int = 50, db: Session = Depends(get_db)):
+async def list_notifications(
+    limit: int = 50,
+    usuario_id: int | None = None,
+    before_id: int | None = None,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    # Paginação por cursor: a próxima página usa before_id = menor id recebido
     try:
-        try:
-            Notification.__table__.create(bind=engine, checkfirst=True)
-        except Exception:
-            pass
-        q = (
-            db.query(Notification)
-            .order_by(Notification.id.desc())
-            .limit(max(1, min(500, int(limit))))
-        )
-        return q.all()
+        limit = max(1, min(500, int(limit)))
+        if usuario_id is not None:
+            # Caixa de entrada do usuário: próprias + gerais, com leitura por usuário
+            # (o serviço é síncrono; run_sync o executa na conexão async, sem threadpool,
+            # por isso não faz DDL: as tabelas são garantidas no startup)
+            return await db.run_sync(listar_para_usuario, usuario_id, limit, before_id=before_id)
+        q = select(Notification)
+        if before_id is not None:
+            q = q.where(Notification.id < before_id)
+        q = q.order_by(Notification.id.desc()).limit(limit)
+        return (await db.execute(q)).scalars().all()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao listar notificações: {e}")
 
+@router.get("/unread-count", response_model=NotificationUnreadOut)
+def unread_count(usuario_id: int, db: Session = Depends(get_read_db)):
+    try:
+        return {"usuario_id": usuario_id, "nao_lidas": contar_nao_lidas(db, usuario_id)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao contar notificações: {e}")
+
+@router.post("/read-up-to", response_model=NotificationUnreadOut)
+def read_up_to(payload: NotificationReadUpTo, db: Session = Depends(get_db)):
+    try:
+        n = marcar_lidas_ate(db, payload.usuario_id, payload.ate_id)
+        return {"usuario_id": payload.usuario_id, "nao_lidas": n}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao atualizar notificações: {e}")
+
 @router.patch("/{notification_id}/read", response_model=NotificationOut)
-def mark_read(notification_id: int, db: Session = Depends(get_db)):
+def mark_read(notification_id: int, usuario_id: int | None = None, db: Session = Depends(get_db)):
     try:
         n = db.query(Notification).filter(Notification.id == notification_id).first()
         if not n:
             raise HTTPException(status_code=404, detail="Notificação não encontrada")
+        if usuario_id is not None:
+            if n.usuario_id is not None and n.usuario_id != usuario_id:
+                raise HTTPException(status_code=404, detail="Notificação não encontrada")
+            marcar_lida(db, usuario_id, notification_id)
+            out = NotificationOut.model_validate(n).model_dump()
+            out["lido"] = True
+            return out
         if not n.lido:
             from core.utils import now_brazil_naive
             n.lido = True
@@ -1,20 +1,18 @@
 from __future__ import annotations
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import text
-from core.db import get_db, engine
+from sqlalchemy import select, text
+from core.db import get_db, get_async_read_db, ensure_tables_async, engine
 from ti.schemas.problema import ProblemaCreate, ProblemaOut
 
 router = APIRouter(prefix="/problemas", tags=["TI - Problemas"])
 
 @router.get("", response_model=list[ProblemaOut])
-def listar_problemas(db: Session = Depends(get_db)):
+async def listar_problemas(db: AsyncSession = Depends(get_async_read_db)):
     from ..models import Problema, Chamado
     try:
-        try:
-            Problema.__table__.create(bind=engine, checkfirst=True)
-        except Exception:
-            pass
+        await ensure_tables_async(Problema.__table__)
         # 1) Primeiro tenta tabela legada problema_reportado
         for sql in (
             "SELECT id, nome, prioridade_padrao, requer_item_internet FROM problema_reportado WHERE ativo = 1",
@@ -25,7 +23,7 @@ def listar_problemas(db: Session = Depends(get_db)):
             "SELECT id, nome, prioridade_padrao, requer_item_internet FROM problemas_reportados",
         ):
             try:
-                res = db.execute(text(sql))
+                res = await db.execute(text(sql))
                 fetched = res.fetchall()
                 if fetched:
                     return [
@@ -41,7 +39,7 @@ def listar_problemas(db: Session = Depends(get_db)):
                 continue
         # 2) ORM padrao
         try:
-            rows = db.query(Problema).order_by(Problema.nome.asc()).all()
+            rows = (await db.execute(select(Problema).order_by(Problema.nome.asc()))).scalars().all()
         except Exception:
             rows = []
         result = [
@@ -62,7 +60,7 @@ def listar_problemas(db: Session = Depends(get_db)):
                 "SELECT id, problema AS nome, prioridade_padrao, requer_item_internet FROM problemas",
             ):
                 try:
-                    res = db.execute(text(sql))
+                    res = await db.execute(text(sql))
                     fetched = res.fetchall()
                     if fetched:
                         for r in fetched:
@@ -80,7 +78,7 @@ def listar_problemas(db: Session = Depends(get_db)):
                 except Exception:
                     continue
         try:
-            existing_names = {r[0] for r in db.query(Chamado.problema).distinct().all() if r[0]}
+            existing_names = {r[0] for r in (await db.execute(select(Chamado.problema).distinct())).all() if r[0]}
         except Exception:
             existing_names = set()
         names_in_table = {r["nome"].lower() for r in result}
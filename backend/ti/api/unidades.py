@@ -1,20 +1,18 @@
 from __future__ import annotations
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import text
-from core.db import get_db, engine
+from sqlalchemy import select, text
+from core.db import get_db, get_async_read_db, ensure_tables_async, engine
 from ti.schemas.unidade import UnidadeCreate, UnidadeOut
 
 router = APIRouter(prefix="/unidades", tags=["TI - Unidades"])
 
 @router.get("", response_model=list[UnidadeOut])
-def listar_unidades(db: Session = Depends(get_db)):
+async def listar_unidades(db: AsyncSession = Depends(get_async_read_db)):
     from ..models import Unidade, Chamado
     try:
-        try:
-            Unidade.__table__.create(bind=engine, checkfirst=True)
-        except Exception:
-            pass
+        await ensure_tables_async(Unidade.__table__)
         # Tenta esquemas legados/plurais com e sem coluna cidade
         for sql in (
             "SELECT id, nome, cidade FROM unidade",
@@ -27,7 +25,7 @@ def listar_unidades(db: Session = Depends(get_db)):
             "SELECT id, unidade AS nome FROM unidades",
         ):
             try:
-                res = db.execute(text(sql))
+                res = await db.execute(text(sql))
                 fetched = res.fetchall()
                 if fetched:
                     out = []
@@ -41,14 +39,14 @@ def listar_unidades(db: Session = Depends(get_db)):
                 pass
         # ORM padrão (caso exista classe/tabela com cidade)
         try:
-            rows_orm = db.query(Unidade).order_by(Unidade.id.desc()).all()
+            rows_orm = (await db.execute(select(Unidade).order_by(Unidade.id.desc()))).scalars().all()
             if rows_orm:
                 return rows_orm
         except Exception:
             pass
         # Fallback: derivar de chamados existentes
         try:
-            distinct = [r[0] for r in db.query(Chamado.unidade).distinct().all() if r[0]]
+            distinct = [r[0] for r in (await db.execute(select(Chamado.unidade).distinct())).all() if r[0]]
         except Exception:
             distinct = []
         return [
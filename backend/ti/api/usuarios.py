@@ -1,8 +1,11 @@
 from __future__ import annotations
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from core.db import get_db, engine
-from ti.schemas.user import UserCreate, UserCreatedOut, UserAvailability, UserOut
+from core.db import get_db, get_read_db, get_async_read_db, ensure_tables_async, engine
+from core.passwords import PasswordPoolBusy, pool_stats
+from ti.schemas.user import UserCreate, UserCreatedOut, UserAvailability, UserOut, UserSearchOut, SetorContagemOut
 from ti.services.users import (
     criar_usuario as service_criar,
     check_user_availability,
@@ -11,55 +14,18 @@ from ti.services.users import (
     regenerate_password,
     set_block_status,
     delete_user,
-    list_blocked_users,
+    listar_usuarios_resumo,
 )
+from ti.services import sessoes, user_setores
 
 router = APIRouter(prefix="/usuarios", tags=["TI - Usuarios"])
 
-@router.get("", response_model=list[UserOut])
-def listar_usuarios(db: Session = Depends(get_db)):
+# Legado: devolve todos os usuários sem paginação. As telas usam /usuarios/search
+@router.get("", response_model=list[UserOut], deprecated=True)
+def listar_usuarios(db: Session = Depends(get_read_db)):
     try:
-        from ..models import User
-        import json
-        # helper to compute setores list
-        def compute_setores(u) -> list[str]:
-            try:
-                if getattr(u, "_setores", None):
-                    raw = json.loads(getattr(u, "_setores"))
-                    return [str(x).encode('utf-8', 'ignore').decode('utf-8') if x is not None else "" for x in raw]
-                if getattr(u, "setor", None):
-                    return [str(getattr(u, "setor"))]
-            except Exception:
-                pass
-            return []
-
-        # cria tabela se não existir
-        try:
-            User.__table__.create(bind=engine, checkfirst=True)
-        except Exception:
-            pass
-
-        # pega todos os usuários
         try:
-            users = db.query(User).order_by(User.id.desc()).all()
-            rows = []
-            for u in users:
-                if u.bloqueado is None:
-                    u.bloqueado = False
-                setores_list = compute_setores(u)
-                rows.append({
-                    "id": u.id,
-                    "nome": u.nome,
-                    "sobrenome": u.sobrenome,
-                    "usuario": u.usuario,
-                    "email": u.email,
-                    "nivel_acesso": u.nivel_acesso,
-                    "setor": setores_list[0] if setores_list else None,
-                    "setores": setores_list,
-                    "bloqueado": bool(u.bloqueado),
-                    "session_revoked_at": u.session_revoked_at.isoformat() if getattr(u, 'session_revoked_at', None) else None,
-                })
-            return rows
+            return listar_usuarios_resumo(db)
         except Exception:
             pass
 
@@ -91,6 +57,29 @@ def listar_usuarios(db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao listar usuários: {e}")
 
+@router.get("/search", response_model=UserSearchOut)
+def buscar_usuarios(
+    q: str | None = None,
+    setor: str | None = None,
+    bloqueado: bool | None = None,
+    limit: int = 50,
+    before_id: int | None = None,
+    db: Session = Depends(get_read_db),
+):
+    try:
+        limit = max(1, min(200, int(limit)))
+        # Um a mais para saber se há próxima página
+        rows = listar_usuarios_resumo(db, q=q, setor=setor, bloqueado=bloqueado, limit=limit + 1, before_id=before_id)
+        has_more = len(rows) > limit
+        items = rows[:limit]
+        return {
+            "items": items,
+            "next_before_id": items[-1]["id"] if has_more and items else None,
+            "has_more": has_more,
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar usuários: {e}")
+
 @router.post("", response_model=UserCreatedOut)
 def criar_usuario(payload: UserCreate, db: Session = Depends(get_db)):
     try:
@@ -102,6 +91,8 @@ def criar_usuario(payload: UserCreate, db: Session = Depends(get_db)):
         return service_criar(db, payload)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except PasswordPoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao criar usuário: {e}")
 
@@ -111,6 +102,11 @@ def check_availability(email: str | None = None, username: str | None = None, db
         raise HTTPException(status_code=400, detail="Informe email ou username para verificar")
     return check_user_availability(db, email, username)
 
+@router.get("/password-pool/stats")
+def password_pool_stats():
+    """Fila do pool de hash de senhas: admissões, rejeições e tempos (p50/p95)."""
+    return pool_stats()
+
 @router.get("/generate-password")
 def generate_password_endpoint(length: int = 6):
     if length < 6:
@@ -120,46 +116,34 @@ def generate_password_endpoint(length: int = 6):
     return {"senha": generate_password(length)}
 
 
-@router.get("/blocked", response_model=list[UserOut])
-def listar_bloqueados(db: Session = Depends(get_db)):
+# Legado: sem paginação; use /usuarios/search?bloqueado=true
+@router.get("/blocked", response_model=list[UserOut], deprecated=True)
+def listar_bloqueados(db: Session = Depends(get_read_db)):
     try:
-        import json
-        from ..models import User
-        users = list_blocked_users(db)
-        rows = []
-        for u in users:
-            try:
-                if u.bloqueado is None:
-                    u.bloqueado = True
-            except Exception:
-                pass
-            try:
-                if getattr(u, "_setores", None):
-                    raw = json.loads(getattr(u, "_setores"))
-                    setores_list = [str(x) for x in raw if x is not None]
-                elif getattr(u, "setor", None):
-                    setores_list = [str(getattr(u, "setor"))]
-                else:
-                    setores_list = []
-            except Exception:
-                setores_list = [str(getattr(u, "setor"))] if getattr(u, "setor", None) else []
-            rows.append({
-                "id": u.id,
-                "nome": u.nome,
-                "sobrenome": u.sobrenome,
-                "usuario": u.usuario,
-                "email": u.email,
-                "nivel_acesso": u.nivel_acesso,
-                "setor": setores_list[0] if setores_list else None,
-                "setores": setores_list,
-                "bloqueado": bool(u.bloqueado),
-                "session_revoked_at": u.session_revoked_at.isoformat() if getattr(u, 'session_revoked_at', None) else None,
-            })
-        return rows
+        return listar_usuarios_resumo(db, bloqueado=True)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao listar bloqueados: {e}")
 
 
+@router.get("/setores", response_model=list[SetorContagemOut])
+def contar_por_setor(db: Session = Depends(get_read_db)):
+    try:
+        return user_setores.contagem(db)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao contar setores: {e}")
+
+
+@router.get("/setores/{setor}/membros", response_model=UserSearchOut)
+def membros_do_setor(
+    setor: str,
+    bloqueado: bool | None = None,
+    limit: int = 50,
+    before_id: int | None = None,
+    db: Session = Depends(get_read_db),
+):
+    return buscar_usuarios(q=None, setor=setor, bloqueado=bloqueado, limit=limit, before_id=before_id, db=db)
+
+
 @router.put("/{user_id}", response_model=UserOut)
 def atualizar_usuario(user_id: int, payload: dict, db: Session = Depends(get_db)):
     try:
@@ -206,19 +190,19 @@ def atualizar_usuario(user_id: int, payload: dict, db: Session = Depends(get_db)
 
 
 @router.get("/{user_id}", response_model=UserOut)
-def get_usuario(user_id: int, db: Session = Depends(get_db)):
+async def get_usuario(user_id: int, db: AsyncSession = Depends(get_async_read_db)):
     try:
         from ..models import User
         import json
-        User.__table__.create(bind=engine, checkfirst=True)
+        await ensure_tables_async(User.__table__)
         # Try ORM query; if DB schema doesn't include newer columns this may fail -> fallback
         try:
-            user = db.query(User).filter(User.id == user_id).first()
+            user = (await db.execute(select(User).where(User.id == user_id))).scalars().first()
         except Exception:
             # fallback to raw SQL selecting known columns (compatible with older schema)
             from sqlalchemy import text
             try:
-                row = db.execute(text("SELECT id, nome, sobrenome, usuario, email, nivel_acesso, setor, bloqueado FROM \"user\" WHERE id = :id"), {"id": user_id}).fetchone()
+                row = (await db.execute(text("SELECT id, nome, sobrenome, usuario, email, nivel_acesso, setor, bloqueado FROM \"user\" WHERE id = :id"), {"id": user_id})).fetchone()
                 if not row:
                     raise HTTPException(status_code=404, detail="Usuário não encontrado")
                 s = row[6]
@@ -240,7 +224,7 @@ def get_usuario(user_id: int, db: Session = Depends(get_db)):
             except Exception as ex:
                 # try legacy table name 'usuarios'
                 try:
-                    row = db.execute(text("SELECT id, nome, sobrenome, usuario, email, nivel_acesso, setor FROM usuarios WHERE id = :id"), {"id": user_id}).fetchone()
+                    row = (await db.execute(text("SELECT id, nome, sobrenome, usuario, email, nivel_acesso, setor FROM usuarios WHERE id = :id"), {"id": user_id})).fetchone()
                     if not row:
                         raise HTTPException(status_code=404, detail="Usuário não encontrado")
                     s = row[6]
@@ -290,6 +274,20 @@ def get_usuario(user_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Erro ao obter usuário: {e}")
 
 
+@router.get("/{user_id}/session")
+def status_sessao(user_id: int, db: Session = Depends(get_db)):
+    """Validade da sessão servida da tabela de revogação em memória (sem ler o usuário).
+    O cliente compara session_revoked_at com o horário do próprio login."""
+    try:
+        ativo, revogado = sessoes.estado(db, user_id)
+        return {
+            "ativo": ativo,
+            "session_revoked_at": revogado.isoformat() if revogado else None,
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao verificar sessão: {e}")
+
+
 @router.post("/{user_id}/generate-password")
 def gerar_nova_senha(user_id: int, length: int = 6, db: Session = Depends(get_db)):
     try:
@@ -297,6 +295,8 @@ def gerar_nova_senha(user_id: int, length: int = 6, db: Session = Depends(get_db
         return {"senha": pwd}
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except PasswordPoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao gerar senha: {e}")
 
@@ -319,6 +319,7 @@ def force_logout(user_id: int, db: Session = Depends(get_db)):
         user.session_revoked_at = ts
         db.commit()
         db.refresh(user)
+        sessoes.usuario_salvo(db, user)
         print(f"[API] committed session_revoked_at for user {user.id}")
         try:
             # verify value directly from DB using raw SQL to ensure commit persisted
@@ -386,6 +387,8 @@ def login(payload: dict, db: Session = Depends(get_db)):
         raise HTTPException(status_code=401, detail=str(e))
     except PermissionError as e:
         raise HTTPException(status_code=403, detail=str(e))
+    except PasswordPoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except HTTPException:
         raise
     except Exception as e:
@@ -423,6 +426,8 @@ def change_password(user_id: int, payload: dict, db: Session = Depends(get_db)):
         return {"ok": True}
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except PasswordPoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except HTTPException:
         raise
     except Exception as e:
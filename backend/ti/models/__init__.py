@@ -3,22 +3,34 @@ from .user import User
 from .unidade import Unidade
 from .problema import Problema
 from .notification import Notification
+from .notification_leitura import NotificationLeitura
+from .notification_lida import NotificationLida
 from .ticket_anexo import TicketAnexo
 from .chamado_anexo import ChamadoAnexo
 from .historico_ticket import HistoricoTicket
 from .historico_status import HistoricoStatus
 from .media import Media
 from .alert import Alert
+from .outbox_evento import OutboxEvento
+from .cache_versao import CacheVersao
+from .user_setor import UserSetor
+from .manutencao_checkpoint import ManutencaoCheckpoint
 __all__ = [
     "Chamado",
     "User",
     "Unidade",
     "Problema",
     "Notification",
+    "NotificationLeitura",
+    "NotificationLida",
     "TicketAnexo",
     "ChamadoAnexo",
     "HistoricoTicket",
     "HistoricoStatus",
     "Media",
     "Alert",
+    "OutboxEvento",
+    "CacheVersao",
+    "UserSetor",
+    "ManutencaoCheckpoint",
 ]
@@ -0,0 +1,14 @@
+from __future__ import annotations
+from datetime import datetime
+from sqlalchemy import Integer, String, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from core.db import Base
+from core.utils import now_brazil_naive
+
+class CacheVersao(Base):
+    """Versão de um cache em memória; cada worker compara com a sua para saber se precisa recarregar."""
+    __tablename__ = "cache_versao"
+
+    nome: Mapped[str] = mapped_column(String(50), primary_key=True)
+    versao: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    atualizado_em: Mapped[datetime | None] = mapped_column(DateTime, nullable=True, default=now_brazil_naive, onupdate=now_brazil_naive)
@@ -1,11 +1,17 @@
 from __future__ import annotations
 from datetime import date, datetime
-from sqlalchemy import Integer, String, Date, DateTime, Text, ForeignKey
+from sqlalchemy import Integer, String, Date, DateTime, Text, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column
 from core.db import Base
 
 class Chamado(Base):
     __tablename__ = "chamado"
+    __table_args__ = (
+        # Fila de atendimento: status + prioridade por igualdade, ordenado por abertura
+        Index("ix_chamado_fila", "status", "prioridade", "data_abertura"),
+        # Busca textual (/chamados/search)
+        Index("ft_chamado_busca", "codigo", "protocolo", "solicitante", "problema", "descricao", mysql_prefix="FULLTEXT"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     codigo: Mapped[str] = mapped_column(String(20), unique=True, nullable=False)
@@ -24,6 +30,8 @@ class Chamado(Base):
     data_conclusao: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
     status: Mapped[str] = mapped_column(String(20), nullable=False, default="Aberto")
     prioridade: Mapped[str] = mapped_column(String(20), nullable=False, default="Normal")
+    # Controle de concorrência otimista (compare-and-swap nas mudanças de status)
+    versao: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
 
     status_assumido_por_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("user.id"), nullable=True)
     status_assumido_em: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
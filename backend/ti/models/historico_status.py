@@ -1,11 +1,15 @@
 from __future__ import annotations
 from datetime import datetime
-from sqlalchemy import Integer, String, DateTime, ForeignKey
+from sqlalchemy import Boolean, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column
 from core.db import Base
 
 class HistoricoStatus(Base):
     __tablename__ = "historico_status"
+    __table_args__ = (
+        # Pendentes de notificação (varridos pelo relay do outbox)
+        Index("ix_historico_status_notificar", "notificar", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     chamado_id: Mapped[int] = mapped_column(Integer, ForeignKey("chamado.id"), nullable=False)
@@ -13,3 +17,5 @@ class HistoricoStatus(Base):
     status_anterior: Mapped[str | None] = mapped_column(String(20), nullable=True)
     status_novo: Mapped[str] = mapped_column(String(20), nullable=False)
     criado_em: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    # Notificação e eventos ainda não gerados pelo relay (ti.services.outbox)
+    notificar: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False, server_default="0")
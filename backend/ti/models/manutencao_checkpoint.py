@@ -0,0 +1,18 @@
+from __future__ import annotations
+from datetime import datetime
+from sqlalchemy import Integer, String, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from core.db import Base
+from core.utils import now_brazil_naive
+
+class ManutencaoCheckpoint(Base):
+    """Progresso de um job de manutenção em lotes; gravado junto com cada lote para permitir retomar."""
+    __tablename__ = "manutencao_checkpoint"
+
+    nome: Mapped[str] = mapped_column(String(80), primary_key=True)
+    ultimo_id: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    processados: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    alterados: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    iniciado_em: Mapped[datetime | None] = mapped_column(DateTime, nullable=True, default=now_brazil_naive)
+    atualizado_em: Mapped[datetime | None] = mapped_column(DateTime, nullable=True, default=now_brazil_naive)
+    concluido_em: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
@@ -1,12 +1,18 @@
 from __future__ import annotations
 from datetime import datetime
-from sqlalchemy import Integer, String, Boolean, DateTime, Text, ForeignKey
+from sqlalchemy import Integer, String, Boolean, DateTime, Text, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column
 from core.db import Base
 from core.utils import now_brazil_naive
 
 class Notification(Base):
     __tablename__ = "notification"
+    __table_args__ = (
+        # Caixa de entrada por destinatário (keyset por id)
+        Index("ix_notification_usuario", "usuario_id", "id"),
+        # Corte por idade da retenção
+        Index("ix_notification_criado", "criado_em"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     # Tipo de notificação (ex.: chamado)
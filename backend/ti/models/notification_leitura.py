@@ -0,0 +1,14 @@
+from __future__ import annotations
+from datetime import datetime
+from sqlalchemy import Integer, DateTime, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+from core.db import Base
+from core.utils import now_brazil_naive
+
+class NotificationLeitura(Base):
+    """Marcador de leitura por usuário: tudo com id <= ultimo_lido_id está lido."""
+    __tablename__ = "notification_leitura"
+
+    usuario_id: Mapped[int] = mapped_column(Integer, ForeignKey("user.id"), primary_key=True, autoincrement=False)
+    ultimo_lido_id: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    atualizado_em: Mapped[datetime | None] = mapped_column(DateTime, nullable=True, default=now_brazil_naive)
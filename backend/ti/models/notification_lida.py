@@ -0,0 +1,14 @@
+from __future__ import annotations
+from datetime import datetime
+from sqlalchemy import Integer, DateTime, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+from core.db import Base
+from core.utils import now_brazil_naive
+
+class NotificationLida(Base):
+    """Leituras avulsas acima do marcador de notification_leitura (chave usuario_id, notification_id)."""
+    __tablename__ = "notification_lida"
+
+    usuario_id: Mapped[int] = mapped_column(Integer, ForeignKey("user.id"), primary_key=True, autoincrement=False)
+    notification_id: Mapped[int] = mapped_column(Integer, ForeignKey("notification.id"), primary_key=True, autoincrement=False)
+    lido_em: Mapped[datetime | None] = mapped_column(DateTime, nullable=True, default=now_brazil_naive)
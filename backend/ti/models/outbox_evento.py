@@ -0,0 +1,23 @@
+from __future__ import annotations
+from datetime import datetime
+from sqlalchemy import Integer, String, DateTime, Text
+from sqlalchemy.orm import Mapped, mapped_column
+from core.db import Base
+from core.utils import now_brazil_naive
+
+class OutboxEvento(Base):
+    """Evento Socket.IO pendente, gravado na mesma transação da mudança que o gerou."""
+    __tablename__ = "outbox_evento"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    # Nome do evento (ex.: 'chamado:created', 'notification:new')
+    evento: Mapped[str] = mapped_column(String(100), nullable=False)
+    # Payload JSON do emit
+    payload: Mapped[str] = mapped_column(Text, nullable=False)
+    # Sala(s) de destino: nome da sala ou lista JSON. Se nula, emite para todos
+    sala: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    criado_em: Mapped[datetime] = mapped_column(DateTime, default=now_brazil_naive)
+    # Quantas vezes o relay já tentou publicar (ao atingir OUTBOX_MAX_TENTATIVAS vira dead letter)
+    tentativas: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    # Reservado por um relay até este instante (emit em andamento); vencido = livre de novo
+    reservado_ate: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
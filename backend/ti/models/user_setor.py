@@ -0,0 +1,17 @@
+from __future__ import annotations
+from sqlalchemy import Integer, String, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from core.db import Base
+
+class UserSetor(Base):
+    """Setores de cada usuário, normalizados (espelho de user._setores mantido pelos caminhos de escrita)."""
+    __tablename__ = "user_setor"
+    __table_args__ = (
+        # Membros de um setor (keyset por usuario_id)
+        Index("ix_user_setor_setor", "setor", "usuario_id"),
+    )
+
+    usuario_id: Mapped[int] = mapped_column(Integer, ForeignKey("user.id"), primary_key=True, autoincrement=False)
+    setor: Mapped[str] = mapped_column(String(255), primary_key=True)
+    # Posição em _setores (0 = setor principal)
+    ordem: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
@@ -1,6 +1,8 @@
 from __future__ import annotations
 from datetime import date, datetime
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, field_validator
+from .attachment import AnexoOut
+from .ticket import HistoricoItem
 
 ALLOWED_STATUSES = {"Aberto", "Em andamento", "Em análise", "Concluído", "Cancelado"}
 
@@ -16,6 +18,42 @@ class ChamadoCreate(BaseModel):
     visita: str | None = None
     descricao: str | None = None
 
+class ChamadoImportRow(ChamadoCreate):
+    # Limites das colunas de `chamado`: a linha longa demais é rejeitada sozinha,
+    # em vez de derrubar o INSERT do bloco inteiro
+    solicitante: str = Field(..., max_length=100)
+    cargo: str = Field(..., max_length=100)
+    email: EmailStr = Field(..., max_length=120)
+    telefone: str = Field(..., max_length=20)
+    unidade: str = Field(..., max_length=100)
+    problema: str = Field(..., max_length=100)
+    internetItem: str | None = Field(default=None, max_length=50)
+    # Campos extras aceitos na importação (migrações de outros sistemas)
+    status: str = "Aberto"
+    prioridade: str = "Normal"
+    data_abertura: datetime | None = None
+
+    # mode="before": célula vazia (None) cai no padrão em vez de falhar na validação de tipo
+    @field_validator("status", mode="before")
+    @classmethod
+    def _status_valido(cls, v) -> str:
+        v = str(v or "").strip() or "Aberto"
+        if v not in ALLOWED_STATUSES:
+            raise ValueError(f"Status inválido: {v}")
+        return v
+
+    @field_validator("prioridade", mode="before")
+    @classmethod
+    def _prioridade_valida(cls, v) -> str:
+        v = str(v or "").strip().title() or "Normal"
+        if v not in {"Crítica", "Alta", "Normal", "Baixa"}:
+            raise ValueError(f"Prioridade inválida: {v}")
+        return v
+
+class ChamadoImportOut(BaseModel):
+    importados: int
+    erros: list[dict]
+
 class ChamadoOut(BaseModel):
     id: int
     codigo: str
@@ -32,13 +70,42 @@ class ChamadoOut(BaseModel):
     data_abertura: datetime | None
     status: str
     prioridade: str
+    versao: int = 0
+    arquivado: bool = False
 
     class Config:
         from_attributes = True
 
+class ChamadoFullOut(BaseModel):
+    chamado: ChamadoOut
+    historico: list[HistoricoItem]
+    anexos: list[AnexoOut]
+
+class ChamadoSearchOut(BaseModel):
+    items: list[ChamadoOut]
+    page: int
+    page_size: int
+    has_more: bool
+
 class ChamadoStatusUpdate(BaseModel):
     status: str = Field(..., description="Novo status do chamado")
+    versao: int | None = Field(default=None, description="Versão lida pelo cliente; se divergir, retorna 409")
+    usuario_id: int | None = Field(default=None, description="Usuário que alterou o status")
+
+class ChamadoBulkStatusUpdate(BaseModel):
+    ids: list[int] = Field(..., min_length=1, max_length=5000, description="Chamados a atualizar")
+    status: str = Field(..., description="Novo status dos chamados")
+    usuario_id: int | None = Field(default=None, description="Usuário que alterou o status")
+
+class ChamadoBulkStatusOut(BaseModel):
+    status: str
+    atualizados: list[int]
+    ignorados: list[int]
+    nao_encontrados: list[int]
 
 class ChamadoDeleteRequest(BaseModel):
     email: EmailStr = Field(..., description="E-mail do usuário autenticado")
     senha: str = Field(..., min_length=6, description="Senha do usuário para confirmar exclusão")
+
+class ChamadoClaimRequest(BaseModel):
+    usuario_id: int = Field(..., description="Técnico que assume o próximo chamado da fila")
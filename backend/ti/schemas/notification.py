@@ -16,3 +16,14 @@ class NotificationOut(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class NotificationUnreadOut(BaseModel):
+    usuario_id: int
+    # Limitado a NOTIF_CONTADOR_MAX (padrão 100)
+    nao_lidas: int
+
+
+class NotificationReadUpTo(BaseModel):
+    usuario_id: int
+    ate_id: int
@@ -27,6 +27,15 @@ class UserOut(BaseModel):
     class Config:
         from_attributes = True
 
+class UserSearchOut(BaseModel):
+    items: List[UserOut]
+    next_before_id: int | None = None
+    has_more: bool = False
+
+class SetorContagemOut(BaseModel):
+    setor: str
+    total: int
+
 class UserCreatedOut(UserOut):
     senha: str  # senha em texto plano (retornada uma única vez)
 
@@ -0,0 +1,80 @@
+"""Write-behind de user.ultimo_acesso.
+
+Login bem-sucedido sem nada além do horário a gravar só registra o acesso em
+memória; uma thread grava os pendentes em lote (um UPDATE executemany) a cada
+ACESSO_FLUSH_INTERVALO segundos e no shutdown. Por usuário fica só o último
+horário. Mudanças relevantes para segurança (tentativas, bloqueio) continuam
+síncronas em authenticate_user.
+"""
+from __future__ import annotations
+import os
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import bindparam, update
+from core.db import SessionLocal
+from ti.models import User
+
+ACESSO_FLUSH_INTERVALO = float(os.getenv("ACESSO_FLUSH_INTERVALO", "5"))
+_LOTE = 500
+
+_pendentes: dict[int, datetime] = {}
+_lock = threading.Lock()
+_iniciado = False
+
+
+def registrar_acesso(user_id: int, quando: datetime) -> None:
+    with _lock:
+        atual = _pendentes.get(user_id)
+        if atual is None or quando > atual:
+            _pendentes[user_id] = quando
+
+
+def _devolver(itens: dict[int, datetime]) -> None:
+    # Falha no flush: volta para a fila sem sobrescrever acessos mais novos
+    with _lock:
+        for uid, quando in itens.items():
+            atual = _pendentes.get(uid)
+            if atual is None or quando > atual:
+                _pendentes[uid] = quando
+
+
+def flush_acessos() -> int:
+    """Grava os acessos pendentes. Retorna quantos usuários foram atualizados."""
+    global _pendentes
+    with _lock:
+        if not _pendentes:
+            return 0
+        itens, _pendentes = _pendentes, {}
+    t = User.__table__
+    stmt = (
+        update(t)
+        .where(t.c.id == bindparam("uid"))
+        .values(ultimo_acesso=bindparam("quando"))
+    )
+    linhas = [{"uid": uid, "quando": quando} for uid, quando in sorted(itens.items())]
+    try:
+        with SessionLocal() as db:
+            for i in range(0, len(linhas), _LOTE):
+                db.connection().execute(stmt, linhas[i:i + _LOTE])
+            db.commit()
+    except Exception as e:
+        print(f"[ACESSO] falha ao gravar ultimo_acesso ({len(linhas)} usuários): {e}")
+        _devolver(itens)
+        return 0
+    return len(linhas)
+
+
+def iniciar_flush_acessos(intervalo: float = ACESSO_FLUSH_INTERVALO) -> None:
+    """Sobe (uma vez por processo) a thread que grava os acessos pendentes."""
+    global _iniciado
+    if _iniciado or intervalo <= 0:
+        return
+    _iniciado = True
+
+    def _loop():
+        while True:
+            time.sleep(intervalo)
+            flush_acessos()
+
+    threading.Thread(target=_loop, daemon=True).start()
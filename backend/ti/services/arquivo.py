@@ -0,0 +1,178 @@
+"""Arquivamento hot/cold de chamados encerrados.
+
+Chamados Concluídos/Cancelados há mais de N dias são movidos, junto com histórico e
+anexos, para tabelas <tabela>_arquivo com a mesma estrutura (CREATE TABLE ... LIKE).
+As consultas por id, código e protocolo olham a tabela quente e depois a fria.
+"""
+from __future__ import annotations
+import os
+from datetime import timedelta
+from sqlalchemy import bindparam, inspect, text
+from sqlalchemy.orm import Session
+from core.db import engine
+from core.utils import now_brazil_naive
+
+# Tabelas filhas (por chamado_id), na ordem de exclusão antes do chamado
+TABELAS_FILHAS = ("historico_status", "historicos_tickets", "chamado_anexo", "ticket_anexos")
+STATUS_ENCERRADOS = ("Concluído", "Cancelado")
+ARQUIVO_DIAS = int(os.getenv("ARQUIVO_DIAS", "180"))
+
+# Colunas comuns quente/fria por tabela (preenchido por ensure_arquivo_schema)
+_colunas: dict[str, list[str]] = {}
+
+
+def tabela_arquivo(table: str) -> str:
+    return f"{table}_arquivo"
+
+
+def ensure_arquivo_schema() -> list[str]:
+    """Cria as tabelas *_arquivo que faltarem e recalcula as colunas copiadas.
+    Retorna as tabelas quentes existentes."""
+    insp = inspect(engine)
+    tabelas = [t for t in ("chamado",) + TABELAS_FILHAS if insp.has_table(t)]
+    with engine.begin() as conn:
+        for t in tabelas:
+            # LIKE copia colunas e índices, sem chaves estrangeiras
+            conn.exec_driver_sql(f"CREATE TABLE IF NOT EXISTS {tabela_arquivo(t)} LIKE {t}")
+    insp = inspect(engine)
+    for t in tabelas:
+        fria = {c.get("name") for c in insp.get_columns(tabela_arquivo(t))}
+        _colunas[t] = [c.get("name") for c in insp.get_columns(t) if c.get("name") in fria]
+    return tabelas
+
+
+def arquivar_chamados(db: Session, dias: int = ARQUIVO_DIAS, lote: int = 200) -> int:
+    """Move chamados encerrados há mais de `dias` dias para as tabelas de arquivo.
+    Cada lote é uma transação: copia (INSERT ... SELECT) filhos e chamados, apaga
+    das tabelas quentes e faz commit. Chamados travados por outra transação são
+    pulados (SKIP LOCKED) e ficam para a próxima execução. Retorna o total movido.
+    """
+    tabelas = ensure_arquivo_schema()
+    if "chamado" not in tabelas:
+        return 0
+    filhas = [t for t in TABELAS_FILHAS if t in tabelas]
+    corte = now_brazil_naive() - timedelta(days=max(0, int(dias)))
+    sel = text(
+        "SELECT id FROM chamado WHERE id > :ultimo AND status IN :st "
+        "AND COALESCE(data_conclusao, concluido_em, cancelado_em, data_abertura) < :corte "
+        "ORDER BY id LIMIT :n FOR UPDATE SKIP LOCKED"
+    ).bindparams(bindparam("st", expanding=True))
+    total = 0
+    ultimo = 0
+    while True:
+        try:
+            ids = [int(r[0]) for r in db.execute(sel, {
+                "ultimo": ultimo,
+                "st": list(STATUS_ENCERRADOS),
+                "corte": corte,
+                "n": int(lote),
+            }).fetchall()]
+            if not ids:
+                db.rollback()
+                break
+            for t in filhas:
+                cols = ", ".join(_colunas[t])
+                db.execute(
+                    text(f"INSERT INTO {tabela_arquivo(t)} ({cols}) SELECT {cols} FROM {t} WHERE chamado_id IN :ids")
+                    .bindparams(bindparam("ids", expanding=True)),
+                    {"ids": ids},
+                )
+            cols = ", ".join(_colunas["chamado"])
+            db.execute(
+                text(f"INSERT INTO {tabela_arquivo('chamado')} ({cols}) SELECT {cols} FROM chamado WHERE id IN :ids")
+                .bindparams(bindparam("ids", expanding=True)),
+                {"ids": ids},
+            )
+            for t in filhas:
+                db.execute(
+                    text(f"DELETE FROM {t} WHERE chamado_id IN :ids").bindparams(bindparam("ids", expanding=True)),
+                    {"ids": ids},
+                )
+            db.execute(
+                text("DELETE FROM chamado WHERE id IN :ids").bindparams(bindparam("ids", expanding=True)),
+                {"ids": ids},
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        total += len(ids)
+        ultimo = ids[-1]
+        print(f"[ARQUIVO] lote de {len(ids)} chamados arquivado (até id={ultimo}, total={total})")
+    return total
+
+
+def buscar_arquivado(
+    db: Session,
+    chamado_id: int | None = None,
+    codigo: str | None = None,
+    protocolo: str | None = None,
+) -> dict | None:
+    """Procura um chamado na tabela fria. Retorna o registro como dict (com arquivado=True)."""
+    if chamado_id is not None:
+        where, params = "id = :v", {"v": chamado_id}
+    elif codigo:
+        where, params = "codigo = :v", {"v": codigo}
+    elif protocolo:
+        where, params = "protocolo = :v", {"v": protocolo}
+    else:
+        return None
+    try:
+        row = db.execute(text(f"SELECT * FROM {tabela_arquivo('chamado')} WHERE {where} LIMIT 1"), params).fetchone()
+    except Exception:
+        # tabela de arquivo ainda não existe
+        return None
+    if not row:
+        return None
+    out = dict(row._mapping)
+    out["arquivado"] = True
+    return out
+
+
+def historico_arquivado(db: Session, chamado_id: int) -> tuple[list, list]:
+    """Linhas de historico_status e historicos_tickets arquivadas de um chamado."""
+    try:
+        status = db.execute(text(
+            f"SELECT * FROM {tabela_arquivo('historico_status')} WHERE chamado_id = :i ORDER BY criado_em ASC"
+        ), {"i": chamado_id}).fetchall()
+    except Exception:
+        status = []
+    try:
+        tickets = db.execute(text(
+            f"SELECT * FROM {tabela_arquivo('historicos_tickets')} WHERE chamado_id = :i ORDER BY data_envio ASC"
+        ), {"i": chamado_id}).fetchall()
+    except Exception:
+        tickets = []
+    return list(status), list(tickets)
+
+
+def max_codigo_arquivado(db: Session) -> int:
+    """Maior sufixo numérico EVQ já arquivado (0 se não houver arquivo)."""
+    try:
+        row = db.execute(text(
+            f"SELECT codigo FROM {tabela_arquivo('chamado')} WHERE codigo LIKE 'EVQ-%' "
+            "ORDER BY LENGTH(codigo) DESC, codigo DESC LIMIT 1"
+        )).fetchone()
+    except Exception:
+        return 0
+    if not row:
+        return 0
+    try:
+        return int("".join(ch for ch in str(row[0]).split("-", 1)[1] if ch.isdigit()))
+    except Exception:
+        return 0
+
+
+def protocolos_arquivados(db: Session, candidatos: list[str]) -> set[str]:
+    """Subconjunto dos protocolos informados que já existem no arquivo."""
+    if not candidatos:
+        return set()
+    try:
+        rows = db.execute(
+            text(f"SELECT protocolo FROM {tabela_arquivo('chamado')} WHERE protocolo IN :p")
+            .bindparams(bindparam("p", expanding=True)),
+            {"p": list(candidatos)},
+        ).fetchall()
+    except Exception:
+        return set()
+    return {r[0] for r in rows}
@@ -0,0 +1,85 @@
+"""Invalidação entre workers de caches em memória via cache_versao[nome].
+
+Cada escrita que muda o cache incrementa a versão compartilhada (publicar); os
+outros workers comparam com a versão que carregaram no máximo a cada `intervalo`
+segundos (vencida) e recarregam quando ela mudou. Usado pelo diretório de
+usuários e pela tabela de revogação de sessões.
+"""
+from __future__ import annotations
+import threading
+import time
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from core.db import engine
+from ti.models import CacheVersao
+
+_schema_ok = False
+
+
+def ensure_cache_versao_schema() -> None:
+    global _schema_ok
+    if _schema_ok:
+        return
+    try:
+        CacheVersao.__table__.create(bind=engine, checkfirst=True)
+        _schema_ok = True
+    except Exception:
+        pass
+
+
+class VersaoCompartilhada:
+    """Versão carregada por este processo de um cache nomeado em cache_versao."""
+
+    def __init__(self, nome: str, intervalo: float):
+        self.nome = nome
+        self.intervalo = intervalo
+        self.versao: int | None = None
+        self._checado_em = 0.0
+        self._lock = threading.Lock()
+
+    def ler(self, db: Session) -> int:
+        """Versão atual no banco (ler antes de recarregar e passar a carregada())."""
+        ensure_cache_versao_schema()
+        v = db.execute(select(CacheVersao.versao).where(CacheVersao.nome == self.nome)).scalar()
+        return int(v or 0)
+
+    def carregada(self, versao: int) -> None:
+        """Registra que o cache foi (re)carregado na versão `versao`."""
+        with self._lock:
+            self.versao = versao
+            self._checado_em = time.monotonic()
+
+    def vencida(self, db: Session) -> bool:
+        """True se o cache nunca foi carregado ou se a versão do banco mudou.
+        Consulta o banco no máximo a cada `intervalo` segundos; erro na consulta = não vencida."""
+        if self.versao is None:
+            return True
+        if time.monotonic() - self._checado_em < self.intervalo:
+            return False
+        try:
+            versao = self.ler(db)
+        except Exception:
+            return False
+        if versao != self.versao:
+            return True
+        self._checado_em = time.monotonic()
+        return False
+
+    def publicar(self, db: Session) -> None:
+        """Incrementa a versão compartilhada (com commit) para os outros workers recarregarem."""
+        ensure_cache_versao_schema()
+        try:
+            res = db.execute(
+                update(CacheVersao).where(CacheVersao.nome == self.nome).values(versao=CacheVersao.versao + 1)
+            )
+            if res.rowcount == 0:
+                db.add(CacheVersao(nome=self.nome, versao=1))
+            db.commit()
+            nova = self.ler(db)
+        except Exception:
+            db.rollback()
+            return
+        with self._lock:
+            # Só adota a nova versão se ninguém mais escreveu no meio; senão recarrega na próxima checagem
+            if self.versao is not None and nova == self.versao + 1:
+                self.versao = nova
@@ -1,19 +1,19 @@
 from __future__ import annotations
 import random
+import re
 import string
 from datetime import date
+from sqlalchemy import insert, select, update
 from sqlalchemy.orm import Session
 from core.utils import now_brazil_naive
-from ti.models import Chamado
-from core.db import engine
+from ti.models import Chamado, HistoricoStatus, Notification
+from core.db import engine, ensure_column, ensure_index, mark_flushed_nulls
 from ti.schemas.chamado import ChamadoCreate
+from ti.services import outbox
 
 
-def _next_codigo(db: Session) -> str:
-    """Gera código sequencial no formato EVQ-XXXX (4 dígitos), iniciando em EVQ-0081.
-    Apenas considera a tabela atual 'chamado'.
-    """
-    from ti.models import Chamado
+def _max_codigo_num(db: Session) -> int:
+    """Maior sufixo numérico entre os códigos EVQ-XXXX (mínimo 80)."""
     max_n = 80  # garante mínimo EVQ-0081
     try:
         rows = db.query(Chamado.codigo).filter(Chamado.codigo.like("EVQ-%")).all()
@@ -27,27 +27,38 @@ def _next_codigo(db: Session) -> str:
                 continue
     except Exception:
         pass
-    return f"EVQ-{max_n + 1:04d}"
+    # Códigos já arquivados continuam reservados
+    from ti.services.arquivo import max_codigo_arquivado
+    return max(max_n, max_codigo_arquivado(db))
+
+
+def _next_codigo(db: Session) -> str:
+    """Gera código sequencial no formato EVQ-XXXX (4 dígitos), iniciando em EVQ-0081.
+    Apenas considera a tabela atual 'chamado'.
+    """
+    return f"EVQ-{_max_codigo_num(db) + 1:04d}"
+
+
+def _gen_protocolo() -> str:
+    base = "".join(str(random.randint(0, 9)) for _ in range(8))
+    dv = str(random.randint(0, 9))
+    return f"{base}-{dv}"
 
 
 def _next_protocolo(db: Session) -> str:
     """Gera protocolo ALEATÓRIO no formato XXXXXXXX-X (8 dígitos + hífen + 1 dígito).
-    Garante unicidade consultando apenas a tabela atual 'chamado'.
+    Garante unicidade consultando a tabela 'chamado' e o arquivo.
     """
     from ti.models import Chamado
-
-    def gen() -> str:
-        base = "".join(str(random.randint(0, 9)) for _ in range(8))
-        dv = str(random.randint(0, 9))
-        return f"{base}-{dv}"
+    from ti.services.arquivo import protocolos_arquivados
 
     for _ in range(50):
-        p = gen()
+        p = _gen_protocolo()
         try:
             exists = db.query(Chamado).filter(Chamado.protocolo == p).first()
         except Exception:
             exists = None
-        if not exists:
+        if not exists and not protocolos_arquivados(db, [p]):
             return p
     # Fallback muito improvável: usa timestamp truncado + rand
     from time import time
@@ -55,7 +66,31 @@ def _next_protocolo(db: Session) -> str:
     return fallback
 
 
-def criar_chamado(db: Session, payload: ChamadoCreate) -> Chamado:
+def _alocar_protocolos(db: Session, n: int) -> list[str]:
+    """Gera n protocolos únicos verificando colisões com um único SELECT ... IN por rodada."""
+    from ti.services.arquivo import protocolos_arquivados
+
+    out: set[str] = set()
+    for _ in range(50):
+        falta = n - len(out)
+        if falta <= 0:
+            break
+        candidatos = {_gen_protocolo() for _ in range(falta)} - out
+        if not candidatos:
+            continue
+        existentes = {
+            p for (p,) in db.query(Chamado.protocolo).filter(Chamado.protocolo.in_(list(candidatos))).all()
+        }
+        existentes |= protocolos_arquivados(db, list(candidatos - existentes))
+        out |= candidatos - existentes
+    if len(out) < n:
+        raise RuntimeError("Falha ao gerar protocolos do lote")
+    return list(out)[:n]
+
+
+def criar_chamado(db: Session, payload: ChamadoCreate, commit: bool = True) -> Chamado:
+    """Cria o chamado. Com commit=False apenas faz flush (id gerado) e deixa a
+    transação aberta para o chamador gravar notificação/outbox no mesmo commit."""
     try:
         Chamado.__table__.create(bind=engine, checkfirst=True)
     except Exception:
@@ -90,6 +125,412 @@ def criar_chamado(db: Session, payload: ChamadoCreate) -> Chamado:
         prioridade="Normal",
     )
     db.add(novo)
+    if not commit:
+        db.flush()
+        mark_flushed_nulls(novo)
+        return novo
     db.commit()
     db.refresh(novo)
     return novo
+
+
+# Ordem de atendimento da fila (mesmo catálogo de ti/services/problemas.py)
+PRIORIDADES_FILA = ("Crítica", "Alta", "Normal", "Baixa")
+
+_schema_ok = False
+
+# Colunas do índice FULLTEXT ft_chamado_busca (mesma ordem do MATCH)
+_BUSCA_COLS = ("codigo", "protocolo", "solicitante", "problema", "descricao")
+
+
+class ChamadoConflictError(RuntimeError):
+    """O chamado foi alterado por outro pedido desde a versão lida."""
+
+
+def ensure_chamado_schema() -> None:
+    """Garante (uma vez por processo) as tabelas, colunas e índices usados pelos fluxos de status."""
+    global _schema_ok
+    if _schema_ok:
+        return
+    try:
+        Chamado.__table__.create(bind=engine, checkfirst=True)
+        HistoricoStatus.__table__.create(bind=engine, checkfirst=True)
+        Notification.__table__.create(bind=engine, checkfirst=True)
+        outbox.ensure_outbox_schema()
+        ensure_column("chamado", "versao", "INT NOT NULL DEFAULT 0")
+        ensure_column("historico_status", "notificar", "TINYINT(1) NOT NULL DEFAULT 0")
+        ensure_index("historico_status", "ix_historico_status_notificar", ("notificar", "id"))
+        ensure_index("chamado", "ix_chamado_fila", ("status", "prioridade", "data_abertura"))
+        ensure_index("chamado", "ft_chamado_busca", _BUSCA_COLS, kind="FULLTEXT")
+        _schema_ok = True
+    except Exception:
+        pass
+
+
+def assumir_proximo_chamado(db: Session, usuario_id: int, prefixo_codigo: str | None = None) -> Chamado | None:
+    """Reserva o próximo chamado aberto (maior prioridade, mais antigo) para o técnico.
+    Usa SELECT ... FOR UPDATE SKIP LOCKED: técnicos concorrentes nunca recebem o mesmo
+    chamado e não ficam esperando pelo lock uns dos outros. Retorna None se a fila estiver vazia.
+    prefixo_codigo restringe a fila a chamados cujo codigo começa com ele (usado pelo benchmark).
+    """
+    ensure_chamado_schema()
+    escopo = [Chamado.codigo.like(f"{prefixo_codigo}%")] if prefixo_codigo else []
+    try:
+        ch = None
+        # Uma consulta por prioridade: cada uma é um range scan em ix_chamado_fila
+        for prioridade in PRIORIDADES_FILA:
+            stmt = (
+                select(Chamado)
+                .where(Chamado.status == "Aberto", Chamado.prioridade == prioridade, *escopo)
+                .order_by(Chamado.data_abertura.asc(), Chamado.id.asc())
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+            ch = db.execute(stmt).scalars().first()
+            if ch is not None:
+                break
+        if ch is None:
+            # Prioridades fora do catálogo (dados legados) ficam por último
+            stmt = (
+                select(Chamado)
+                .where(Chamado.status == "Aberto", Chamado.prioridade.notin_(PRIORIDADES_FILA), *escopo)
+                .order_by(Chamado.data_abertura.asc(), Chamado.id.asc())
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+            ch = db.execute(stmt).scalars().first()
+        if ch is None:
+            db.rollback()
+            return None
+        agora = now_brazil_naive()
+        prev = ch.status or "Aberto"
+        ch.status = "Em andamento"
+        ch.versao = (ch.versao or 0) + 1
+        ch.status_assumido_por_id = usuario_id
+        ch.status_assumido_em = agora
+        if ch.data_primeira_resposta is None:
+            ch.data_primeira_resposta = agora
+        db.add(HistoricoStatus(
+            chamado_id=ch.id,
+            usuario_id=usuario_id,
+            status_anterior=prev,
+            status_novo=ch.status,
+            criado_em=agora,
+        ))
+        outbox.registrar(db, "chamado:status", {"id": ch.id, "status": ch.status}, sala=outbox.salas_chamado(ch.id, ch.unidade))
+        db.commit()
+        db.refresh(ch)
+        return ch
+    except Exception:
+        db.rollback()
+        raise
+
+
+def atualizar_status(
+    db: Session,
+    chamado_id: int,
+    novo: str,
+    versao: int | None = None,
+    usuario_id: int | None = None,
+) -> tuple[Chamado, str] | None:
+    """Aplica a mudança de status e o historico_status numa única transação: um SELECT
+    por id, o UPDATE e o INSERT do histórico. A escrita no chamado é um compare-and-swap
+    em `versao` (UPDATE ... WHERE versao=:lida): se outro pedido alterou o chamado antes,
+    levanta ChamadoConflictError sem gravar nada.
+    O histórico sai marcado com notificar=1; a notificação e os eventos Socket.IO são
+    gerados a partir dele pelo relay do outbox (outbox.materializar_status), em lote.
+    Retorna (chamado, status_anterior) ou None se o chamado não existir.
+    """
+    ensure_chamado_schema()
+    try:
+        ch = db.get(Chamado, chamado_id)
+        if ch is None:
+            return None
+        atual = ch.versao or 0
+        if versao is not None and versao != atual:
+            raise ChamadoConflictError("Chamado alterado por outro usuário; recarregue e tente novamente")
+        prev = ch.status or "Aberto"
+        agora = now_brazil_naive()
+        valores: dict = {"status": novo, "versao": atual + 1}
+        if prev == "Aberto" and novo != "Aberto" and ch.data_primeira_resposta is None:
+            valores["data_primeira_resposta"] = agora
+        if novo == "Concluído":
+            valores["data_conclusao"] = agora
+        res = db.execute(
+            update(Chamado)
+            .where(Chamado.id == chamado_id, Chamado.versao == atual)
+            .values(**valores)
+            .execution_options(synchronize_session=False)
+        )
+        if res.rowcount != 1:
+            raise ChamadoConflictError("Chamado alterado por outro usuário; recarregue e tente novamente")
+        # Reflete os valores gravados sem marcar o objeto como sujo (evita um segundo UPDATE)
+        from sqlalchemy.orm.attributes import set_committed_value
+        for k, v in valores.items():
+            set_committed_value(ch, k, v)
+        db.execute(insert(HistoricoStatus).values(
+            chamado_id=ch.id,
+            usuario_id=usuario_id,
+            status_anterior=prev,
+            status_novo=novo,
+            criado_em=agora,
+            notificar=True,
+        ))
+        # Desanexa antes do commit para que não seja expirado (nenhum SELECT de refresh depois)
+        db.expunge(ch)
+        db.commit()
+        return ch, prev
+    except Exception:
+        db.rollback()
+        raise
+
+
+# Tamanho dos blocos de IN (...) / executemany nas operações em lote
+_LOTE = 500
+
+
+def _chunks(ids: list[int], size: int = _LOTE):
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+
+def atualizar_status_em_lote(
+    db: Session,
+    ids: list[int],
+    novo: str,
+    usuario_id: int | None = None,
+) -> tuple[list[Chamado], dict[int, str], list[int]]:
+    """Aplica a mesma transição de status a vários chamados numa única transação.
+    As linhas são travadas em ordem de id (evita deadlock entre lotes concorrentes);
+    o historico_status é gravado com executemany, marcado com notificar=1 como em
+    atualizar_status: notificações e eventos saem do relay (outbox.materializar_status).
+    Retorna (chamados_alterados, status_anterior_por_id, ids_nao_encontrados).
+    Chamados que já estão no status pedido não são alterados.
+    """
+    ensure_chamado_schema()
+    ids = sorted({int(i) for i in ids})
+    try:
+        chamados: list[Chamado] = []
+        for chunk in _chunks(ids):
+            stmt = select(Chamado).where(Chamado.id.in_(chunk)).order_by(Chamado.id).with_for_update()
+            chamados.extend(db.execute(stmt).scalars().all())
+        encontrados = {c.id for c in chamados}
+        nao_encontrados = [i for i in ids if i not in encontrados]
+        alterados = [c for c in chamados if (c.status or "Aberto") != novo]
+        if not alterados:
+            db.rollback()
+            return [], {}, nao_encontrados
+
+        agora = now_brazil_naive()
+        anteriores = {c.id: c.status or "Aberto" for c in alterados}
+        primeira = [
+            c.id for c in alterados
+            if anteriores[c.id] == "Aberto" and novo != "Aberto" and c.data_primeira_resposta is None
+        ]
+        valores: dict = {"status": novo, "versao": Chamado.versao + 1}
+        if novo == "Concluído":
+            valores["data_conclusao"] = agora
+        for chunk in _chunks([c.id for c in alterados]):
+            db.execute(
+                update(Chamado).where(Chamado.id.in_(chunk)).values(**valores)
+                .execution_options(synchronize_session=False)
+            )
+        for chunk in _chunks(primeira):
+            db.execute(
+                update(Chamado).where(Chamado.id.in_(chunk)).values(data_primeira_resposta=agora)
+                .execution_options(synchronize_session=False)
+            )
+        for chunk in _chunks(list(range(len(alterados)))):
+            lote = [alterados[i] for i in chunk]
+            db.execute(insert(HistoricoStatus), [
+                {
+                    "chamado_id": c.id,
+                    "usuario_id": usuario_id,
+                    "status_anterior": anteriores[c.id],
+                    "status_novo": novo,
+                    "criado_em": agora,
+                    "notificar": True,
+                }
+                for c in lote
+            ])
+
+        from sqlalchemy.orm.attributes import set_committed_value
+        primeira_set = set(primeira)
+        for c in alterados:
+            set_committed_value(c, "status", novo)
+            set_committed_value(c, "versao", (c.versao or 0) + 1)
+            if novo == "Concluído":
+                set_committed_value(c, "data_conclusao", agora)
+            if c.id in primeira_set:
+                set_committed_value(c, "data_primeira_resposta", agora)
+            db.expunge(c)
+        db.commit()
+        return alterados, anteriores, nao_encontrados
+    except Exception:
+        db.rollback()
+        raise
+
+
+def importar_chamados(
+    db: Session,
+    linhas,
+    tamanho_lote: int = _LOTE,
+    coletar_codigos: bool = False,
+) -> dict:
+    """Importa chamados em blocos a partir de um iterável de (numero_linha, dados|Exception).
+    Cada bloco aloca seus códigos EVQ e protocolos de uma vez, insere com executemany e
+    faz commit próprio; linhas inválidas entram em `erros` sem interromper a importação.
+    Se um bloco colidir com um chamado criado em paralelo, é realocado e repetido uma vez;
+    se falhar de novo, é gravado linha a linha para que só as linhas ruins sejam recusadas.
+    """
+    from pydantic import ValidationError
+    from ti.schemas.chamado import ChamadoImportRow
+
+    ensure_chamado_schema()
+    importados = 0
+    erros: list[dict] = []
+    codigos: list[str] = []
+    # Último número EVQ alocado; recalculado só no início e após uma colisão
+    base: int | None = None
+
+    def _gravar(lote: list[tuple[int, ChamadoImportRow]]) -> None:
+        nonlocal importados, base
+        falha: Exception | None = None
+        for _ in range(2):
+            try:
+                if base is None:
+                    base = _max_codigo_num(db)
+                protocolos = _alocar_protocolos(db, len(lote))
+                agora = now_brazil_naive()
+                rows = []
+                for i, (_, r) in enumerate(lote):
+                    rows.append({
+                        "codigo": f"EVQ-{base + 1 + i:04d}",
+                        "protocolo": protocolos[i],
+                        "solicitante": r.solicitante,
+                        "cargo": r.cargo,
+                        "email": str(r.email),
+                        "telefone": r.telefone,
+                        "unidade": r.unidade,
+                        "problema": r.problema,
+                        "internet_item": r.internetItem,
+                        "descricao": r.descricao,
+                        "data_visita": date.fromisoformat(r.visita) if r.visita else None,
+                        "data_abertura": r.data_abertura or agora,
+                        "status": r.status,
+                        "prioridade": r.prioridade,
+                        "versao": 0,
+                    })
+                db.execute(insert(Chamado), rows)
+                db.commit()
+                base += len(rows)
+                importados += len(rows)
+                if coletar_codigos:
+                    codigos.extend(r["codigo"] for r in rows)
+                return
+            except Exception as e:
+                db.rollback()
+                base = None
+                falha = e
+        # Bloco falhou duas vezes: repete linha a linha e só a(s) linha(s) ruim(ns) vão para `erros`
+        if len(lote) > 1:
+            for item in lote:
+                _gravar([item])
+            return
+        erros.append({"linha": lote[0][0], "erro": f"Falha ao gravar: {getattr(falha, 'orig', None) or falha}"})
+
+    lote: list[tuple[int, ChamadoImportRow]] = []
+    for linha, dados in linhas:
+        if isinstance(dados, Exception):
+            erros.append({"linha": linha, "erro": str(dados)})
+            continue
+        try:
+            row = ChamadoImportRow.model_validate(dados)
+            if row.visita:
+                date.fromisoformat(row.visita)
+        except (ValidationError, ValueError) as e:
+            erros.append({"linha": linha, "erro": str(e)})
+            continue
+        lote.append((linha, row))
+        if len(lote) >= tamanho_lote:
+            _gravar(lote)
+            lote = []
+    if lote:
+        _gravar(lote)
+    return {"importados": importados, "erros": erros, "codigos": codigos}
+
+
+_RE_CODIGO = re.compile(r"^EVQ-\d+$", re.IGNORECASE)
+_RE_PROTOCOLO = re.compile(r"^\d{8}-\d$")
+_RE_TOKEN = re.compile(r"[0-9a-z]+")
+# innodb_ft_min_token_size padrão: termos menores não entram no índice
+_MIN_TOKEN = 3
+
+
+def _tokenizar(q: str) -> list[str]:
+    """Tokens sem acento e em minúsculas (mesma normalização de setores em ti/services/users.py)."""
+    from ti.services.users import _normalize_str
+
+    return [t for t in _RE_TOKEN.findall(_normalize_str(q or "").lower()) if len(t) >= _MIN_TOKEN]
+
+
+def buscar_chamados(db: Session, q: str, limit: int = 20, offset: int = 0) -> list[Chamado]:
+    """Busca textual ordenada por relevância no índice FULLTEXT (modo booleano, todos os
+    termos obrigatórios, com prefixo). Código EVQ ou protocolo exatos vêm primeiro.
+    A insensibilidade a acentos do lado das colunas vem da collation *_ai_ci da tabela.
+    """
+    from sqlalchemy.dialects.mysql import match
+
+    ensure_chamado_schema()
+    q = (q or "").strip()
+    exatos: list[Chamado] = []
+    if _RE_CODIGO.match(q) or _RE_PROTOCOLO.match(q):
+        exatos = (
+            db.query(Chamado)
+            .filter((Chamado.codigo == q.upper()) | (Chamado.protocolo == q))
+            .order_by(Chamado.id.desc())
+            .all()
+        )
+    # A lista paginada é exatos + FULLTEXT (sem os exatos): a janela [offset, offset+limit)
+    # consome primeiro os exatos e desloca o offset do FULLTEXT pelo que eles ocupam
+    pagina = exatos[offset:offset + limit]
+    termos = _tokenizar(q)
+    if not termos or len(pagina) >= limit:
+        return pagina
+    cols = [getattr(Chamado, c) for c in _BUSCA_COLS]
+    score = match(*cols, against=" ".join(f"+{t}*" for t in termos)).in_boolean_mode()
+    stmt = (
+        select(Chamado)
+        .where(score > 0)
+        .order_by(score.desc(), Chamado.id.desc())
+        .offset(max(0, offset - len(exatos)))
+        .limit(limit - len(pagina))
+    )
+    if exatos:
+        stmt = stmt.where(Chamado.id.notin_([c.id for c in exatos]))
+    return pagina + list(db.execute(stmt).scalars().all())
+
+
+def obter_chamado(
+    db: Session,
+    chamado_id: int | None = None,
+    codigo: str | None = None,
+    protocolo: str | None = None,
+):
+    """Busca um chamado por id, código ou protocolo na tabela quente e, se não achar, no arquivo.
+    Retorna o Chamado (ORM), um dict do arquivo (arquivado=True) ou None."""
+    from ti.services.arquivo import buscar_arquivado
+
+    q = db.query(Chamado)
+    if chamado_id is not None:
+        q = q.filter(Chamado.id == chamado_id)
+    elif codigo:
+        q = q.filter(Chamado.codigo == codigo)
+    elif protocolo:
+        q = q.filter(Chamado.protocolo == protocolo)
+    else:
+        return None
+    ch = q.first()
+    if ch is not None:
+        return ch
+    return buscar_arquivado(db, chamado_id=chamado_id, codigo=codigo, protocolo=protocolo)
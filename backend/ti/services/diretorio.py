@@ -0,0 +1,100 @@
+"""Índice em memória do diretório de usuários: e-mail/usuário normalizados → id.
+
+Aquecido no startup (um SELECT de id, email, usuario) e mantido pelos caminhos
+de escrita de usuários. Para invalidar entre workers, cada escrita incrementa
+cache_versao['usuarios']; os outros workers comparam a versão no máximo a cada
+DIRETORIO_CHECK_INTERVALO segundos e recarregam quando ela mudou. A unicidade
+continua garantida pelos índices UNIQUE de user (o índice só evita a consulta).
+"""
+from __future__ import annotations
+import os
+import threading
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from core.db import engine
+from ti.models import User
+from ti.services.cache_versao import VersaoCompartilhada
+
+DIRETORIO_CHECK_INTERVALO = float(os.getenv("DIRETORIO_CHECK_INTERVALO", "2"))
+_cache = VersaoCompartilhada("usuarios", DIRETORIO_CHECK_INTERVALO)
+
+_lock = threading.Lock()
+_por_email: dict[str, int] = {}
+_por_usuario: dict[str, int] = {}
+_por_id: dict[int, tuple[str, str]] = {}
+
+
+def normalizar(valor: str | None) -> str:
+    # Mesma semântica da collation case-insensitive do MySQL
+    return str(valor or "").strip().lower()
+
+
+def aquecer(db: Session) -> int:
+    """(Re)carrega o índice inteiro. Retorna o número de usuários indexados."""
+    global _por_email, _por_usuario, _por_id
+    try:
+        User.__table__.create(bind=engine, checkfirst=True)
+    except Exception:
+        pass
+    versao = _cache.ler(db)
+    rows = db.execute(select(User.id, User.email, User.usuario)).all()
+    por_email = {normalizar(e): i for i, e, _ in rows if e}
+    por_usuario = {normalizar(u): i for i, _, u in rows if u}
+    por_id = {i: (normalizar(e), normalizar(u)) for i, e, u in rows}
+    with _lock:
+        _por_email, _por_usuario, _por_id = por_email, por_usuario, por_id
+    _cache.carregada(versao)
+    return len(por_id)
+
+
+def _atualizado(db: Session) -> None:
+    """Garante o índice carregado e, se a checagem venceu, alinhado com a versão do banco."""
+    if _cache.vencida(db):
+        aquecer(db)
+
+
+def id_por_email(db: Session, email: str | None) -> int | None:
+    _atualizado(db)
+    return _por_email.get(normalizar(email))
+
+
+def id_por_usuario(db: Session, usuario: str | None) -> int | None:
+    _atualizado(db)
+    return _por_usuario.get(normalizar(usuario))
+
+
+def id_por_identificador(db: Session, identificador: str | None) -> int | None:
+    """E-mail ou nome de usuário (como no login)."""
+    _atualizado(db)
+    chave = normalizar(identificador)
+    return _por_email.get(chave) or _por_usuario.get(chave)
+
+
+def _indexar(user_id: int, email: str | None, usuario: str | None) -> None:
+    with _lock:
+        antigo = _por_id.pop(user_id, None)
+        if antigo:
+            if _por_email.get(antigo[0]) == user_id:
+                _por_email.pop(antigo[0], None)
+            if _por_usuario.get(antigo[1]) == user_id:
+                _por_usuario.pop(antigo[1], None)
+        if email is None and usuario is None:
+            return
+        e, u = normalizar(email), normalizar(usuario)
+        _por_id[user_id] = (e, u)
+        if e:
+            _por_email[e] = user_id
+        if u:
+            _por_usuario[u] = user_id
+
+
+def usuario_salvo(db: Session, user: User) -> None:
+    """Chamar após o commit de criação/alteração de e-mail ou usuário."""
+    _indexar(user.id, user.email, user.usuario)
+    _cache.publicar(db)
+
+
+def usuario_removido(db: Session, user_id: int) -> None:
+    """Chamar após o commit da exclusão."""
+    _indexar(user_id, None, None)
+    _cache.publicar(db)
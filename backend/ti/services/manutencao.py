@@ -0,0 +1,139 @@
+"""Jobs de manutenção/migração de dados em lotes.
+
+executar_lotes() percorre uma tabela por id (keyset), entrega cada lote a uma
+função de processamento (que grava em massa, ex.: atualizar_em_lote com
+executemany) e faz commit por lote. O checkpoint (manutencao_checkpoint) é
+gravado na mesma transação do lote: se o job cair, a próxima execução retoma
+do último id confirmado. Progresso sai no log e fica consultável em status().
+
+Jobs registrados (scripts/manutencao.py <nome>): ver jobs().
+"""
+from __future__ import annotations
+import time
+from typing import Callable, Sequence
+from sqlalchemy import Table, bindparam, select, update
+from sqlalchemy.orm import Session
+from core.db import engine
+from core.utils import now_brazil_naive
+from ti.models import ManutencaoCheckpoint
+
+_schema_ok = False
+
+
+def ensure_manutencao_schema() -> None:
+    global _schema_ok
+    if _schema_ok:
+        return
+    try:
+        ManutencaoCheckpoint.__table__.create(bind=engine, checkfirst=True)
+        _schema_ok = True
+    except Exception:
+        pass
+
+
+def jobs() -> dict[str, Callable[..., int]]:
+    """Jobs disponíveis: nome -> função(db, lote=..., retomar=...) que retorna o total alterado."""
+    from ti.services.users import normalize_user_setores
+    from ti.services.user_setores import backfill
+    return {
+        "normalizar_setores": normalize_user_setores,
+        "backfill_user_setor": backfill,
+    }
+
+
+def selecionar_por_id(stmt, coluna, travar: bool = False) -> Callable[[Session, int, int], Sequence]:
+    """Seletor keyset para executar_lotes: `stmt` deve ter o id como primeira coluna.
+    Com travar=True as linhas lidas ficam travadas (FOR UPDATE) até o commit do lote."""
+    def selecionar(db: Session, apos_id: int, n: int) -> Sequence:
+        q = stmt.where(coluna > apos_id).order_by(coluna).limit(n)
+        if travar:
+            q = q.with_for_update()
+        return db.execute(q).all()
+    return selecionar
+
+
+def atualizar_em_lote(db: Session, tabela: Table, valores: list[dict], chave: str = "id") -> int:
+    """UPDATE tabela SET ... WHERE chave = :chave para cada dict (um executemany).
+    Todos os dicts devem ter as mesmas colunas."""
+    if not valores:
+        return 0
+    colunas = [c for c in valores[0] if c != chave]
+    stmt = (
+        update(tabela)
+        .where(tabela.c[chave] == bindparam(f"_{chave}"))
+        .values({c: bindparam(f"_{c}") for c in colunas})
+    )
+    db.connection().execute(stmt, [{f"_{k}": v for k, v in linha.items()} for linha in valores])
+    return len(valores)
+
+
+def executar_lotes(
+    db: Session,
+    nome: str,
+    selecionar: Callable[[Session, int, int], Sequence],
+    processar: Callable[[Session, Sequence], int],
+    lote: int = 500,
+    retomar: bool = True,
+) -> dict:
+    """Roda o job `nome` em lotes até o seletor não devolver mais linhas.
+    processar(db, linhas) grava as mudanças do lote (sem commit) e retorna quantas
+    linhas alterou. Com retomar=True um job interrompido continua do checkpoint;
+    um job já concluído (ou retomar=False) recomeça do início."""
+    ensure_manutencao_schema()
+    lote = max(1, int(lote))
+    agora = now_brazil_naive()
+    cp = db.get(ManutencaoCheckpoint, nome)
+    if cp is None:
+        cp = ManutencaoCheckpoint(nome=nome, ultimo_id=0, processados=0, alterados=0, iniciado_em=agora)
+        db.add(cp)
+    elif not retomar or cp.concluido_em is not None:
+        cp.ultimo_id, cp.processados, cp.alterados = 0, 0, 0
+        cp.iniciado_em, cp.concluido_em = agora, None
+    ultimo, processados, alterados = int(cp.ultimo_id or 0), int(cp.processados or 0), int(cp.alterados or 0)
+    retomado = ultimo > 0
+    cp.atualizado_em = agora
+    db.commit()
+    if retomado:
+        print(f"[MANUTENCAO] {nome}: retomando após id={ultimo} (processados={processados})")
+
+    inicio = time.monotonic()
+    feitos = 0
+    while True:
+        try:
+            linhas = selecionar(db, ultimo, lote)
+            if not linhas:
+                db.rollback()
+                break
+            n = int(processar(db, linhas) or 0)
+            ultimo = int(linhas[-1][0])
+            processados += len(linhas)
+            alterados += n
+            cp.ultimo_id, cp.processados, cp.alterados = ultimo, processados, alterados
+            cp.atualizado_em = now_brazil_naive()
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        feitos += len(linhas)
+        taxa = feitos / max(time.monotonic() - inicio, 1e-6)
+        print(f"[MANUTENCAO] {nome}: +{len(linhas)} (processados={processados}, alterados={alterados}, até id={ultimo}, {taxa:.0f}/s)")
+
+    cp.concluido_em = now_brazil_naive()
+    cp.atualizado_em = cp.concluido_em
+    db.commit()
+    return {"nome": nome, "processados": processados, "alterados": alterados, "ultimo_id": ultimo, "retomado": retomado}
+
+
+def status(db: Session) -> list[dict]:
+    """Checkpoints de todos os jobs que já rodaram."""
+    ensure_manutencao_schema()
+    rows = db.execute(select(ManutencaoCheckpoint).order_by(ManutencaoCheckpoint.nome)).scalars().all()
+    return [{
+        "nome": r.nome,
+        "ultimo_id": r.ultimo_id,
+        "processados": r.processados,
+        "alterados": r.alterados,
+        "iniciado_em": r.iniciado_em.isoformat() if r.iniciado_em else None,
+        "atualizado_em": r.atualizado_em.isoformat() if r.atualizado_em else None,
+        "concluido": r.concluido_em is not None,
+    } for r in rows]
@@ -0,0 +1,293 @@
+from __future__ import annotations
+import os
+import threading
+import time
+from datetime import timedelta
+from sqlalchemy import bindparam, func, inspect, or_, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from core.cache import LRUCache
+from core.db import SessionLocal, engine, ensure_index
+from core.utils import now_brazil_naive
+from ti.models import Notification, NotificationLeitura, NotificationLida
+from ti.services.arquivo import tabela_arquivo
+
+# Contador de não lidas por usuário. Atualizado na hora pelas escritas deste processo;
+# o TTL limita a defasagem quando a escrita aconteceu em outro worker.
+_contadores = LRUCache(
+    maxsize=int(os.getenv("NOTIF_CONTADOR_CACHE_SIZE", "5000")),
+    ttl=float(os.getenv("NOTIF_CONTADOR_TTL", "15")),
+)
+# Teto do contador (o sino mostra "9+"): a contagem lê no máximo esse número de linhas
+NOTIF_CONTADOR_MAX = int(os.getenv("NOTIF_CONTADOR_MAX", "100"))
+
+# Retenção: lidas somem após NOTIF_RETENCAO_DIAS; qualquer uma (inclusive gerais,
+# que não têm leitura por todos) após NOTIF_RETENCAO_MAX_DIAS.
+NOTIF_RETENCAO_DIAS = int(os.getenv("NOTIF_RETENCAO_DIAS", "30"))
+NOTIF_RETENCAO_MAX_DIAS = int(os.getenv("NOTIF_RETENCAO_MAX_DIAS", "180"))
+# "apagar" ou "arquivar" (copia para notification_arquivo antes de apagar)
+NOTIF_RETENCAO_MODO = os.getenv("NOTIF_RETENCAO_MODO", "apagar").strip().lower()
+# Intervalo do job em segundos (0 desliga)
+NOTIF_RETENCAO_INTERVALO = int(os.getenv("NOTIF_RETENCAO_INTERVALO", "3600"))
+
+_schema_ok = False
+
+
+def ensure_notificacoes_schema() -> None:
+    global _schema_ok
+    if _schema_ok:
+        return
+    try:
+        Notification.__table__.create(bind=engine, checkfirst=True)
+        NotificationLeitura.__table__.create(bind=engine, checkfirst=True)
+        NotificationLida.__table__.create(bind=engine, checkfirst=True)
+        ensure_index("notification", "ix_notification_usuario", ("usuario_id", "id"))
+        ensure_index("notification", "ix_notification_criado", ("criado_em",))
+        _schema_ok = True
+    except Exception:
+        pass
+
+
+def _visivel(usuario_id: int):
+    # Notificação sem destinatário é de todos
+    return or_(Notification.usuario_id.is_(None), Notification.usuario_id == usuario_id)
+
+
+def _marcador(db: Session, usuario_id: int) -> int:
+    v = db.execute(
+        select(NotificationLeitura.ultimo_lido_id).where(NotificationLeitura.usuario_id == usuario_id)
+    ).scalar()
+    return int(v or 0)
+
+
+def _contar(db: Session, usuario_id: int) -> int:
+    """Não lidas acima do marcador, limitadas a NOTIF_CONTADOR_MAX. Uma subconsulta com
+    LIMIT para as gerais e outra para as do usuário (cada uma é um range em
+    ix_notification_usuario), sem as lidas avulsas: nunca varre a tabela inteira."""
+    marcador = _marcador(db, usuario_id)
+    total = 0
+    for destino in (Notification.usuario_id.is_(None), Notification.usuario_id == usuario_id):
+        ids = (
+            select(Notification.id)
+            .where(destino, Notification.id > marcador)
+            .where(~select(NotificationLida.notification_id).where(
+                NotificationLida.usuario_id == usuario_id,
+                NotificationLida.notification_id == Notification.id,
+            ).exists())
+            .order_by(Notification.id.desc())
+            .limit(NOTIF_CONTADOR_MAX)
+            .subquery()
+        )
+        total += int(db.execute(select(func.count()).select_from(ids)).scalar() or 0)
+    return min(total, NOTIF_CONTADOR_MAX)
+
+
+def contar_nao_lidas(db: Session, usuario_id: int) -> int:
+    """Não lidas do usuário (até NOTIF_CONTADOR_MAX); servido da memória quando o
+    contador está em cache."""
+    n = _contadores.get(usuario_id)
+    if n is not None:
+        return n
+    ensure_notificacoes_schema()
+    n = _contar(db, usuario_id)
+    _contadores.set(usuario_id, n)
+    return n
+
+
+def notificacoes_criadas(usuario_id: int | None = None, n: int = 1) -> None:
+    """Chamar após o commit de novas notificações: incrementa os contadores em cache
+    (de todos, se for broadcast, ou só do destinatário)."""
+    if n <= 0:
+        return
+    if usuario_id is not None:
+        _contadores.update(usuario_id, lambda v: min(NOTIF_CONTADOR_MAX, v + n))
+        return
+    for uid in _contadores.keys():
+        _contadores.update(uid, lambda v: min(NOTIF_CONTADOR_MAX, v + n))
+
+
+def listar_para_usuario(
+    db: Session,
+    usuario_id: int,
+    limit: int = 50,
+    before_id: int | None = None,
+) -> list[dict]:
+    """Notificações visíveis ao usuário (mais recentes primeiro, paginadas por before_id),
+    com `lido` calculado por usuário. Sem DDL: roda também via AsyncSession.run_sync no
+    loop do ASGI; o schema é garantido no startup (ensure_notificacoes_schema)."""
+    marcador = _marcador(db, usuario_id)
+    q = select(Notification).where(_visivel(usuario_id))
+    if before_id is not None:
+        q = q.where(Notification.id < before_id)
+    rows = db.execute(q.order_by(Notification.id.desc()).limit(limit)).scalars().all()
+    acima = [n.id for n in rows if n.id > marcador]
+    lidas: set[int] = set()
+    if acima:
+        lidas = set(db.execute(
+            select(NotificationLida.notification_id)
+            .where(NotificationLida.usuario_id == usuario_id, NotificationLida.notification_id.in_(acima))
+        ).scalars().all())
+    out = []
+    for n in rows:
+        out.append({
+            "id": n.id,
+            "tipo": n.tipo,
+            "titulo": n.titulo,
+            "mensagem": n.mensagem,
+            "recurso": n.recurso,
+            "recurso_id": n.recurso_id,
+            "acao": n.acao,
+            "dados": n.dados,
+            "lido": n.id <= marcador or n.id in lidas,
+            "criado_em": n.criado_em,
+        })
+    return out
+
+
+def marcar_lida(db: Session, usuario_id: int, notification_id: int) -> bool:
+    """Marca uma notificação como lida só para este usuário. Retorna True se mudou algo."""
+    ensure_notificacoes_schema()
+    if notification_id <= _marcador(db, usuario_id):
+        return False
+    try:
+        db.add(NotificationLida(usuario_id=usuario_id, notification_id=notification_id, lido_em=now_brazil_naive()))
+        db.commit()
+    except IntegrityError:
+        # já lida (chave duplicada) ou notificação inexistente
+        db.rollback()
+        return False
+    if _contadores.get(usuario_id) == NOTIF_CONTADOR_MAX:
+        # no teto o valor real pode ser maior: recontar (limitado) na próxima leitura
+        _contadores.pop(usuario_id)
+    else:
+        _contadores.update(usuario_id, lambda v: max(0, v - 1))
+    return True
+
+
+def marcar_lidas_ate(db: Session, usuario_id: int, ate_id: int) -> int:
+    """Marca como lidas todas as notificações do usuário com id <= ate_id.
+    Avança o marcador, descarta leituras avulsas cobertas por ele e devolve as não lidas."""
+    ensure_notificacoes_schema()
+    try:
+        m = db.get(NotificationLeitura, usuario_id)
+        if m is None:
+            m = NotificationLeitura(usuario_id=usuario_id, ultimo_lido_id=0)
+            db.add(m)
+        if ate_id > (m.ultimo_lido_id or 0):
+            m.ultimo_lido_id = ate_id
+            m.atualizado_em = now_brazil_naive()
+            db.query(NotificationLida).filter(
+                NotificationLida.usuario_id == usuario_id,
+                NotificationLida.notification_id <= ate_id,
+            ).delete(synchronize_session=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    n = _contar(db, usuario_id)
+    _contadores.set(usuario_id, n)
+    return n
+
+
+def _colunas_arquivo() -> list[str]:
+    """Cria notification_arquivo (LIKE) se preciso e devolve as colunas em comum."""
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"CREATE TABLE IF NOT EXISTS {tabela_arquivo('notification')} LIKE notification")
+    insp = inspect(engine)
+    fria = {c.get("name") for c in insp.get_columns(tabela_arquivo("notification"))}
+    return [c.get("name") for c in insp.get_columns("notification") if c.get("name") in fria]
+
+
+def compactar_notificacoes(
+    db: Session,
+    dias: int = NOTIF_RETENCAO_DIAS,
+    max_dias: int = NOTIF_RETENCAO_MAX_DIAS,
+    modo: str = NOTIF_RETENCAO_MODO,
+    lote: int = 500,
+) -> int:
+    """Remove (ou arquiva) notificações antigas em lotes pequenos, um commit por lote.
+
+    Elegíveis: mais antigas que `dias` e lidas (flag legado, marcador do destinatário
+    ou leitura avulsa), ou mais antigas que `max_dias` em qualquer caso. A varredura
+    é por id crescente até o último id anterior ao corte, então cada lote é uma faixa
+    curta da PK. Retorna o total removido.
+    """
+    ensure_notificacoes_schema()
+    agora = now_brazil_naive()
+    corte = agora - timedelta(days=max(0, int(dias)))
+    corte_max = agora - timedelta(days=max(0, int(max_dias)))
+    teto = db.execute(select(func.max(Notification.id)).where(Notification.criado_em < corte)).scalar()
+    db.rollback()
+    if not teto:
+        return 0
+    cols = _colunas_arquivo() if modo == "arquivar" else []
+    sel = text(
+        "SELECT n.id FROM notification n "
+        "LEFT JOIN notification_leitura l ON l.usuario_id = n.usuario_id "
+        "WHERE n.id > :ultimo AND n.id <= :teto AND n.criado_em < :corte AND ("
+        "n.lido = 1 OR n.criado_em < :corte_max OR n.id <= l.ultimo_lido_id "
+        "OR EXISTS (SELECT 1 FROM notification_lida d WHERE d.usuario_id = n.usuario_id AND d.notification_id = n.id)"
+        ") ORDER BY n.id LIMIT :n FOR UPDATE OF n SKIP LOCKED"
+    )
+    total = 0
+    ultimo = 0
+    while True:
+        try:
+            ids = [int(r[0]) for r in db.execute(sel, {
+                "ultimo": ultimo,
+                "teto": int(teto),
+                "corte": corte,
+                "corte_max": corte_max,
+                "n": int(lote),
+            }).fetchall()]
+            if not ids:
+                db.rollback()
+                break
+            if cols:
+                c = ", ".join(cols)
+                db.execute(
+                    text(f"INSERT IGNORE INTO {tabela_arquivo('notification')} ({c}) SELECT {c} FROM notification WHERE id IN :ids")
+                    .bindparams(bindparam("ids", expanding=True)),
+                    {"ids": ids},
+                )
+            db.execute(
+                text("DELETE FROM notification_lida WHERE notification_id IN :ids").bindparams(bindparam("ids", expanding=True)),
+                {"ids": ids},
+            )
+            db.execute(
+                text("DELETE FROM notification WHERE id IN :ids").bindparams(bindparam("ids", expanding=True)),
+                {"ids": ids},
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        total += len(ids)
+        ultimo = ids[-1]
+        print(f"[NOTIF] lote de {len(ids)} notificações compactado (até id={ultimo}, total={total})")
+    if total:
+        # Gerais antigas não lidas podem ter saído: recalcula sob demanda
+        _contadores.clear()
+    return total
+
+
+_retencao_iniciada = False
+
+
+def iniciar_retencao(intervalo: int = NOTIF_RETENCAO_INTERVALO) -> None:
+    """Sobe (uma vez por processo) a thread que roda compactar_notificacoes periodicamente."""
+    global _retencao_iniciada
+    if _retencao_iniciada or intervalo <= 0:
+        return
+    _retencao_iniciada = True
+
+    def _loop():
+        while True:
+            time.sleep(intervalo)
+            try:
+                with SessionLocal() as db:
+                    compactar_notificacoes(db)
+            except Exception as e:
+                print(f"[NOTIF] falha na retenção: {e}")
+
+    threading.Thread(target=_loop, daemon=True).start()
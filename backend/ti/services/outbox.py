@@ -0,0 +1,298 @@
+"""Outbox transacional dos eventos Socket.IO.
+
+Quem altera o domínio grava os eventos em outbox_evento na MESMA transação
+(`registrar`) e, após o commit, só acorda o relay (`avisar`). O relay roda no loop
+do ASGI e reserva lotes numa transação curta (FOR UPDATE SKIP LOCKED + reservado_ate,
+com commit antes de emitir: nenhum lock fica aberto durante os emits), emite e apaga
+as linhas só depois que o emit foi confirmado (eventos coalescidos pelo realtime
+esperam o flush). Entrega é at-least-once: se o processo cair entre o emit e o
+DELETE, a reserva vence e o lote é reenviado (os clientes já tratam os eventos como
+idempotentes: refetch/upsert por id). Um evento que falha OUTBOX_MAX_TENTATIVAS vezes
+fica na tabela como dead letter e deixa de ser reservado.
+
+Mudanças de status (chamados.atualizar_status e atualizar_status_em_lote) só gravam
+o historico_status com notificar=1; antes de cada lote o relay gera, para esses
+históricos, a notificação e os eventos 'chamado:status'/'notification:new'
+(materializar_status). A notificação é eventualmente consistente: a marca fica no
+banco junto com a mudança, então nada se perde se o relay não estiver rodando (um
+script, por exemplo); ela é gerada quando algum relay passar pelo histórico.
+"""
+from __future__ import annotations
+import asyncio
+import json
+import os
+from datetime import timedelta
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.orm import Session
+from core.db import SessionLocal, engine, ensure_column, ensure_column_length, mark_flushed_nulls
+from core.realtime import emit_evento
+from core.utils import now_brazil_naive
+from ti.models import Chamado, HistoricoStatus, Notification, OutboxEvento
+
+OUTBOX_LOTE = int(os.getenv("OUTBOX_LOTE", "200"))
+# Varredura periódica (s): cobre eventos gravados por outros workers/scripts
+OUTBOX_INTERVALO = float(os.getenv("OUTBOX_INTERVALO", "1.0"))
+# Falhas até o evento virar dead letter (fica na tabela, fora das reservas)
+OUTBOX_MAX_TENTATIVAS = int(os.getenv("OUTBOX_MAX_TENTATIVAS", "5"))
+# Duração da reserva de um lote (s): se o relay cair no meio, o lote volta depois disso
+OUTBOX_RESERVA = float(os.getenv("OUTBOX_RESERVA", "30"))
+
+# Sala de quem acompanha a fila de chamados (painel de TI)
+SALA_TI = "setor:ti"
+
+_schema_ok = False
+_loop: asyncio.AbstractEventLoop | None = None
+_acordar: asyncio.Event | None = None
+
+
+def ensure_outbox_schema() -> None:
+    global _schema_ok
+    if _schema_ok:
+        return
+    try:
+        OutboxEvento.__table__.create(bind=engine, checkfirst=True)
+        ensure_column("outbox_evento", "reservado_ate", "DATETIME NULL")
+        # Tabelas criadas antes das listas JSON de salas tinham VARCHAR(100)
+        ensure_column_length("outbox_evento", "sala", 255, "VARCHAR(255) NULL")
+        _schema_ok = True
+    except Exception:
+        pass
+
+
+def registrar(db: Session, evento: str, payload: dict, sala: str | list[str] | None = None) -> None:
+    """Enfileira um emit na transação corrente (sem commit)."""
+    if isinstance(sala, (list, tuple)):
+        sala = json.dumps(list(sala), ensure_ascii=False)
+    db.add(OutboxEvento(
+        evento=evento,
+        payload=json.dumps(payload, ensure_ascii=False, default=str),
+        sala=sala,
+    ))
+
+
+def salas_chamado(chamado_id: int, unidade: str | None = None) -> list[str]:
+    """Interessados em eventos de um chamado: painel de TI, a unidade e quem o está vendo."""
+    salas = [SALA_TI, f"chamado:{chamado_id}"]
+    if unidade:
+        salas.append(f"unidade:{unidade}")
+    return salas
+
+
+def sala_notificacao(n) -> str:
+    """Notificação com destinatário vai para a sala do usuário; as gerais, para o painel de TI."""
+    return f"user:{n.usuario_id}" if n.usuario_id else SALA_TI
+
+
+def notificacao_payload(n) -> dict:
+    """Payload de 'notification:new' (mesmo formato de NotificationOut)."""
+    return {
+        "id": n.id,
+        "tipo": n.tipo,
+        "titulo": n.titulo,
+        "mensagem": n.mensagem,
+        "recurso": n.recurso,
+        "recurso_id": n.recurso_id,
+        "acao": n.acao,
+        "dados": n.dados,
+        "lido": bool(n.lido),
+        "criado_em": n.criado_em.isoformat() if n.criado_em else None,
+    }
+
+
+def avisar() -> None:
+    """Acorda o relay deste processo (pode ser chamado de qualquer thread, após o commit)."""
+    if _loop is None or _acordar is None:
+        return
+    try:
+        _loop.call_soon_threadsafe(_acordar.set)
+    except RuntimeError:
+        # loop encerrado
+        pass
+
+
+def materializar_status(lote: int = OUTBOX_LOTE) -> int:
+    """Gera notificação e eventos para os historico_status com notificar=1, num commit
+    por lote (a marca é limpa na mesma transação). Retorna quantos foram gerados."""
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(
+                HistoricoStatus.id, HistoricoStatus.status_anterior, HistoricoStatus.status_novo,
+                Chamado.id, Chamado.codigo, Chamado.protocolo, Chamado.unidade,
+            )
+            .join(Chamado, Chamado.id == HistoricoStatus.chamado_id)
+            .where(HistoricoStatus.notificar.is_(True))
+            .order_by(HistoricoStatus.id)
+            .limit(lote)
+            .with_for_update(of=HistoricoStatus, skip_locked=True)
+        ).all()
+        if not rows:
+            db.rollback()
+            return 0
+        notificacoes = [
+            Notification(
+                tipo="chamado",
+                titulo=f"Status atualizado: {codigo}",
+                mensagem=f"{prev} → {novo}",
+                recurso="chamado",
+                recurso_id=cid,
+                acao="status",
+                dados=json.dumps({
+                    "id": cid,
+                    "codigo": codigo,
+                    "protocolo": protocolo,
+                    "status": novo,
+                    "status_anterior": prev,
+                }, ensure_ascii=False),
+            )
+            for _, prev, novo, cid, codigo, protocolo, _ in rows
+        ]
+        db.add_all(notificacoes)
+        db.flush()
+        for (_, _, novo, cid, _, _, unidade), n in zip(rows, notificacoes):
+            mark_flushed_nulls(n)
+            registrar(db, "chamado:status", {"id": cid, "status": novo}, sala=salas_chamado(cid, unidade))
+            registrar(db, "notification:new", notificacao_payload(n), sala=sala_notificacao(n))
+        db.execute(
+            update(HistoricoStatus)
+            .where(HistoricoStatus.id.in_([r[0] for r in rows]))
+            .values(notificar=False)
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    from ti.services.notificacoes import notificacoes_criadas
+    notificacoes_criadas(n=len(rows))
+    return len(rows)
+
+
+def _reservar(lote: int) -> list[tuple[int, str, str, str | None]]:
+    """Reserva até `lote` eventos livres (não reservados e abaixo do limite de tentativas)
+    e faz commit da reserva: o emit acontece sem lock de linha aberto."""
+    agora = now_brazil_naive()
+    with SessionLocal() as db:
+        try:
+            rows = db.execute(
+                select(OutboxEvento.id, OutboxEvento.evento, OutboxEvento.payload, OutboxEvento.sala)
+                .where(
+                    OutboxEvento.tentativas < OUTBOX_MAX_TENTATIVAS,
+                    or_(OutboxEvento.reservado_ate.is_(None), OutboxEvento.reservado_ate < agora),
+                )
+                .order_by(OutboxEvento.id)
+                .limit(lote)
+                .with_for_update(skip_locked=True)
+            ).all()
+            if rows:
+                db.execute(
+                    update(OutboxEvento)
+                    .where(OutboxEvento.id.in_([r[0] for r in rows]))
+                    .values(reservado_ate=agora + timedelta(seconds=OUTBOX_RESERVA))
+                )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+    return [tuple(r) for r in rows]
+
+
+def _concluir(enviados: list[int], falhos: list[int], liberados: list[int]) -> None:
+    """Apaga os enviados, conta uma tentativa nos que falharam e devolve à fila
+    (sem contar tentativa) os que nem chegaram a ser tentados."""
+    with SessionLocal() as db:
+        try:
+            if enviados:
+                db.execute(delete(OutboxEvento).where(OutboxEvento.id.in_(enviados)))
+            if falhos:
+                db.execute(
+                    update(OutboxEvento)
+                    .where(OutboxEvento.id.in_(falhos))
+                    .values(tentativas=OutboxEvento.tentativas + 1, reservado_ate=None)
+                )
+                mortos = db.execute(
+                    select(OutboxEvento.id)
+                    .where(OutboxEvento.id.in_(falhos), OutboxEvento.tentativas >= OUTBOX_MAX_TENTATIVAS)
+                ).scalars().all()
+                for rid in mortos:
+                    print(f"[OUTBOX] evento id={rid} desistido após {OUTBOX_MAX_TENTATIVAS} tentativas (dead letter)")
+            if liberados:
+                db.execute(
+                    update(OutboxEvento)
+                    .where(OutboxEvento.id.in_(liberados))
+                    .values(reservado_ate=None)
+                )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+
+async def publicar_pendentes(lote: int = OUTBOX_LOTE) -> int:
+    """Publica um lote do outbox. Retorna quantos eventos foram emitidos."""
+    import anyio
+
+    try:
+        await anyio.to_thread.run_sync(materializar_status, lote)
+    except Exception as e:
+        print(f"[OUTBOX] falha ao gerar notificações de status: {e}")
+    rows = await anyio.to_thread.run_sync(_reservar, lote)
+    loop = asyncio.get_running_loop()
+    # Eventos coalescidos só saem no flush do realtime: a linha só é apagada depois
+    # que o futuro de entrega confirma o emit
+    entregas: list[tuple[int, str, asyncio.Future]] = []
+    falhos: list[int] = []
+    for rid, evento, payload, sala in rows:
+        entrega = loop.create_future()
+        try:
+            salas = json.loads(sala) if sala and sala.startswith("[") else sala
+            await emit_evento(evento, json.loads(payload), room=salas, delivered=entrega)
+            entregas.append((rid, evento, entrega))
+        except Exception as e:
+            print(f"[OUTBOX] falha ao emitir id={rid} evento={evento}: {e}")
+            # mantém a ordem: o restante do lote volta para a próxima rodada; depois de
+            # OUTBOX_MAX_TENTATIVAS falhas o evento sai da fila e não bloqueia os seguintes
+            falhos.append(rid)
+            break
+    liberados = [r[0] for r in rows[len(entregas) + len(falhos):]]
+    if entregas:
+        # Sem resposta antes da reserva vencer = falha (a reserva devolveria o evento de qualquer jeito)
+        await asyncio.wait([f for _, _, f in entregas], timeout=OUTBOX_RESERVA)
+    enviados: list[int] = []
+    for rid, evento, entrega in entregas:
+        erro = (entrega.exception() or None) if entrega.done() else TimeoutError("flush sem resposta")
+        if erro is None:
+            enviados.append(rid)
+        else:
+            print(f"[OUTBOX] falha ao emitir id={rid} evento={evento}: {erro}")
+            falhos.append(rid)
+    await anyio.to_thread.run_sync(_concluir, enviados, falhos, liberados)
+    return len(enviados)
+
+
+async def _relay() -> None:
+    assert _acordar is not None
+    while True:
+        try:
+            await asyncio.wait_for(_acordar.wait(), timeout=OUTBOX_INTERVALO)
+        except asyncio.TimeoutError:
+            pass
+        _acordar.clear()
+        try:
+            while await publicar_pendentes() >= OUTBOX_LOTE:
+                pass
+        except Exception as e:
+            print(f"[OUTBOX] relay: {e}")
+            await asyncio.sleep(OUTBOX_INTERVALO)
+
+
+def iniciar_relay() -> None:
+    """Sobe o relay no loop corrente (chamar de um hook de startup assíncrono)."""
+    global _loop, _acordar
+    if _loop is not None:
+        return
+    ensure_outbox_schema()
+    _loop = asyncio.get_running_loop()
+    _acordar = asyncio.Event()
+    _loop.create_task(_relay())
@@ -0,0 +1,92 @@
+"""Tabela em memória de revogação de sessões: id do usuário → session_revoked_at.
+
+Só usuários ativos (existentes e não bloqueados) estão na tabela; bloqueado ou
+excluído = sessão inválida. Carregada no startup (um SELECT de id, bloqueado,
+session_revoked_at) e atualizada por force_logout, set_block_status,
+delete_user e demais escritas que mexem em bloqueio. Entre workers a
+propagação usa cache_versao['sessoes'] (ti.services.cache_versao), conferida
+no máximo a cada SESSAO_CHECK_INTERVALO segundos, como no diretório de usuários.
+"""
+from __future__ import annotations
+import os
+import threading
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from core.db import engine
+from ti.models import User
+from ti.services.cache_versao import VersaoCompartilhada
+
+SESSAO_CHECK_INTERVALO = float(os.getenv("SESSAO_CHECK_INTERVALO", "2"))
+_cache = VersaoCompartilhada("sessoes", SESSAO_CHECK_INTERVALO)
+
+_lock = threading.Lock()
+_ativos: dict[int, datetime | None] = {}
+# ids consultados no banco e inexistentes (evita repetir a consulta até o próximo reload)
+_ausentes: set[int] = set()
+_schema_ok = False
+
+
+def _ensure_schema() -> None:
+    global _schema_ok
+    if _schema_ok:
+        return
+    try:
+        User.__table__.create(bind=engine, checkfirst=True)
+        _schema_ok = True
+    except Exception:
+        pass
+
+
+def carregar(db: Session) -> int:
+    """(Re)carrega a tabela inteira. Retorna o número de usuários ativos."""
+    global _ativos, _ausentes
+    _ensure_schema()
+    versao = _cache.ler(db)
+    rows = db.execute(select(User.id, User.bloqueado, User.session_revoked_at)).all()
+    ativos = {i: revogado for i, bloqueado, revogado in rows if not bloqueado}
+    with _lock:
+        _ativos, _ausentes = ativos, set()
+    _cache.carregada(versao)
+    return len(ativos)
+
+
+def _atualizado(db: Session) -> None:
+    if _cache.vencida(db):
+        carregar(db)
+
+
+def estado(db: Session, user_id: int) -> tuple[bool, datetime | None]:
+    """(ativo, session_revoked_at) do usuário, da memória."""
+    _atualizado(db)
+    if user_id in _ativos:
+        return True, _ativos[user_id]
+    if user_id in _ausentes:
+        return False, None
+    # Criado/desbloqueado em outro worker há menos de SESSAO_CHECK_INTERVALO
+    row = db.execute(select(User.bloqueado, User.session_revoked_at).where(User.id == user_id)).first()
+    with _lock:
+        if row is None or row.bloqueado:
+            _ausentes.add(user_id)
+            return False, row.session_revoked_at if row else None
+        _ativos[user_id] = row.session_revoked_at
+    return True, row.session_revoked_at
+
+
+def usuario_salvo(db: Session, user: User) -> None:
+    """Chamar após o commit de qualquer escrita que mude bloqueado ou session_revoked_at."""
+    with _lock:
+        _ausentes.discard(user.id)
+        if user.bloqueado:
+            _ativos.pop(user.id, None)
+        else:
+            _ativos[user.id] = user.session_revoked_at
+    _cache.publicar(db)
+
+
+def usuario_removido(db: Session, user_id: int) -> None:
+    """Chamar após o commit da exclusão."""
+    with _lock:
+        _ativos.pop(user_id, None)
+        _ausentes.add(user_id)
+    _cache.publicar(db)
@@ -0,0 +1,138 @@
+"""Associação usuário → setor normalizada (tabela user_setor).
+
+user._setores (JSON) continua sendo a fonte que o frontend lê; user_setor é o
+espelho indexado para "quem está no setor X" (filtro_setor, usado pela listagem
+e por /usuarios/setores/{setor}/membros) e para a contagem por setor, sem varrer
+e parsear o JSON de todos os usuários. Os caminhos de escrita de
+usuários chamam sincronizar()/remover() na mesma transação. Usuários
+anteriores à tabela entram pelo job de manutenção backfill_user_setor
+(scripts/manutencao.py ou scripts/ensure_schema.py), que ao terminar grava
+cache_versao['user_setor']; até lá as consultas por setor continuam no LIKE
+sobre _setores.
+"""
+from __future__ import annotations
+import json
+from sqlalchemy import delete, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+from core.db import engine
+from ti.models import CacheVersao, User, UserSetor
+
+_MARCADOR = "user_setor"
+_schema_ok = False
+_pronto = False
+
+
+def ensure_user_setor_schema() -> None:
+    global _schema_ok
+    if _schema_ok:
+        return
+    try:
+        User.__table__.create(bind=engine, checkfirst=True)
+        UserSetor.__table__.create(bind=engine, checkfirst=True)
+        CacheVersao.__table__.create(bind=engine, checkfirst=True)
+        _schema_ok = True
+    except Exception:
+        pass
+
+
+def normalizados(raw: str | None, setor: str | None) -> list[str]:
+    """Setores de _setores (JSON) ou do setor legado, normalizados e sem repetição."""
+    from ti.services.users import _normalize_str
+    try:
+        valores = json.loads(raw) if raw else ([setor] if setor else [])
+        if not isinstance(valores, list):
+            valores = [valores]
+    except Exception:
+        valores = [raw]
+    out = (_normalize_str(str(v)) for v in valores if v is not None)
+    return list(dict.fromkeys(s for s in out if s))
+
+
+def sincronizar(db: Session, usuario_id: int, setores: list[str]) -> None:
+    """Regrava os setores do usuário. Não faz commit: roda na transação de quem escreveu o usuário."""
+    sincronizar_lote(db, {usuario_id: setores})
+
+
+def sincronizar_lote(db: Session, setores_por_usuario: dict[int, list[str]]) -> None:
+    """sincronizar() para vários usuários: um DELETE ... IN e um INSERT executemany."""
+    if not setores_por_usuario:
+        return
+    ensure_user_setor_schema()
+    db.execute(delete(UserSetor).where(UserSetor.usuario_id.in_(list(setores_por_usuario))))
+    valores = [
+        {"usuario_id": uid, "setor": s[:255], "ordem": i}
+        for uid, setores in setores_por_usuario.items()
+        for i, s in enumerate(dict.fromkeys(s for s in setores if s))
+    ]
+    if valores:
+        db.execute(insert(UserSetor), valores)
+
+
+def remover(db: Session, usuario_id: int) -> None:
+    ensure_user_setor_schema()
+    db.execute(delete(UserSetor).where(UserSetor.usuario_id == usuario_id))
+
+
+def pronto(db: Session) -> bool:
+    """True depois que o backfill terminou (a tabela cobre todos os usuários)."""
+    global _pronto
+    if _pronto:
+        return True
+    ensure_user_setor_schema()
+    try:
+        v = db.execute(select(CacheVersao.versao).where(CacheVersao.nome == _MARCADOR)).scalar()
+    except Exception:
+        return False
+    _pronto = bool(v)
+    return _pronto
+
+
+def backfill(db: Session, lote: int = 500, retomar: bool = True) -> int:
+    """Preenche user_setor a partir de user._setores/setor (job de manutenção).
+    Cada lote trava as linhas de user lidas, para não atropelar uma edição
+    concorrente. Idempotente. Retorna o número de usuários processados."""
+    global _pronto
+    from ti.services.manutencao import executar_lotes, selecionar_por_id
+    ensure_user_setor_schema()
+
+    def processar(db: Session, rows) -> int:
+        sincronizar_lote(db, {r.id: normalizados(r._setores, r.setor) for r in rows})
+        return len(rows)
+
+    res = executar_lotes(
+        db,
+        "backfill_user_setor",
+        selecionar_por_id(select(User.id, User._setores, User.setor), User.id, travar=True),
+        processar,
+        lote=lote,
+        retomar=retomar,
+    )
+    try:
+        if db.get(CacheVersao, _MARCADOR) is None:
+            db.add(CacheVersao(nome=_MARCADOR, versao=1))
+        else:
+            db.execute(update(CacheVersao).where(CacheVersao.nome == _MARCADOR).values(versao=1))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    _pronto = True
+    return res["processados"]
+
+
+def filtro_setor(db: Session, setor: str):
+    """Condição sobre User.id para "usuário está no setor" (LIKE em _setores antes do backfill)."""
+    from ti.services.users import _normalize_str
+    alvo = _normalize_str(setor.strip())
+    if pronto(db):
+        return User.id.in_(select(UserSetor.usuario_id).where(UserSetor.setor == alvo))
+    return or_(User.setor == alvo, User._setores.like(f'%"{alvo}"%'))
+
+
+def contagem(db: Session) -> list[dict]:
+    """Número de usuários por setor (vazio até o backfill rodar)."""
+    ensure_user_setor_schema()
+    rows = db.execute(
+        select(UserSetor.setor, func.count()).group_by(UserSetor.setor).order_by(UserSetor.setor)
+    ).all()
+    return [{"setor": s, "total": int(n)} for s, n in rows]
@@ -1,11 +1,17 @@
 from __future__ import annotations
 import json
+import os
 import secrets
 import string
+from sqlalchemy import or_, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from werkzeug.security import generate_password_hash
 from ti.models import User
-from core.db import engine
+from ti.services import diretorio, sessoes, user_setores
+from core.cache import LRUCache
+from core.db import engine, ensure_index
+from core.passwords import hash_password, verify_password
+from core.utils import now_brazil_naive
 from ti.schemas.user import UserCreate, UserCreatedOut, UserAvailability
 
 
@@ -34,10 +40,11 @@ def check_user_availability(db: Session, email: str | None = None, username: str
     except Exception:
         pass
     availability = UserAvailability()
+    # Servido do índice em memória (ti/services/diretorio.py)
     if email is not None:
-        availability.email_exists = db.query(User).filter(User.email == email).first() is not None
+        availability.email_exists = diretorio.id_por_email(db, email) is not None
     if username is not None:
-        availability.usuario_exists = db.query(User).filter(User.usuario == username).first() is not None
+        availability.usuario_exists = diretorio.id_por_usuario(db, username) is not None
     return availability
 
 
@@ -50,10 +57,10 @@ def criar_usuario(db: Session, payload: UserCreate) -> UserCreatedOut:
         User.__table__.create(bind=engine, checkfirst=True)
     except Exception:
         pass
-    # Uniqueness checks
-    if payload.email and db.query(User).filter(User.email == str(payload.email)).first():
+    # Uniqueness checks (in-memory index; the UNIQUE indexes still have the last word)
+    if payload.email and diretorio.id_por_email(db, str(payload.email)) is not None:
         raise ValueError("E-mail já cadastrado")
-    if payload.usuario and db.query(User).filter(User.usuario == payload.usuario).first():
+    if payload.usuario and diretorio.id_por_usuario(db, payload.usuario) is not None:
         raise ValueError("Nome de usuário já cadastrado")
 
     # Password generation in backend if not provided
@@ -61,6 +68,7 @@ def criar_usuario(db: Session, payload: UserCreate) -> UserCreatedOut:
 
     setores_json = None
     setor = None
+    normalized: list[str] = []
     if payload.setores and len(payload.setores) > 0:
         normalized = [_normalize_str(str(s)) for s in payload.setores]
         setores_json = json.dumps(normalized)
@@ -71,7 +79,7 @@ def criar_usuario(db: Session, payload: UserCreate) -> UserCreatedOut:
         sobrenome=payload.sobrenome,
         usuario=payload.usuario,
         email=str(payload.email),
-        senha_hash=generate_password_hash(generated_password),
+        senha_hash=hash_password(generated_password),
         alterar_senha_primeiro_acesso=payload.alterar_senha_primeiro_acesso,
         nivel_acesso=payload.nivel_acesso,
         setor=setor,
@@ -79,8 +87,16 @@ def criar_usuario(db: Session, payload: UserCreate) -> UserCreatedOut:
         bloqueado=payload.bloqueado,
     )
     db.add(novo)
-    db.commit()
+    try:
+        db.flush()
+        user_setores.sincronizar(db, novo.id, normalized)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise ValueError("E-mail ou nome de usuário já cadastrado")
     db.refresh(novo)
+    diretorio.usuario_salvo(db, novo)
+    sessoes.usuario_salvo(db, novo)
 
     return UserCreatedOut(
         id=novo.id,
@@ -128,12 +144,14 @@ def update_user(db: Session, user_id: int, data: dict) -> User:
     if not user:
         raise ValueError("Usuário não encontrado")
 
+    identidade = (user.email, user.usuario)
+    bloqueado_antes = bool(user.bloqueado)
     if "email" in data and data["email"] and data["email"] != user.email:
-        if db.query(User).filter(User.email == str(data["email"])) .first():
+        if diretorio.id_por_email(db, str(data["email"])) not in (None, user.id):
             raise ValueError("E-mail já cadastrado")
         user.email = str(data["email"])  # type: ignore
     if "usuario" in data and data["usuario"] and data["usuario"] != user.usuario:
-        if db.query(User).filter(User.usuario == data["usuario"]).first():
+        if diretorio.id_por_usuario(db, data["usuario"]) not in (None, user.id):
             raise ValueError("Nome de usuário já cadastrado")
         user.usuario = data["usuario"]  # type: ignore
 
@@ -149,9 +167,18 @@ def update_user(db: Session, user_id: int, data: dict) -> User:
         user.bloqueado = bool(data["bloqueado"])  # type: ignore
     if "setores" in data:
         _set_setores(user, data["setores"])  # type: ignore
+        user_setores.sincronizar(db, user.id, user_setores.normalizados(user._setores, user.setor))
 
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise ValueError("E-mail ou nome de usuário já cadastrado")
     db.refresh(user)
+    if (user.email, user.usuario) != identidade:
+        diretorio.usuario_salvo(db, user)
+    if bool(user.bloqueado) != bloqueado_antes:
+        sessoes.usuario_salvo(db, user)
     return user
 
 
@@ -168,7 +195,7 @@ def regenerate_password(db: Session, user_id: int, length: int = 6) -> str:
     if not user:
         raise ValueError("Usuário não encontrado")
     new_pwd = _generate_password(length)
-    user.senha_hash = generate_password_hash(new_pwd)
+    user.senha_hash = hash_password(new_pwd)
     user.alterar_senha_primeiro_acesso = True
     db.commit()
     return new_pwd
@@ -188,6 +215,7 @@ def set_block_status(db: Session, user_id: int, blocked: bool) -> User:
         user.bloqueado_ate = None
     db.commit()
     db.refresh(user)
+    sessoes.usuario_salvo(db, user)
     return user
 
 
@@ -199,8 +227,11 @@ def delete_user(db: Session, user_id: int) -> None:
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         return
+    user_setores.remover(db, user_id)
     db.delete(user)
     db.commit()
+    diretorio.usuario_removido(db, user_id)
+    sessoes.usuario_removido(db, user_id)
 
 
 def list_blocked_users(db: Session) -> list[User]:
@@ -211,50 +242,163 @@ def list_blocked_users(db: Session) -> list[User]:
     return db.query(User).filter(User.bloqueado == True).order_by(User.id.desc()).all()
 
 
+_schema_ok = False
+
+
+def ensure_user_schema() -> None:
+    """user table plus the indexes the listing search relies on (prefix LIKE per column;
+    usuario and email are already unique)."""
+    global _schema_ok
+    if _schema_ok:
+        return
+    try:
+        User.__table__.create(bind=engine, checkfirst=True)
+        ensure_index("user", "ix_user_nome", ("nome",))
+        ensure_index("user", "ix_user_sobrenome", ("sobrenome",))
+        _schema_ok = True
+    except Exception:
+        pass
+
+
+def _prefixo(termo: str) -> str:
+    """Padrão LIKE 'termo%' com os curingas do próprio termo escapados."""
+    return termo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+# Parsed setores keyed by the raw column values: a user's entry changes only
+# when _setores/setor change, and users with the same sectors share one entry.
+_setores_cache = LRUCache(maxsize=int(os.getenv("USER_SETORES_CACHE_SIZE", "5000")))
+
+# Columns for listings (no senha_hash)
+_COLUNAS_LISTA = (
+    User.id, User.nome, User.sobrenome, User.usuario, User.email, User.nivel_acesso,
+    User.setor, User._setores, User.bloqueado, User.session_revoked_at,
+)
+
+
+def setores_de(raw: str | None, setor: str | None) -> list[str]:
+    """Lista de setores a partir de _setores (JSON) ou do setor legado, com cache."""
+    chave = (raw, setor)
+    out = _setores_cache.get(chave)
+    if out is None:
+        try:
+            if raw:
+                out = tuple(str(x) for x in json.loads(raw) if x is not None)
+            elif setor:
+                out = (str(setor),)
+            else:
+                out = ()
+        except Exception:
+            out = (str(setor),) if setor else ()
+        _setores_cache.set(chave, out)
+    return list(out)
+
+
+def listar_usuarios_resumo(
+    db: Session,
+    q: str | None = None,
+    setor: str | None = None,
+    bloqueado: bool | None = None,
+    limit: int | None = None,
+    before_id: int | None = None,
+) -> list[dict]:
+    """Usuários (id desc) sem senha_hash, com filtros opcionais.
+    q busca por prefixo em nome, sobrenome, usuario e email (cada coluna tem índice,
+    então é um range scan por coluna, não uma varredura); "nome sobrenome" casa o
+    prefixo de cada parte. setor casa com qualquer setor do usuário.
+    Com limit, pagina por cursor: a próxima página usa before_id = último id recebido."""
+    ensure_user_schema()
+    stmt = select(*_COLUNAS_LISTA)
+    if bloqueado is not None:
+        stmt = stmt.where(User.bloqueado == bool(bloqueado))
+    if q and q.strip():
+        termo = q.strip()
+        condicoes = [
+            User.nome.like(_prefixo(termo), escape="\\"),
+            User.sobrenome.like(_prefixo(termo), escape="\\"),
+            User.usuario.like(_prefixo(termo), escape="\\"),
+            User.email.like(_prefixo(termo), escape="\\"),
+        ]
+        primeiro, _, resto = termo.partition(" ")
+        if resto.strip():
+            condicoes.append(
+                User.nome.like(_prefixo(primeiro), escape="\\")
+                & User.sobrenome.like(_prefixo(resto.strip()), escape="\\")
+            )
+        stmt = stmt.where(or_(*condicoes))
+    if setor and setor.strip():
+        stmt = stmt.where(user_setores.filtro_setor(db, setor))
+    if before_id is not None:
+        stmt = stmt.where(User.id < before_id)
+    stmt = stmt.order_by(User.id.desc())
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    rows = []
+    for r in db.execute(stmt).all():
+        setores_list = setores_de(r._setores, r.setor)
+        rows.append({
+            "id": r.id,
+            "nome": r.nome,
+            "sobrenome": r.sobrenome,
+            "usuario": r.usuario,
+            "email": r.email,
+            "nivel_acesso": r.nivel_acesso,
+            "setor": setores_list[0] if setores_list else None,
+            "setores": setores_list,
+            "bloqueado": bool(r.bloqueado),
+            "session_revoked_at": r.session_revoked_at.isoformat() if r.session_revoked_at else None,
+        })
+    return rows
+
+
 def authenticate_user(db: Session, identifier: str, senha: str) -> dict:
     """Authenticate by email or usuario. Returns dict with user info on success."""
     try:
         User.__table__.create(bind=engine, checkfirst=True)
     except Exception:
         pass
-    user = db.query(User).filter((User.email == identifier) | (User.usuario == identifier)).first()
-    from werkzeug.security import check_password_hash
+    uid = diretorio.id_por_identificador(db, identifier)
+    if uid is not None:
+        user = db.get(User, uid)
+    else:
+        # not indexed yet (e.g. created on another worker moments ago)
+        user = db.query(User).filter((User.email == identifier) | (User.usuario == identifier)).first()
     if not user:
         raise ValueError("Usuário não encontrado")
     if user.bloqueado:
         raise PermissionError("Usuário bloqueado")
 
-    if not check_password_hash(user.senha_hash, senha):
+    if not verify_password(user.senha_hash, senha):
         # increment attempts
         try:
             user.tentativas_login = (user.tentativas_login or 0) + 1
             max_attempts = int(os.getenv("MAX_LOGIN_ATTEMPTS", "5"))
-            if user.tentativas_login >= max_attempts:
+            bloqueou = user.tentativas_login >= max_attempts
+            if bloqueou:
                 user.bloqueado = True
             db.commit()
+            if bloqueou:
+                sessoes.usuario_salvo(db, user)
         except Exception:
             db.rollback()
         raise ValueError("Senha inválida")
 
-    # Successful login: reset attempts and update ultimo_acesso
-    try:
-        user.tentativas_login = 0
-        user.bloqueado = False
-        user.ultimo_acesso = now_brazil_naive()
-        db.commit()
-    except Exception:
-        db.rollback()
+    # Successful login: resetting failed attempts is written now; a login that
+    # only moves ultimo_acesso goes through the write-behind buffer
+    agora = now_brazil_naive()
+    if user.tentativas_login:
+        try:
+            user.tentativas_login = 0
+            user.ultimo_acesso = agora
+            db.commit()
+        except Exception:
+            db.rollback()
+    else:
+        from ti.services.acessos import registrar_acesso
+        registrar_acesso(user.id, agora)
 
     # prepare setores list and normalize strings (remove accents)
-    setores_list: list[str] = []
-    try:
-        if user._setores:
-            raw = json.loads(user._setores)
-            setores_list = [ _normalize_str(str(s)) for s in raw if s is not None ]
-        elif user.setor:
-            setores_list = [ _normalize_str(str(user.setor)) ]
-    except Exception:
-        setores_list = [ _normalize_str(str(user.setor))] if user.setor else []
+    setores_list = user_setores.normalizados(user._setores, user.setor)
 
     # Debug log to help trace login+alterar_senha flow
     try:
@@ -274,48 +418,41 @@ def authenticate_user(db: Session, identifier: str, senha: str) -> dict:
         "session_revoked_at": user.session_revoked_at.isoformat() if getattr(user, 'session_revoked_at', None) else None,
     }
 
-# Migration script to normalize setores in DB
-def normalize_user_setores(db: Session) -> int:
-    """Normalize setor and _setores for all users. Returns number of updated users."""
-    updated = 0
-    try:
-        users = db.query(User).all()
-        for u in users:
-            changed = False
-            # normalize single setor
-            if u.setor:
-                norm = _normalize_str(u.setor)
-                if norm != (u.setor or ""):
-                    u.setor = norm
-                    changed = True
-            # normalize _setores JSON
-            if u._setores:
+# Migration job to normalize setores in DB
+def normalize_user_setores(db: Session, lote: int = 500, retomar: bool = True) -> int:
+    """Normalize setor and _setores for all users in chunks (maintenance job).
+    Returns number of updated users."""
+    from ti.services.manutencao import atualizar_em_lote, executar_lotes, selecionar_por_id
+
+    def processar(db: Session, rows) -> int:
+        valores = []
+        for r in rows:
+            setor = _normalize_str(r.setor) if r.setor else r.setor
+            raw = r._setores
+            if raw:
                 try:
-                    arr = json.loads(u._setores)
-                    norm_arr = [ _normalize_str(str(s)) for s in arr ]
-                    if json.dumps(norm_arr, ensure_ascii=False) != u._setores:
-                        u._setores = json.dumps(norm_arr, ensure_ascii=False)
-                        changed = True
+                    arr = json.loads(raw)
+                    if not isinstance(arr, list):
+                        arr = [arr]
+                    raw = json.dumps([_normalize_str(str(s)) for s in arr], ensure_ascii=False)
                 except Exception:
-                    # try to coerce single string
-                    try:
-                        norm = _normalize_str(str(u._setores))
-                        u._setores = json.dumps([norm], ensure_ascii=False)
-                        changed = True
-                    except Exception:
-                        pass
-            if changed:
-                db.add(u)
-                updated += 1
-        if updated:
-            db.commit()
-    except Exception as e:
-        try:
-            db.rollback()
-        except:
-            pass
-        raise
-    return updated
+                    # coerce a single string
+                    raw = json.dumps([_normalize_str(str(raw))], ensure_ascii=False)
+            if setor != r.setor or raw != r._setores:
+                valores.append({"id": r.id, "setor": setor, "_setores": raw})
+        atualizar_em_lote(db, User.__table__, valores)
+        user_setores.sincronizar_lote(db, {v["id"]: user_setores.normalizados(v["_setores"], v["setor"]) for v in valores})
+        return len(valores)
+
+    res = executar_lotes(
+        db,
+        "normalizar_setores",
+        selecionar_por_id(select(User.id, User.setor, User._setores), User.id, travar=True),
+        processar,
+        lote=lote,
+        retomar=retomar,
+    )
+    return res["alterados"]
 
 
 def change_user_password(db: Session, user_id: int, new_password: str, require_change: bool = False) -> None:
@@ -326,6 +463,6 @@ def change_user_password(db: Session, user_id: int, new_password: str, require_c
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise ValueError("Usuário não encontrado")
-    user.senha_hash = generate_password_hash(new_password)
+    user.senha_hash = hash_password(new_password)
     user.alterar_senha_primeiro_acesso = bool(require_change)
     db.commit()
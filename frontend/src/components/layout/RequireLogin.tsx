@@ -1,6 +1,7 @@
 import { useEffect, useState } from "react";
 import { useLocation, Navigate } from "react-router-dom";
 import { useAuthContext } from "@/lib/auth-context";
+import { freshAfter } from "@/lib/api";
 
 export default function RequireLogin({
   children,
@@ -38,7 +39,7 @@ export default function RequireLogin({
       return pathname.startsWith("/setor/");
     };
 
-    const fetchRemote = async () => {
+    const fetchRemote = async (init?: RequestInit) => {
       if (!isAuthenticated || !user?.id) return;
       // Administrators don't need remote validation
       if (user?.nivel_acesso === "Administrador") {
@@ -51,7 +52,7 @@ export default function RequireLogin({
 
       try {
         if (mounted && !remoteUser) setChecking(true);
-        const res = await fetch(`/api/usuarios/${user.id}`);
+        const res = await fetch(`/api/usuarios/${user.id}`, init);
         if (!res.ok) {
           if (mounted) setRemoteUser(null);
           return;
@@ -65,6 +66,28 @@ export default function RequireLogin({
       }
     };
 
+    // Cheap periodic check: served from the server's in-memory revocation table
+    const checkSession = async () => {
+      if (!isAuthenticated || !user?.id) return;
+      if (user?.nivel_acesso === "Administrador") return;
+      try {
+        const res = await fetch(`/api/usuarios/${user.id}/session`);
+        if (!res.ok) return;
+        const data = await res.json();
+        if (!mounted || abort) return;
+        if (!data?.ativo) {
+          // blocked or deleted
+          logout();
+          return;
+        }
+        setRemoteUser((prev: any) =>
+          prev && prev.session_revoked_at !== data.session_revoked_at
+            ? { ...prev, session_revoked_at: data.session_revoked_at }
+            : prev,
+        );
+      } catch (e) {}
+    };
+
     // If we're on a sector route, perform the check once.
     if (shouldCheckNow()) fetchRemote();
 
@@ -83,25 +106,25 @@ export default function RequireLogin({
     };
 
     // Also listen to socket-level auth:refresh for faster sync
-    const onAuthRefresh = () => {
+    const onAuthRefresh = (e: Event) => {
       console.debug(
         "[REQUIRE_LOGIN] auth:refresh received, syncing permissions",
       );
-      if (shouldCheckNow()) fetchRemote();
+      if (shouldCheckNow()) fetchRemote(freshAfter((e as CustomEvent).detail));
     };
 
     window.addEventListener("users:changed", onUsersChanged as EventListener);
     window.addEventListener("auth:refresh", onAuthRefresh as EventListener);
 
-    // Aggressive polling on sector pages to ensure permissions are up-to-date
+    // Session polling on sector pages (permission changes arrive via auth:refresh)
     let sectorPollInterval: ReturnType<typeof setInterval> | null = null;
     if (shouldCheckNow() && !user?.nivel_acesso?.includes("Administrador")) {
       console.debug(
-        "[REQUIRE_LOGIN] Setting up aggressive polling on sector page (5s)",
+        "[REQUIRE_LOGIN] Setting up session polling on sector page (5s)",
       );
       sectorPollInterval = setInterval(() => {
         if (mounted && !abort) {
-          fetchRemote().catch(() => {});
+          checkSession().catch(() => {});
         }
       }, 5000);
     }
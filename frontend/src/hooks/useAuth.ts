@@ -1,5 +1,6 @@
 import { useState, useEffect } from "react";
 import { permissionDebugger } from "@/lib/permission-debugger";
+import { freshAfter } from "@/lib/api";
 
 interface AuthUser {
   id?: number;
@@ -230,7 +231,10 @@ export function useAuth() {
                 "- will refresh permissions",
               );
               // Dispatch the refresh event to trigger permission updates
-              window.dispatchEvent(new CustomEvent("auth:refresh"));
+              // detail carries the event's _ts (see freshAfter)
+              window.dispatchEvent(
+                new CustomEvent("auth:refresh", { detail: data }),
+              );
             } else {
               console.debug(
                 "[SIO] Event is for different user or no current user. uid:",
@@ -254,7 +258,7 @@ export function useAuth() {
       console.error("[SIO] Failed to setup socket:", err);
     });
 
-    const refresh = async () => {
+    const refresh = async (init?: RequestInit) => {
       try {
         if (!mounted) return;
         const current = readFromStorage();
@@ -265,7 +269,7 @@ export function useAuth() {
           `Fetching updated user data from /api/usuarios/${current.id}`,
         );
 
-        const res = await fetch(`/api/usuarios/${current.id}`);
+        const res = await fetch(`/api/usuarios/${current.id}`, init);
         if (!res.ok) {
           console.debug("[AUTH] ✗ Refresh failed with status", res.status);
           permissionDebugger.log("api", "❌ API call failed", {
@@ -383,7 +387,7 @@ export function useAuth() {
 
     const handleAuthRefresh = (e: Event) => {
       console.debug("[AUTH] auth:refresh event received");
-      refresh().catch((err) => {
+      refresh(freshAfter((e as CustomEvent).detail)).catch((err) => {
         console.error("[AUTH] auth:refresh handler error:", err);
       });
     };
@@ -5,14 +5,30 @@ export const API_BASE: string = (() => {
   if (envBase && envBase.trim()) return envBase.trim();
   if (typeof window !== "undefined") {
     const h = window.location.hostname;
-    if (h === "localhost" || h === "127.0.0.1")
-      return "http://127.0.0.1:8000/api";
+    // Same host as the page: the dev API stays same-site, so its SameSite=lax
+    // cookies are sent with credentialed requests
+    if (h === "localhost" || h === "127.0.0.1") return `http://${h}:8000/api`;
   }
   return "/api";
 })();
 
+// Cookies go along on cross-origin calls too (dev API on :8000), so the
+// server's read-your-writes cookie (db_primary_until) is sent back. The API
+// allows credentials only for the origins listed in its CORS settings.
 export function apiFetch(path: string, init?: RequestInit) {
   const p = path.startsWith("/") ? path : `/${path}`;
   const url = `${API_BASE}${p}`;
-  return fetch(url, init);
+  return fetch(url, { credentials: "include", ...init });
+}
+
+export const FRESH_HEADER = "X-Db-Fresh";
+
+/**
+ * Options for a refetch triggered by a realtime event: sends the event's "_ts"
+ * so the server reads from the primary while the replica may still be behind
+ * the change the event announced.
+ */
+export function freshAfter(event: any): RequestInit {
+  const ts = event && typeof event._ts === "number" ? event._ts : 0;
+  return ts > 0 ? { headers: { [FRESH_HEADER]: String(ts) } } : {};
 }
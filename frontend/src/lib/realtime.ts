@@ -0,0 +1,75 @@
+import type { Socket } from "socket.io-client";
+
+interface Hello {
+  epoch: string;
+  seq: number;
+}
+
+/** Room for the TI ticket queue (chamado events and general notifications). */
+export const TOPIC_TI = "setor:ti";
+
+/**
+ * Subscribes to `topics` on every (re)connect, tracks the server sequence number
+ * ("_seq") of received events and, after a reconnect, asks the server to replay
+ * what was missed. Calls `onResync` when the server can't replay (restart,
+ * another instance, or gap older than its buffer).
+ */
+export function trackResume(
+  socket: Socket,
+  onResync: () => void,
+  topics: string[] = [TOPIC_TI],
+) {
+  let epoch: string | null = null;
+  let lastSeq = 0;
+
+  socket.on("connect", () => {
+    if (topics.length) socket.emit("subscribe", { topics });
+  });
+
+  // Coalesced frames: dispatch each event to the regular listeners, skipping
+  // seqs already delivered (e.g. by a resume replay).
+  const seen = new Set<number>();
+  socket.on("events", (frame: { events?: { event: string; data: any }[] }) => {
+    for (const e of frame?.events || []) {
+      const seq = e.data?._seq;
+      if (typeof seq === "number") {
+        if (seen.has(seq)) continue;
+        seen.add(seq);
+        if (seen.size > 1000) seen.delete(seen.values().next().value as number);
+      }
+      for (const fn of socket.listeners(e.event)) fn(e.data);
+    }
+  });
+
+  // Replayed events arrive as plain emits: remember their seqs too, so a frame
+  // carrying one of them doesn't dispatch it again
+  socket.onAny((event: string, data: any) => {
+    const seq = data && typeof data._seq === "number" ? data._seq : 0;
+    if (seq > lastSeq) lastSeq = seq;
+    if (seq && event !== "events") {
+      seen.add(seq);
+      if (seen.size > 1000) seen.delete(seen.values().next().value as number);
+    }
+  });
+
+  socket.on("realtime:hello", (h: Hello) => {
+    if (epoch === null) {
+      epoch = h.epoch;
+      lastSeq = Math.max(lastSeq, h.seq);
+      return;
+    }
+    if (epoch !== h.epoch) {
+      epoch = h.epoch;
+      lastSeq = h.seq;
+      onResync();
+      return;
+    }
+    if (h.seq <= lastSeq) return;
+    socket.emit("resume", { epoch, since: lastSeq, topics }, (res: any) => {
+      if (!res || res.resync) {
+        lastSeq = Math.max(lastSeq, Number(res?.seq ?? 0));
+        onResync();
+      }
+    });
+  });
+}
@@ -41,7 +41,8 @@ import {
 } from "@/components/ui/dialog";
 import { Save, Trash2, Ticket as TicketIcon, UserPlus } from "lucide-react";
 import { ticketsMock } from "../mock";
-import { apiFetch, API_BASE } from "@/lib/api";
+import { apiFetch, API_BASE, freshAfter } from "@/lib/api";
+import { trackResume } from "@/lib/realtime";
 import { useAuthContext } from "@/lib/auth-context";
 import { toast } from "@/hooks/use-toast";
 
@@ -304,39 +305,38 @@ export default function ChamadosPage() {
         reconnectionAttempts: 10,
       });
       socket.on("connect", () => {});
+      trackResume(socket, () => {
+        apiFetch("/chamados")
+          .then((r) => (r.ok ? r.json() : Promise.reject(new Error("fail"))))
+          .then((data) => setItems(Array.isArray(data) ? data.map(adapt) : []))
+          .catch(() => {});
+      });
       socket.on(
         "notification:new",
         (n: { titulo: string; mensagem?: string }) => {
           toast({ title: n.titulo, description: n.mensagem || "" });
         },
       );
-      socket.on("chamado:created", () => {
-        apiFetch("/chamados")
+      socket.on("chamado:created", (ev: { ids?: number[] }) => {
+        apiFetch("/chamados", freshAfter(ev))
           .then((r) => (r.ok ? r.json() : Promise.reject(new Error("fail"))))
           .then((data) => setItems(Array.isArray(data) ? data.map(adapt) : []))
           .catch(() => {});
       });
+      const toTicketStatus = (status?: string): TicketStatus => {
+        const n = status?.toUpperCase();
+        if (n === "EM_ANDAMENTO") return "EM_ANDAMENTO";
+        if (n === "EM_ANALISE" || n === "EM ANÁLISE" || n === "EM ANALISE")
+          return "EM_ANALISE";
+        if (n === "CONCLUIDO" || n === "CONCLUÍDO") return "CONCLUIDO";
+        if (n === "CANCELADO") return "CANCELADO";
+        return "ABERTO";
+      };
       socket.on("chamado:status", (data: { id: number; status: string }) => {
         setItems((prev) =>
           prev.map((it) =>
             String(it.id) === String(data.id)
-              ? {
-                  ...it,
-                  status: (() => {
-                    const n = data.status?.toUpperCase();
-                    if (n === "EM_ANDAMENTO") return "EM_ANDAMENTO";
-                    if (
-                      n === "EM_ANALISE" ||
-                      n === "EM ANÁLISE" ||
-                      n === "EM ANALISE"
-                    )
-                      return "EM_ANALISE";
-                    if (n === "CONCLUIDO" || n === "CONCLUÍDO")
-                      return "CONCLUIDO";
-                    if (n === "CANCELADO") return "CANCELADO";
-                    return "ABERTO";
-                  })() as TicketStatus,
-                }
+              ? { ...it, status: toTicketStatus(data.status) }
               : it,
           ),
         );
@@ -1,4 +1,5 @@
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
+import type { Socket } from "socket.io-client";
 import { Button } from "@/components/ui/button";
 import {
   DropdownMenu,
@@ -11,6 +12,8 @@ import {
 import { Bell, Check } from "lucide-react";
 import { apiFetch } from "@/lib/api";
 import { toast } from "@/hooks/use-toast";
+import { useAuthContext } from "@/lib/auth-context";
+import { trackResume } from "@/lib/realtime";
 
 interface Notif {
   id: number;
@@ -20,18 +23,41 @@ interface Notif {
 }
 
 export default function NotificationBell() {
+  const { user } = useAuthContext();
+  const uid = user?.id;
   const [items, setItems] = useState<Notif[]>([]);
-  const unread = items.filter((i) => !i.lido).length;
+  const [unreadCount, setUnreadCount] = useState<number | null>(null);
+  const unread = unreadCount ?? items.filter((i) => !i.lido).length;
+  // One socket per mounted bell / user; replaced (and disconnected) when uid changes
+  const socketRef = useRef<Socket | null>(null);
+
+  const withUser = (path: string) =>
+    uid ? `${path}${path.includes("?") ? "&" : "?"}usuario_id=${uid}` : path;
+
+  const request = async (path: string, init?: RequestInit) => {
+    let r = await apiFetch(path, init);
+    if (r.status === 404) {
+      const base = (import.meta as any)?.env?.VITE_API_BASE || "/api";
+      const url = `${String(base).replace(/\/?api$/, "")}${path}`;
+      r = await fetch(url, init);
+    }
+    return r;
+  };
+
+  const loadUnread = async () => {
+    if (!uid) return;
+    try {
+      const r = await request(withUser("/notifications/unread-count"));
+      if (!r.ok) return;
+      const data = await r.json();
+      setUnreadCount(Number(data?.nao_lidas ?? 0));
+    } catch {}
+  };
 
   useEffect(() => {
     const load = async () => {
       try {
-        let r = await apiFetch("/notifications?limit=20");
-        if (r.status === 404) {
-          const base = (import.meta as any)?.env?.VITE_API_BASE || "/api";
-          const url = `${String(base).replace(/\/?api$/, "")}/notifications?limit=20`;
-          r = await fetch(url);
-        }
+        const r = await request(withUser("/notifications?limit=20"));
         if (!r.ok) throw new Error("fail");
         const arr = await r.json();
         const mapped = Array.isArray(arr)
@@ -46,8 +72,11 @@ export default function NotificationBell() {
       } catch {}
     };
     load();
+    loadUnread();
 
+    let cancelled = false;
     import("socket.io-client").then(({ io }) => {
+      if (cancelled) return;
       const base = (import.meta as any)?.env?.VITE_API_BASE || "/api";
       const origin = String(base).replace(/\/?api$/, "");
       const path = String(base).endsWith("/api")
@@ -58,6 +87,15 @@ export default function NotificationBell() {
         transports: ["websocket", "polling"],
         autoConnect: true,
       });
+      socketRef.current = socket;
+      // Per-user notifications go to the user:{id} room, joined via 'identify'
+      socket.on("connect", () => {
+        if (uid) socket.emit("identify", { user_id: uid });
+      });
+      trackResume(socket, () => {
+        load();
+        loadUnread();
+      });
       socket.on("notification:new", (n: any) => {
         setItems((prev) =>
           [
@@ -70,28 +108,51 @@ export default function NotificationBell() {
             ...prev,
           ].slice(0, 20),
         );
+        setUnreadCount((c) => (c === null ? c : c + 1));
         toast({ title: n.titulo, description: n.mensagem || "" });
       });
     });
-  }, []);
+    return () => {
+      cancelled = true;
+      socketRef.current?.disconnect();
+      socketRef.current = null;
+    };
+  }, [uid]);
 
   const markAsRead = async (id: number) => {
     try {
-      let r = await apiFetch(`/notifications/${id}/read`, { method: "PATCH" });
-      if (r.status === 404) {
-        const base = (import.meta as any)?.env?.VITE_API_BASE || "/api";
-        const url = `${String(base).replace(/\/?api$/, "")}/notifications/${id}/read`;
-        r = await fetch(url, { method: "PATCH" });
-      }
+      const r = await request(withUser(`/notifications/${id}/read`), {
+        method: "PATCH",
+      });
       if (!r.ok) throw new Error();
       const updated = await r.json();
+      const was = items.find((i) => i.id === id);
       setItems((prev) =>
         prev.map((i) => (i.id === id ? { ...i, lido: updated.lido } : i)),
       );
+      if (was && !was.lido && updated.lido) {
+        setUnreadCount((c) => (c === null ? c : Math.max(0, c - 1)));
+      }
     } catch {}
   };
 
   const markAll = async () => {
+    if (uid && items.length > 0) {
+      // one request advances the per-user read marker
+      try {
+        const ateId = Math.max(...items.map((i) => i.id));
+        const r = await request("/notifications/read-up-to", {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          body: JSON.stringify({ usuario_id: uid, ate_id: ateId }),
+        });
+        if (!r.ok) throw new Error();
+        const data = await r.json();
+        setItems((prev) => prev.map((i) => ({ ...i, lido: true })));
+        setUnreadCount(Number(data?.nao_lidas ?? 0));
+        return;
+      } catch {}
+    }
     const ids = items.filter((i) => !i.lido).map((i) => i.id);
     for (const id of ids) {
       // sequential to avoid spamming
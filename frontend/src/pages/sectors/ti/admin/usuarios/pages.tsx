@@ -413,13 +413,26 @@ export function Bloqueios() {
   };
   const [blocked, setBlocked] = useState<ApiUser[]>([]);
   const [loading, setLoading] = useState(true);
+  const [nextBeforeId, setNextBeforeId] = useState<number | null>(null);
 
-  const load = () => {
+  const PAGE_SIZE = 60;
+  const load = (beforeId: number | null = null) => {
     setLoading(true);
-    fetch("/api/usuarios/blocked")
+    const params = new URLSearchParams({
+      bloqueado: "true",
+      limit: String(PAGE_SIZE),
+    });
+    if (beforeId !== null) params.set("before_id", String(beforeId));
+    fetch(`/api/usuarios/search?${params.toString()}`)
       .then((r) => (r.ok ? r.json() : Promise.reject(new Error("fail"))))
-      .then((data: ApiUser[]) => setBlocked(Array.isArray(data) ? data : []))
-      .catch(() => setBlocked([]))
+      .then((data: { items: ApiUser[]; next_before_id: number | null }) => {
+        const items = Array.isArray(data?.items) ? data.items : [];
+        setBlocked((prev) => (beforeId === null ? items : [...prev, ...items]));
+        setNextBeforeId(data?.next_before_id ?? null);
+      })
+      .catch(() => {
+        if (beforeId === null) setBlocked([]);
+      })
       .finally(() => setLoading(false));
   };
 
@@ -480,6 +493,18 @@ export function Bloqueios() {
           </div>
         ))}
       </div>
+      {nextBeforeId !== null && (
+        <div className="flex justify-center">
+          <Button
+            type="button"
+            variant="secondary"
+            disabled={loading}
+            onClick={() => load(nextBeforeId)}
+          >
+            Carregar mais
+          </Button>
+        </div>
+      )}
     </div>
   );
 }
@@ -498,6 +523,8 @@ export function Permissoes() {
   };
   const [users, setUsers] = useState<ApiUser[]>([]);
   const [loading, setLoading] = useState(true);
+  const [search, setSearch] = useState("");
+  const [nextBeforeId, setNextBeforeId] = useState<number | null>(null);
 
   const [editing, setEditing] = useState<ApiUser | null>(null);
   const [pwdDialog, setPwdDialog] = useState<{
@@ -521,24 +548,37 @@ export function Permissoes() {
     );
   };
 
-  const load = () => {
+  const PAGE_SIZE = 60;
+  const load = (beforeId: number | null = null) => {
     setLoading(true);
-    fetch("/api/usuarios")
+    const params = new URLSearchParams({
+      bloqueado: "false",
+      limit: String(PAGE_SIZE),
+    });
+    if (search.trim()) params.set("q", search.trim());
+    if (beforeId !== null) params.set("before_id", String(beforeId));
+    fetch(`/api/usuarios/search?${params.toString()}`)
       .then((r) => (r.ok ? r.json() : Promise.reject(new Error("fail"))))
-      .then((data: ApiUser[]) => {
-        if (Array.isArray(data)) setUsers(data.filter((u) => !u.bloqueado));
+      .then((data: { items: ApiUser[]; next_before_id: number | null }) => {
+        const items = Array.isArray(data?.items) ? data.items : [];
+        setUsers((prev) => (beforeId === null ? items : [...prev, ...items]));
+        setNextBeforeId(data?.next_before_id ?? null);
+      })
+      .catch(() => {
+        if (beforeId === null) setUsers([]);
       })
-      .catch(() => setUsers([]))
       .finally(() => setLoading(false));
   };
 
   useEffect(() => {
-    load();
+    const t = setTimeout(() => load(), 300);
     const onChanged = () => load();
     window.addEventListener("users:changed", onChanged as EventListener);
-    return () =>
+    return () => {
+      clearTimeout(t);
       window.removeEventListener("users:changed", onChanged as EventListener);
-  }, []);
+    };
+  }, [search]);
 
   const openEdit = (u: ApiUser) => {
     setEditing(u);
@@ -636,6 +676,12 @@ export function Permissoes() {
         <p className="text-muted-foreground text-sm">
           Liste e gerencie os usuários cadastrados.
         </p>
+        <Input
+          className="mt-3"
+          placeholder="Buscar por nome, usuário ou e-mail"
+          value={search}
+          onChange={(e) => setSearch(e.target.value)}
+        />
       </div>
 
       <div className="grid gap-3 sm:gap-4 sm:grid-cols-2 lg:grid-cols-3">
@@ -729,6 +775,18 @@ export function Permissoes() {
           </div>
         ))}
       </div>
+      {nextBeforeId !== null && (
+        <div className="flex justify-center">
+          <Button
+            type="button"
+            variant="secondary"
+            disabled={loading}
+            onClick={() => load(nextBeforeId)}
+          >
+            Carregar mais
+          </Button>
+        </div>
+      )}
 
       <Dialog open={!!editing} onOpenChange={(o) => !o && setEditing(null)}>
         <DialogContent>